@@ -0,0 +1,107 @@
+"""Bundled airport coordinates, great-circle distances and block-time estimates.
+
+``data/airports.csv`` lists United's hubs, their neighbouring metro airports
+and the main domestic and international destinations. ``AirportIndex`` keeps
+the codes sorted in a numpy array so whole columns of origin/destination
+codes are resolved with one ``searchsorted`` and their distances with one
+vectorized haversine, which is what batch upgrade evaluation needs to fill
+in flight durations for millions of rows.
+
+Block time is estimated as ``distance / BLOCK_SPEED_MPH + BLOCK_OVERHEAD_HOURS``
+(taxi, climb and descent). Winds are not modelled, so westbound flights run a
+little longer than the estimate and eastbound ones a little shorter.
+"""
+import csv
+import os
+from functools import lru_cache
+
+import numpy as np
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "airports.csv")
+EARTH_RADIUS_MILES = 3958.8
+BLOCK_SPEED_MPH = 510
+BLOCK_OVERHEAD_HOURS = 0.7
+
+
+def great_circle_miles(lat1, lon1, lat2, lon2):
+    """Haversine distance in statute miles between points given in degrees (scalars or arrays)"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def estimate_block_hours(distance_miles):
+    """Gate-to-gate hours for a great-circle distance (scalar or array)"""
+    return np.asarray(distance_miles, dtype=np.float64) / BLOCK_SPEED_MPH + BLOCK_OVERHEAD_HOURS
+
+
+class AirportIndex:
+    """Airport coordinates keyed by IATA code, with vectorized lookups"""
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: row["iata"])
+        self.codes = np.array([row["iata"] for row in rows], dtype="<U3")
+        self.names = [row["name"] for row in rows]
+        self.cities = [row["city"] for row in rows]
+        self.countries = [row["country"] for row in rows]
+        self.lat = np.array([float(row["latitude"]) for row in rows])
+        self.lon = np.array([float(row["longitude"]) for row in rows])
+
+    @classmethod
+    def load(cls, path=DATA_PATH):
+        with open(path, newline="", encoding="utf-8") as f:
+            return cls(list(csv.DictReader(f)))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def lookup(self, codes):
+        """Row index for each code (-1 when unknown); accepts a code or an array of codes"""
+        codes = np.asarray(codes)
+        if codes.dtype.kind != "U":
+            codes = codes.astype(str)
+        positions = self._find(codes)
+        # Only codes that miss exactly pay for case and whitespace normalization
+        missing = positions < 0
+        if missing.any():
+            positions[missing] = self._find(np.char.upper(np.char.strip(codes[missing])))
+        return positions
+
+    def _find(self, codes):
+        positions = np.minimum(np.searchsorted(self.codes, codes), len(self.codes) - 1)
+        return np.where(self.codes[positions] == codes, positions, -1)
+
+    def airport(self, code):
+        """``{"Code", "Name", "City", "Country", "Latitude", "Longitude"}`` or None"""
+        i = int(self.lookup(code))
+        if i < 0:
+            return None
+        return {
+            "Code": str(self.codes[i]),
+            "Name": self.names[i],
+            "City": self.cities[i],
+            "Country": self.countries[i],
+            "Latitude": float(self.lat[i]),
+            "Longitude": float(self.lon[i]),
+        }
+
+    def distance_miles(self, origins, destinations):
+        """Great-circle miles per origin/destination pair; NaN where either code is unknown"""
+        o, d = self.lookup(origins), self.lookup(destinations)
+        miles = great_circle_miles(self.lat[o], self.lon[o], self.lat[d], self.lon[d])
+        return np.where((o >= 0) & (d >= 0), miles, np.nan)
+
+    def block_hours(self, origins, destinations):
+        """Estimated block hours per pair; NaN where either code is unknown"""
+        return estimate_block_hours(self.distance_miles(origins, destinations))
+
+
+@lru_cache(maxsize=1)
+def get_airport_index():
+    return AirportIndex.load()
+
+
+def flight_hours(origin, destination):
+    """Estimated block hours between two airport codes, or None if either is unknown"""
+    hours = float(get_airport_index().block_hours(origin, destination))
+    return None if np.isnan(hours) else hours
@@ -0,0 +1,135 @@
+"""Online detection of unusually cheap award quotes.
+
+Every (route, cabin) keeps a running mean and variance of its miles price and
+of its cents-per-mile (CPM). The first observations are averaged exactly
+(Welford); once a route has more than ``1 / alpha`` quotes the statistics
+become an exponentially weighted moving average, so seasonal drift is
+followed while each route still costs four numbers per metric.
+
+A new quote is scored against the statistics *before* it is folded in. Miles
+far below the norm or a CPM far above it produce an anomaly event, kept in a
+short ring buffer that the alerts page reads to decide what to e-mail.
+"""
+import itertools
+import math
+import threading
+import time
+from collections import deque
+
+from cpm_sketch import quote_cpm
+
+Z_THRESHOLD = 3.0  # Standard deviations from the route norm
+EWMA_ALPHA = 0.05
+MIN_OBSERVATIONS = 10  # No verdicts until a route has this many quotes
+MIN_RELATIVE_STD = 0.05  # Keeps identical prices from giving infinite z-scores
+RECENT_EVENTS = 100
+
+
+class RunningStats:
+    """Welford mean/variance that turns into an EWMA after ``1 / alpha`` observations"""
+
+    __slots__ = ("count", "mean", "var", "alpha")
+
+    def __init__(self, alpha=EWMA_ALPHA):
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.alpha = alpha
+
+    def add(self, x):
+        self.count += 1
+        weight = max(self.alpha, 1 / self.count)
+        diff = x - self.mean
+        self.mean += weight * diff
+        self.var = (1 - weight) * (self.var + weight * diff * diff)
+
+    def zscore(self, x):
+        std = max(math.sqrt(self.var), abs(self.mean) * MIN_RELATIVE_STD)
+        return (x - self.mean) / std if std else 0.0
+
+
+class AnomalyDetector:
+    """Scores award quotes against per-route norms and emits anomaly events"""
+
+    def __init__(self, threshold=Z_THRESHOLD, alpha=EWMA_ALPHA, min_observations=MIN_OBSERVATIONS):
+        self.threshold = threshold
+        self.alpha = alpha
+        self.min_observations = min_observations
+        self.routes = {}  # (route, cabin) -> (miles stats, cpm stats)
+        self.events = deque(maxlen=RECENT_EVENTS)
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _stats(self, route, cabin):
+        stats = self.routes.get((route, cabin))
+        if stats is None:
+            stats = self.routes[(route, cabin)] = (RunningStats(self.alpha), RunningStats(self.alpha))
+        return stats
+
+    def observe(self, route, cabin, miles, cash):
+        """Fold a quote into the route norm without scoring it (e.g. when warming up)"""
+        cpm = quote_cpm(miles, cash)
+        if cpm is None:
+            return
+        with self._lock:
+            miles_stats, cpm_stats = self._stats(route, cabin)
+            miles_stats.add(miles)
+            cpm_stats.add(cpm)
+
+    def warm_up(self, history):
+        """Seed the norms from every quote already stored in a ``PriceHistory``"""
+        last = 0
+        while True:
+            rows = history.rows_since(last)
+            if not rows:
+                return
+            for last, route, cabin, _, miles, cash in rows:
+                self.observe(route, cabin, miles, cash)
+
+    def score(self, quote):
+        """Score ``quote`` against its route norm, then fold it in; returns the event or None"""
+        cpm = quote_cpm(quote["miles"], quote["cash"])
+        if cpm is None:
+            return None
+        with self._lock:
+            miles_stats, cpm_stats = self._stats(quote["route"], quote["cabin"])
+            event = None
+            if miles_stats.count >= self.min_observations:
+                miles_z = miles_stats.zscore(quote["miles"])
+                cpm_z = cpm_stats.zscore(cpm)
+                reasons = []
+                if miles_z <= -self.threshold:
+                    reasons.append(f"miles {-miles_z:.1f}σ below the usual {miles_stats.mean:,.0f}")
+                if cpm_z >= self.threshold:
+                    reasons.append(f"{cpm:.2f}¢ per mile is {cpm_z:.1f}σ above the usual {cpm_stats.mean:.2f}¢")
+                if reasons:
+                    event = {
+                        "Sequence": next(self._sequence),
+                        "Detected At": time.time(),
+                        "Route": quote["route"],
+                        "Cabin": quote["cabin"],
+                        "Travel Date": quote["travel_date"],
+                        "Miles": quote["miles"],
+                        "Cash": quote["cash"],
+                        "CPM": cpm,
+                        "Miles Z": miles_z,
+                        "CPM Z": cpm_z,
+                        "Reason": "; ".join(reasons),
+                    }
+                    self.events.append(event)
+            miles_stats.add(quote["miles"])
+            cpm_stats.add(cpm)
+        return event
+
+    def record_quote(self, quote):
+        """Listener for ``award_api.add_quote_listener``"""
+        self.score(quote)
+
+    def events_since(self, sequence, route=None):
+        """Recent events newer than ``sequence``, optionally for one route"""
+        with self._lock:
+            return [e for e in self.events if e["Sequence"] > sequence and (route is None or e["Route"] == route)]
+
+    def last_sequence(self):
+        with self._lock:
+            return self.events[-1]["Sequence"] if self.events else 0
@@ -0,0 +1,287 @@
+"""JSON HTTP API for the evaluators, for scripts and other services.
+
+A small Starlette application served by uvicorn. Every endpoint takes a JSON
+object and returns the raw numbers from the ``*_figures`` functions in
+``calculators`` (plain floats, no currency formatting), so callers can do
+their own arithmetic. Amounts may be numbers or strings such as ``"13.6K"``,
+which go through ``parse_user_input`` like the form fields do. An optional
+``"valuation": {"low": 1.2, "high": 1.5}`` (cents per mile) overrides the
+default mile valuation.
+
+The evaluators take microseconds and never block, so handlers call them
+directly on the event loop; handing them to a thread pool would cost more than
+the work. Throughput comes from running several uvicorn worker processes
+(``UNITED_MILES_API_WORKERS``), each loading the upgrade verdict table once.
+
+``POST /batch`` takes NDJSON (one record per line, with ``"type"`` naming the
+evaluator) and streams NDJSON results back while the upload is still arriving.
+Results go through a small bounded queue: when the client stops reading them,
+the queue fills, the handler stops reading the body and uvicorn stops reading
+the socket, so a multi-million-line upload is never held in memory.
+
+    $ python api_server.py
+    $ curl -s localhost:8502/ticket -d '{"miles_price": "30K", "cash_price": 450}'
+    $ curl -sN localhost:8502/batch --data-binary @offers.ndjson
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from starlette.applications import Starlette
+from starlette.requests import ClientDisconnect
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from calculators import (
+    DEFAULT_VALUATION,
+    MileValuation,
+    accelerator_figures,
+    best_option_figures,
+    cabin_classes,
+    calculate_max_purchase_value,
+    miles_purchase_figures,
+    parse_user_input,
+    upgrade_figures,
+)
+from verdict_rules import get_rules
+
+API_HOST = os.environ.get("UNITED_MILES_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("UNITED_MILES_API_PORT", "8502"))
+API_WORKERS = int(os.environ.get("UNITED_MILES_API_WORKERS", str(os.cpu_count() or 1)))
+BATCH_QUEUE_BLOCKS = 8  # Result blocks computed ahead of a slow reader
+MAX_LINE_BYTES = 64 * 1024
+NDJSON = "application/x-ndjson"
+
+logger = logging.getLogger(__name__)
+
+
+class BadRequest(ValueError):
+    """Invalid request body; reported to the client as a 400"""
+
+
+@lru_cache(maxsize=4)
+def get_upgrade_verdict_table(rules_digest):
+    """Precomputed upgrade verdicts for the current rules, loaded once per worker process"""
+    from upgrade_table import load_upgrade_table
+    return load_upgrade_table()
+
+
+def number(body, field, default=0):
+    """Numeric field from the request body; accepts numbers and strings like "13.6K" """
+    value = body.get(field, default)
+    if isinstance(value, bool):
+        raise BadRequest(f"{field} must be a number")
+    if isinstance(value, (int, float)):
+        result = value
+    elif isinstance(value, str):
+        result = parse_user_input(value)
+    else:
+        raise BadRequest(f"{field} must be a number")
+    try:
+        finite = math.isfinite(result)
+    except (OverflowError, TypeError):  # e.g. a JSON integer too large for a float
+        finite = False
+    if not finite:
+        raise BadRequest(f"{field} must be finite")
+    return result
+
+
+def valuation(body):
+    """``MileValuation`` from ``{"valuation": {"low": cents, "high": cents}}``, or the default"""
+    cents = body.get("valuation")
+    if cents is None:
+        return DEFAULT_VALUATION
+    if not isinstance(cents, dict):
+        raise BadRequest("valuation must be an object with low and high cents per mile")
+    low = number(cents, "low", DEFAULT_VALUATION.low * 100)
+    high = number(cents, "high", DEFAULT_VALUATION.high * 100)
+    if not 0 < low <= high:
+        raise BadRequest("valuation needs 0 < low <= high")
+    return MileValuation.from_cents(low, high)
+
+
+def cabin(body, field, default):
+    value = body.get(field, default)
+    if value not in cabin_classes:
+        raise BadRequest(f"{field} must be one of: {', '.join(cabin_classes)}")
+    return value
+
+
+def _json_safe(figures):
+    # JSON has no infinity or NaN
+    return {k: None if isinstance(v, float) and not math.isfinite(v) else v for k, v in figures.items()}
+
+
+def evaluate_json(evaluate, raw):
+    """Run ``evaluate(body) -> figures`` on a JSON object; ``{"error": ...}`` when the input is invalid"""
+    try:
+        body = json.loads(raw or b"{}")
+        if not isinstance(body, dict):
+            raise BadRequest("request body must be a JSON object")
+        return _json_safe(evaluate(body))
+    except (BadRequest, ValueError) as e:  # json.JSONDecodeError is a ValueError
+        return {"error": str(e)}
+    except (TypeError, OverflowError) as e:  # Input of the wrong shape or size that got past validation
+        return {"error": f"invalid input: {e}"}
+
+
+def endpoint(evaluate):
+    """Wrap ``evaluate(body) -> figures`` as a POST handler with JSON in and out"""
+    async def handler(request):
+        figures = evaluate_json(evaluate, await request.body())
+        return JSONResponse(figures, status_code=400 if "error" in figures else 200)
+    handler.__name__ = evaluate.__name__
+    return handler
+
+
+def ticket(body):
+    return best_option_figures(
+        number(body, "miles_price"), number(body, "cash_price"),
+        number(body, "miles_plus_cash_miles"), number(body, "miles_plus_cash_cash"),
+        valuation=valuation(body),
+    )
+
+
+def break_even(body):
+    miles, cash = number(body, "miles"), number(body, "cash")
+    return calculate_max_purchase_value(miles or None, cash or None, valuation=valuation(body))
+
+
+def upgrade(body):
+    return upgrade_figures(
+        number(body, "miles"), number(body, "cash_cost"), number(body, "full_cash_upgrade"),
+        number(body, "full_fare_cost"), number(body, "travel_hours", 1),
+        cabin(body, "from_class", cabin_classes[0]), cabin(body, "to_class", cabin_classes[-1]),
+        verdict_table=get_upgrade_verdict_table(get_rules().digest), valuation=valuation(body),
+    )
+
+
+def accelerator(body):
+    return accelerator_figures(number(body, "miles"), number(body, "pqp"), number(body, "cost"),
+                               valuation=valuation(body))
+
+
+def buy_miles(body):
+    return miles_purchase_figures(number(body, "miles_price"), number(body, "cash_price"), valuation=valuation(body))
+
+
+EVALUATORS = {
+    "ticket": ticket,
+    "break-even": break_even,
+    "upgrade": upgrade,
+    "accelerator": accelerator,
+    "buy-miles": buy_miles,
+}
+
+
+def batch_record(body):
+    """Evaluate one batch record, echoing its ``"id"`` if it has one"""
+    kind = body.get("type")
+    evaluate = EVALUATORS.get(kind) if isinstance(kind, str) else None
+    if evaluate is None:
+        raise BadRequest(f"type must be one of: {', '.join(EVALUATORS)}")
+    figures = evaluate(body)
+    return {"id": body["id"], **figures} if "id" in body else figures
+
+
+def _ndjson(record):
+    return json.dumps(record, separators=(",", ":")).encode() + b"\n"
+
+
+def evaluate_lines(lines, first_line):
+    """One block of NDJSON results for consecutive input lines; blank lines are skipped but still counted"""
+    return b"".join(
+        _ndjson({"line": first_line + offset, **evaluate_json(batch_record, line)})
+        for offset, line in enumerate(lines)
+        if line.strip()
+    )
+
+
+async def read_lines(chunks):
+    """Complete lines from a byte stream, one list per received chunk"""
+    pending = b""
+    async for chunk in chunks:
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        if len(pending) > MAX_LINE_BYTES:
+            raise BadRequest(f"line longer than {MAX_LINE_BYTES} bytes")
+        if lines:
+            yield lines
+    if pending:
+        yield [pending]
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """``StreamingResponse`` that leaves ``receive`` to the handler.
+
+    Under servers reporting ASGI < 2.4 (uvicorn) ``StreamingResponse`` watches
+    ``receive`` for a disconnect while streaming, which would swallow the rest
+    of a request body that is still being read.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+
+async def batch(request):
+    queue = asyncio.Queue(maxsize=BATCH_QUEUE_BLOCKS)
+
+    async def produce():
+        line = 1
+        try:
+            async for lines in read_lines(request.stream()):
+                block = evaluate_lines(lines, line)
+                line += len(lines)
+                if block:
+                    await queue.put(block)  # Waits while the client is behind on reading results
+        except BadRequest as e:
+            await queue.put(_ndjson({"line": line, "error": str(e)}))
+        except ClientDisconnect:
+            pass
+        except Exception:
+            logger.exception("Batch evaluation failed at line %d", line)
+            await queue.put(_ndjson({"line": line, "error": "internal error"}))
+        await queue.put(None)
+
+    async def results():
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                block = await queue.get()
+                if block is None:
+                    return
+                yield block
+        finally:
+            producer.cancel()
+
+    return DuplexStreamingResponse(results(), media_type=NDJSON)
+
+
+async def health(request):
+    return JSONResponse({"status": "ok"})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    get_upgrade_verdict_table(get_rules().digest)  # Load before the first request, not during it
+    yield
+
+
+app = Starlette(
+    routes=[
+        Route("/health", health, methods=["GET"]),
+        *(Route(f"/{name}", endpoint(evaluate), methods=["POST"]) for name, evaluate in EVALUATORS.items()),
+        Route("/batch", batch, methods=["POST"]),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("api_server:app", host=API_HOST, port=API_PORT, workers=API_WORKERS, access_log=False)
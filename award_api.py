@@ -0,0 +1,159 @@
+"""Outbound integrations: United award search API and e-mail alerts.
+
+Both calls keep their user-facing string results, but every attempt is also
+reported to ``io_telemetry`` with its duration, status, retries, payload size
+and error class. Successful availability lookups are additionally handed to
+every registered quote listener (see ``add_quote_listener``).
+"""
+import logging
+import time
+
+from io_telemetry import record_call
+
+AWARD_API_URL = "https://api.united.com/award-search"
+AWARD_API_ENDPOINT = "united_award_search"
+SMTP_ENDPOINT = "smtp_gmail"
+
+API_TIMEOUT = 10  # Seconds
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 2
+RETRY_BACKOFF = 0.5  # Seconds, doubled on every retry
+DEFAULT_CABIN = "Economy"
+
+logger = logging.getLogger(__name__)
+_quote_listeners = []
+
+
+def route_key(origin, destination):
+    """Canonical route name, e.g. ``route_key("sfo", "jfk") == "SFO-JFK"``"""
+    return f"{origin.strip().upper()}-{destination.strip().upper()}"
+
+
+def add_quote_listener(listener):
+    """Call ``listener(quote)`` for every numeric quote returned by the award API.
+
+    ``quote`` is a dict with route, origin, destination, travel_date, cabin,
+    miles, cash and fetched_at. Registering the same listener twice is a no-op.
+    """
+    if listener not in _quote_listeners:
+        _quote_listeners.append(listener)
+
+
+def remove_quote_listener(listener):
+    if listener in _quote_listeners:
+        _quote_listeners.remove(listener)
+
+
+def _publish_quote(origin, destination, date, cabin, award_miles, cash_price):
+    try:
+        miles, cash = int(award_miles), float(cash_price)
+    except (TypeError, ValueError):
+        return None  # "N/A" or missing fields: nothing worth keeping
+    quote = {
+        "route": route_key(origin, destination),
+        "origin": origin.strip().upper(),
+        "destination": destination.strip().upper(),
+        "travel_date": str(date),
+        "cabin": cabin,
+        "miles": miles,
+        "cash": cash,
+        "fetched_at": time.time(),
+    }
+    for listener in list(_quote_listeners):
+        try:
+            listener(quote)
+        except Exception:
+            # A broken listener must never cost the user their search result
+            logger.exception("Quote listener %r failed", listener)
+    return quote
+
+
+# Function to send email notification
+def send_email_notification(to_email, origin, destination, date, miles_required, cash_price, note=None):
+    """Sends an email notification when a better redemption option is found"""
+    # Deferred so page loads that never send mail don't pay for these imports
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
+    sender_email = "your-email@gmail.com"  # Replace with your email
+    sender_password = "your-email-password"  # Replace with your email password
+
+    subject = f"United Award Seat Found for {origin} to {destination}!"
+    body = f"""
+    A lower redemption award seat has been found for your trip:
+
+    🛫 Route: {origin} → {destination}
+    📅 Travel Date: {date}
+    🎟️ Miles Required: {miles_required} miles
+    💰 Cash Price: ${cash_price}
+
+    Book now on United's website before it disappears!
+    """
+    if note:
+        body += f"\n    📉 Why this stands out: {note}\n"
+
+    msg = MIMEMultipart()
+    msg["From"] = sender_email
+    msg["To"] = to_email
+    msg["Subject"] = subject
+    msg.attach(MIMEText(body, "plain"))
+    message = msg.as_string()
+
+    start = time.perf_counter()
+    try:
+        with smtplib.SMTP("smtp.gmail.com", 587) as server:
+            server.starttls()
+            server.login(sender_email, sender_password)
+            server.sendmail(sender_email, to_email, message)
+        record_call(SMTP_ENDPOINT, time.perf_counter() - start, status=250, request_bytes=len(message))
+        return "✅ Notification sent!"
+    except Exception as e:
+        record_call(SMTP_ENDPOINT, time.perf_counter() - start, status=getattr(e, "smtp_code", None),
+                    request_bytes=len(message), error=e)
+        return f"❌ Email error: {str(e)}"
+
+# Function to check real-time award availability (United API)
+def check_award_availability(origin, destination, date, max_retries=MAX_RETRIES, cabin=DEFAULT_CABIN):
+    """
+    Fetches live award availability from United (requires API key).
+    Rate-limit and server errors are retried with exponential backoff.
+    """
+    import requests  # Deferred until the user actually checks availability
+
+    API_URL = f"{AWARD_API_URL}?origin={origin}&destination={destination}&date={date}&cabin={cabin}"
+    headers = {"Authorization": "Bearer YOUR_API_KEY"}  # Replace with actual API Key
+
+    start = time.perf_counter()
+    response = None
+    for attempt in range(max_retries + 1):
+        if attempt:
+            time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+        try:
+            response = requests.get(API_URL, headers=headers, timeout=API_TIMEOUT)
+        except requests.RequestException as e:
+            if attempt < max_retries:
+                continue
+            record_call(AWARD_API_ENDPOINT, time.perf_counter() - start, retries=attempt, error=e)
+            return None, f"API Error: {str(e)}"
+        if response.status_code not in RETRY_STATUSES:
+            break
+
+    elapsed = time.perf_counter() - start
+    response_bytes = len(response.content or b"")
+    try:
+        if response.status_code == 200:
+            data = response.json()
+            award_miles = data.get("lowest_miles", "N/A")
+            cash_price = data.get("cash_price", "N/A")
+            record_call(AWARD_API_ENDPOINT, elapsed, status=200, retries=attempt, response_bytes=response_bytes)
+            _publish_quote(origin, destination, date, cabin, award_miles, cash_price)
+            return award_miles, cash_price
+        else:
+            record_call(AWARD_API_ENDPOINT, elapsed, status=response.status_code, retries=attempt,
+                        response_bytes=response_bytes, error=f"HTTP{response.status_code}")
+            return None, f"Error: {response.status_code}"
+    except Exception as e:
+        record_call(AWARD_API_ENDPOINT, elapsed, status=response.status_code, retries=attempt,
+                    response_bytes=response_bytes, error=e)
+        return None, f"API Error: {str(e)}"
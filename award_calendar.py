@@ -0,0 +1,167 @@
+"""Per-route award calendars with range-minimum queries.
+
+Each (route, cabin) gets dense, date-indexed numpy arrays holding the latest
+quoted miles and cash price for every travel date (award space comes and
+goes, so a newer quote replaces an older one even when it is more expensive).
+A min segment tree over each array stores the index of the cheapest date in
+every node, which answers "cheapest award between June 3 and June 19" with an
+O(log n) arg-min query and absorbs each new quote with an O(log n) in-place
+update. A sparse table would answer in O(1) but would need an O(n log n)
+rebuild on every quote.
+"""
+import datetime
+import threading
+
+import numpy as np
+
+DEFAULT_DAYS = 368  # A little more than United's ~337-day booking window
+MISSING = np.inf
+
+
+class MinSegmentTree:
+    """Arg-min segment tree over a float array; ``inf`` marks dates without a quote"""
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        self.n = len(values)
+        self.size = 1 << max(self.n - 1, 0).bit_length()
+        self.values = np.full(self.size, MISSING)
+        self.values[:self.n] = values
+        # tree[node] = index of the smallest value under node (leftmost on ties)
+        self.tree = np.zeros(2 * self.size, dtype=np.int32)
+        self.tree[self.size:] = np.arange(self.size, dtype=np.int32)
+        start = self.size
+        while start > 1:
+            start //= 2
+            left = self.tree[2 * start:4 * start:2]
+            right = self.tree[2 * start + 1:4 * start:2]
+            self.tree[start:2 * start] = np.where(self.values[right] < self.values[left], right, left)
+
+    def _better(self, i, j):
+        vi, vj = self.values[i], self.values[j]
+        return i if vi < vj or (vi == vj and i < j) else j
+
+    def update(self, i, value):
+        self.values[i] = value
+        node = (i + self.size) // 2
+        while node:
+            self.tree[node] = self._better(self.tree[2 * node], self.tree[2 * node + 1])
+            node //= 2
+
+    def argmin(self, lo, hi):
+        """Index of the smallest value in ``values[lo:hi + 1]``, or -1 if that range is empty or unquoted"""
+        lo, hi = max(lo, 0), min(hi, self.n - 1)
+        if lo > hi:
+            return -1
+        best = lo
+        lo += self.size
+        hi += self.size + 1
+        while lo < hi:
+            if lo & 1:
+                best = self._better(best, self.tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                best = self._better(best, self.tree[hi])
+            lo //= 2
+            hi //= 2
+        return int(best) if self.values[best] != MISSING else -1
+
+
+class RouteCalendar:
+    """Latest miles and cash quote per travel date for one route and cabin"""
+
+    def __init__(self, start, days=DEFAULT_DAYS):
+        self.start = start
+        self.miles = MinSegmentTree(np.full(days, MISSING))
+        self.cash = MinSegmentTree(np.full(days, MISSING))
+
+    @property
+    def days(self):
+        return self.miles.n
+
+    def _index(self, date):
+        return (date - self.start).days
+
+    def _extend(self, date):
+        """Re-base the arrays so ``date`` fits, keeping every quote"""
+        start = min(self.start, date)
+        end = max(self.start + datetime.timedelta(days=self.days - 1), date)
+        days = max((end - start).days + 1, self.days * 2)
+        offset = (self.start - start).days
+        miles = np.full(days, MISSING)
+        cash = np.full(days, MISSING)
+        miles[offset:offset + self.days] = self.miles.values[:self.days]
+        cash[offset:offset + self.days] = self.cash.values[:self.days]
+        self.start = start
+        self.miles = MinSegmentTree(miles)
+        self.cash = MinSegmentTree(cash)
+
+    def record(self, date, miles, cash):
+        i = self._index(date)
+        if not 0 <= i < self.days:
+            self._extend(date)
+            i = self._index(date)
+        self.miles.update(i, miles)
+        self.cash.update(i, cash)
+
+    def _result(self, i):
+        if i < 0:
+            return None
+        return {
+            "Travel Date": self.start + datetime.timedelta(days=i),
+            "Miles": int(self.miles.values[i]) if self.miles.values[i] != MISSING else None,
+            "Cash": float(self.cash.values[i]) if self.cash.values[i] != MISSING else None,
+        }
+
+    def cheapest_miles(self, start, end):
+        """Date with the fewest miles in ``[start, end]`` and its quote, or None"""
+        return self._result(self.miles.argmin(self._index(start), self._index(end)))
+
+    def cheapest_cash(self, start, end):
+        """Date with the lowest cash fare in ``[start, end]`` and its quote, or None"""
+        return self._result(self.cash.argmin(self._index(start), self._index(end)))
+
+
+class AwardCalendars:
+    """Thread-safe ``RouteCalendar`` per (route, cabin), fed by award quotes"""
+
+    def __init__(self, days=DEFAULT_DAYS):
+        self.days = days
+        self.calendars = {}
+        self.last_rowid = 0
+        self._lock = threading.Lock()
+
+    def record(self, route, cabin, travel_date, miles, cash):
+        if isinstance(travel_date, str):
+            travel_date = datetime.date.fromisoformat(travel_date[:10])
+        with self._lock:
+            calendar = self.calendars.get((route, cabin))
+            if calendar is None:
+                calendar = self.calendars[(route, cabin)] = RouteCalendar(travel_date, self.days)
+            calendar.record(travel_date, miles, cash)
+
+    def record_quote(self, quote):
+        """Listener for ``award_api.add_quote_listener``"""
+        self.record(quote["route"], quote["cabin"], quote["travel_date"], quote["miles"], quote["cash"])
+
+    def catch_up(self, history):
+        """Replay quotes stored in ``history`` since the last call, oldest first"""
+        count = 0
+        while True:
+            rows = history.rows_since(self.last_rowid)
+            if not rows:
+                return count
+            for self.last_rowid, route, cabin, travel_date, miles, cash in rows:
+                self.record(route, cabin, travel_date, miles, cash)
+            count += len(rows)
+
+    def cheapest(self, route, cabin, start, end, by="miles"):
+        """Cheapest quoted date for ``route``/``cabin`` in ``[start, end]`` by miles or cash, or None"""
+        with self._lock:
+            calendar = self.calendars.get((route, cabin))
+            if calendar is None:
+                return None
+            if by == "cash":
+                return calendar.cheapest_cash(start, end)
+            return calendar.cheapest_miles(start, end)
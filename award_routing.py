@@ -0,0 +1,226 @@
+"""Connecting award itineraries built from cached award segments.
+
+Every cached quote is a segment: origin, destination, travel date, miles and
+the cash fare quoted next to them (optionally with a scheduled departure and
+the award's taxes and fees). ``AwardRouter`` keys them by (airport, date) and
+searches for the k cheapest itineraries with up to ``max_stops`` connections,
+where cheapest means ``calculate_miles_value(miles)`` (low estimate) plus
+fees. The cash fare is what the seat would cost instead of miles, so it is
+reported but never added to the award's cost; award searches don't return
+fees, so segments built from them carry none.
+
+Connections must respect minimum connection times (per hub, longer when the
+connection involves an international segment) and a maximum layover. Quotes
+from the award calendar only carry a travel date, so such segments may leave
+any time between ``DAY_START`` and ``DAY_END`` and take the estimated block
+time; scheduled segments leave at their ``depart`` time. All times are read
+as one clock, so time zones are not modelled.
+
+The search recurses over "k cheapest ways to reach the destination from this
+airport, given the departures still catchable there" and memoizes each of
+those sub-results, so hub suffixes such as DEN→EWR are solved once and reused
+by every path that reaches the hub in time for the same flights, and by every
+repeat search until a new segment is added.
+"""
+import datetime
+import heapq
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+
+from airports import flight_hours, get_airport_index
+from calculators import DEFAULT_VALUATION, calculate_miles_value
+
+DAY_START = datetime.time(6, 0)  # Earliest departure of a date-only segment
+DAY_END = datetime.time(22, 0)  # Latest departure of a date-only segment
+DEFAULT_BLOCK_HOURS = 3.0  # When an airport is missing from the bundled dataset
+MAX_CONNECTION_HOURS = 24
+DEFAULT_K = 5
+DEFAULT_MAX_STOPS = 2
+
+# Minimum connection minutes: (domestic, international)
+DEFAULT_MCT = (45, 90)
+AIRPORT_MCT = {
+    "DEN": (40, 75),
+    "EWR": (45, 75),
+    "IAD": (45, 75),
+    "IAH": (45, 75),
+    "LAX": (60, 90),
+    "ORD": (50, 90),
+    "SFO": (45, 75),
+}
+
+
+@dataclass(frozen=True)
+class Segment:
+    """One cached award flight; ``depart`` is None when only the travel date is known.
+
+    ``cash`` is the cash fare for the same flight, ``fees`` the taxes and fees paid on top of the miles.
+    """
+    origin: str
+    destination: str
+    travel_date: datetime.date
+    miles: int
+    cash: float
+    cabin: str = "Economy"
+    depart: datetime.datetime = None
+    block_hours: float = None
+    fees: float = 0.0
+
+    @property
+    def duration(self):
+        hours = self.block_hours or _estimated_hours(self.origin, self.destination)
+        return datetime.timedelta(minutes=round(hours * 60))
+
+    def departure_after(self, ready_at):
+        """Earliest departure at or after ``ready_at`` (None for no limit), or None if it has already left"""
+        if self.depart is not None:
+            return self.depart if ready_at is None or self.depart >= ready_at else None
+        earliest = datetime.datetime.combine(self.travel_date, DAY_START)
+        departure = earliest if ready_at is None else max(earliest, ready_at)
+        return departure if departure <= datetime.datetime.combine(self.travel_date, DAY_END) else None
+
+
+@lru_cache(maxsize=4096)
+def _estimated_hours(origin, destination):
+    return flight_hours(origin, destination) or DEFAULT_BLOCK_HOURS
+
+
+@lru_cache(maxsize=1024)
+def _country(code):
+    index = get_airport_index()
+    i = int(index.lookup(code))
+    return index.countries[i] if i >= 0 else None
+
+
+def is_international(segment):
+    origin, destination = _country(segment.origin), _country(segment.destination)
+    return origin is None or origin != destination
+
+
+def min_connection(airport, arrived_international, departing):
+    """Minimum connection time at ``airport`` onto ``departing``"""
+    domestic, international = AIRPORT_MCT.get(airport, DEFAULT_MCT)
+    minutes = international if arrived_international or is_international(departing) else domestic
+    return datetime.timedelta(minutes=minutes)
+
+
+def segments_from_calendars(calendars, start=None, end=None, cabin=None):
+    """Date-only segments for every quoted date in ``[start, end]`` (default: all) of an ``AwardCalendars``"""
+    segments = []
+    for (route, route_cabin), calendar in list(calendars.calendars.items()):
+        if cabin is not None and route_cabin != cabin:
+            continue
+        origin, destination = route.split("-")
+        first = 0 if start is None else max((start - calendar.start).days, 0)
+        last = calendar.days if end is None else min((end - calendar.start).days + 1, calendar.days)
+        for offset in range(first, last):
+            miles, cash = calendar.miles.values[offset], calendar.cash.values[offset]
+            if miles != float("inf"):
+                day = calendar.start + datetime.timedelta(days=offset)
+                segments.append(Segment(origin, destination, day, int(miles), float(cash), route_cabin))
+    return segments
+
+
+class AwardRouter:
+    """k-cheapest connecting itineraries over a set of cached segments"""
+
+    def __init__(self, segments=(), valuation=DEFAULT_VALUATION, max_connection_hours=MAX_CONNECTION_HOURS):
+        self.valuation = valuation
+        self.max_connection = datetime.timedelta(hours=max_connection_hours)
+        self.departures = defaultdict(list)  # (airport, date) -> segments leaving that day
+        self._memo = {}
+        self._lock = threading.Lock()
+        for segment in segments:
+            self.add(segment)
+
+    def add(self, segment):
+        """Add a segment, replacing an older quote for the same flight (or the same route and day)"""
+        same_flight = (segment.destination, segment.cabin, segment.depart)
+        with self._lock:
+            day = self.departures[(segment.origin, segment.travel_date)]
+            day[:] = [s for s in day if (s.destination, s.cabin, s.depart) != same_flight]
+            day.append(segment)
+            self._memo.clear()  # Any cached sub-result may now be out of date
+
+    def record_quote(self, quote):
+        """Listener for ``award_api.add_quote_listener``"""
+        self.add(Segment(quote["origin"], quote["destination"], datetime.date.fromisoformat(quote["travel_date"][:10]),
+                         quote["miles"], quote["cash"], quote["cabin"], fees=quote.get("fees", 0.0)))
+
+    def cost(self, segment):
+        """Dollar cost of a segment: miles at the low valuation plus taxes and fees"""
+        return calculate_miles_value(segment.miles, valuation=self.valuation)[0] + segment.fees
+
+    def _connections(self, airport, arrived, arrived_international):
+        """``(segment, departure)`` for every segment that can be caught after landing at ``arrived``"""
+        for day in (arrived.date(), arrived.date() + datetime.timedelta(days=1)):
+            for segment in self.departures.get((airport, day), ()):
+                departure = segment.departure_after(arrived + min_connection(airport, arrived_international, segment))
+                if departure is not None and departure - arrived <= self.max_connection:
+                    yield segment, departure
+
+    def _suffixes(self, airport, arrived, arrived_international, destination, legs_left, cabin, k):
+        """Up to ``k`` cheapest ``(cost, legs)`` from ``airport`` to ``destination`` after landing at ``arrived``"""
+        connections = tuple(
+            (segment, departure) for segment, departure in self._connections(airport, arrived, arrived_international)
+            if cabin is None or segment.cabin == cabin
+        )
+        # Keyed on the departures still catchable rather than the arrival time: every arrival
+        # ready before a date-only segment's DAY_START (or between two scheduled departures) shares one entry
+        key = (airport, connections, destination, legs_left, cabin, k)
+        cached = self._memo.get(key)
+        if cached is not None:
+            return cached
+        options = []
+        for segment, departure in connections:
+            options += self._extend(segment, departure, destination, legs_left, cabin, k)
+        self._memo[key] = result = heapq.nsmallest(k, options, key=lambda option: option[0])
+        return result
+
+    def _extend(self, segment, departure, destination, legs_left, cabin, k):
+        """Itineraries starting with ``segment`` (leaving at ``departure``) that reach ``destination``"""
+        leg = (segment, departure, departure + segment.duration)
+        cost = self.cost(segment)
+        if segment.destination == destination:
+            return [(cost, (leg,))]
+        if legs_left <= 1:
+            return []
+        # Ask for a few extra suffixes since ones that loop back through this segment's origin are dropped
+        return [
+            (cost + rest_cost, (leg,) + rest)
+            for rest_cost, rest in self._suffixes(segment.destination, leg[2], is_international(segment), destination,
+                                                    legs_left - 1, cabin, k + 2)
+            if all(later.destination != segment.origin for later, _, _ in rest)
+        ]
+
+    def search(self, origin, destination, travel_date, k=DEFAULT_K, max_stops=DEFAULT_MAX_STOPS, cabin=None):
+        """The ``k`` cheapest itineraries leaving ``origin`` on ``travel_date``, cheapest first"""
+        with self._lock:
+            options = []
+            for segment in self.departures.get((origin, travel_date), ()):
+                departure = segment.departure_after(None)
+                if departure is None or (cabin is not None and segment.cabin != cabin):
+                    continue
+                options += self._extend(segment, departure, destination, max_stops + 1, cabin, k)
+            best = heapq.nsmallest(k, options, key=lambda option: option[0])
+        return [self._itinerary(cost, legs) for cost, legs in best]
+
+    @staticmethod
+    def _itinerary(cost, legs):
+        return {
+            "Route": "-".join([legs[0][0].origin] + [segment.destination for segment, _, _ in legs]),
+            "Stops": len(legs) - 1,
+            "Miles": sum(segment.miles for segment, _, _ in legs),
+            "Fees": sum(segment.fees for segment, _, _ in legs),
+            "Cash Fare": sum(segment.cash for segment, _, _ in legs),
+            "Cost": cost,
+            "Departs": legs[0][1],
+            "Arrives": legs[-1][2],
+            "Legs": [
+                {"From": s.origin, "To": s.destination, "Departs": dep, "Arrives": arr, "Miles": s.miles,
+                 "Fees": s.fees, "Cash Fare": s.cash}
+                for s, dep, arr in legs
+            ],
+        }
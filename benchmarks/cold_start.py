@@ -0,0 +1,114 @@
+"""Cold-start benchmark for the Streamlit apps.
+
+Measures, each in a fresh interpreter:
+
+* import time of the modules the app imports at module level
+  (``python -X importtime``), and
+* time to first render: how long ``AppTest`` takes to run the script once.
+
+Usage::
+
+    python benchmarks/cold_start.py [--runs 5] [--app streamlit_app.py] [--json results.jsonl]
+
+Passing ``--json`` appends one line per invocation so cold-start latency can
+be tracked across commits.
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_RENDER_SNIPPET = """
+import sys, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=60).run()
+elapsed = time.perf_counter() - start
+if at.exception:
+    raise SystemExit(at.exception[0].value)
+print(elapsed)
+"""
+
+
+def _python(*args):
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True, check=True)
+
+
+def app_modules(app):
+    """Modules the app script imports when it starts, i.e. outside function bodies"""
+    with open(os.path.join(ROOT, app), encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=app)
+    modules, pending = [], list(tree.body)
+    while pending:
+        node = pending.pop(0)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            continue  # Deferred imports only load when the function runs
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+        pending.extend(ast.iter_child_nodes(node))
+    return ", ".join(dict.fromkeys(modules))
+
+
+def measure_import(modules):
+    """Total import time in seconds plus the slowest top-level imports"""
+    result = _python("-X", "importtime", "-c", f"import {modules}")
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            # Top-level imports are not indented
+            timings.append((int(cumulative), name.rstrip(), not name[1:].startswith(" ")))
+    top_level = [(us, name.strip()) for us, name, is_top in timings if is_top]
+    return sum(us for us, _ in top_level) / 1e6, sorted(top_level, reverse=True)[:5]
+
+
+def measure_first_render(app):
+    """Seconds from AppTest start until the first script run completes"""
+    return float(_python("-c", FIRST_RENDER_SNIPPET, os.path.join(ROOT, app)).stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--app", default="streamlit_app.py")
+    parser.add_argument("--json", help="Append the summary as one JSON line to this file")
+    args = parser.parse_args()
+
+    modules = app_modules(args.app)
+    import_times, render_times, slowest = [], [], []
+    for _ in range(args.runs):
+        total, slowest = measure_import(modules)
+        import_times.append(total)
+        render_times.append(measure_first_render(args.app))
+
+    summary = {
+        "app": args.app,
+        "runs": args.runs,
+        "timestamp": time.time(),
+        "import_median_s": statistics.median(import_times),
+        "first_render_median_s": statistics.median(render_times),
+        "first_render_max_s": max(render_times),
+    }
+    print(f"Import time (median of {args.runs}):         {summary['import_median_s'] * 1000:8.1f} ms")
+    print(f"Time to first render (median of {args.runs}): {summary['first_render_median_s'] * 1000:8.1f} ms")
+    print("Slowest top-level imports:")
+    for us, name in slowest:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    if args.json:
+        with open(args.json, "a", encoding="utf-8") as f:
+            f.write(json.dumps(summary) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""Concurrent-session load test for the Streamlit app.
+
+Starts the app with ``streamlit run`` and connects N headless users to it over
+the same websocket protocol the browser uses (protobuf ``BackMsg`` /
+``ForwardMsg`` on ``/_stcore/stream``). Each user visits all five tabs in a
+random order, types realistic inputs (one rerun per widget change, as in the
+browser, including fragment reruns), presses the tab's evaluate button, and
+repeats.
+
+Reports rerun latency percentiles (overall, per action and per tab: from
+sending the change until ``script_finished`` arrives), reruns per second, and
+the server process's CPU use and resident memory per session, so a deployment
+can be sized. ``AppTest`` is not used because it swaps a process-global
+runtime in and out on every run and so cannot run sessions concurrently.
+
+Usage::
+
+    python benchmarks/load_test.py [--sessions 8] [--iterations 2] [--think-ms 0] [--json results.jsonl]
+    python benchmarks/load_test.py --sessions 1 4 16 32    # a fresh server per level
+
+CPU and memory are read from ``/proc`` (Linux); pass ``--url`` to load an
+already running server instead, in which case only latency is reported.
+Passing ``--json`` appends one summary line per level so capacity can be
+tracked across commits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PERCENTILES = (50, 90, 95, 99)
+RERUN_TIMEOUT_S = 60
+STARTUP_TIMEOUT_S = 60
+
+
+def _k(value):
+    return f"{value / 1000:g}K"
+
+
+def ticket_inputs(rng):
+    miles = rng.choice([12500, 25000, 30000, 45000, 60000, 88000])
+    return {
+        "purchase_miles": _k(miles),
+        "purchase_cash": str(round(miles * rng.uniform(0.008, 0.02))),
+    }, "Evaluate Best Purchase Option"
+
+
+def break_even_inputs(rng):
+    if rng.random() < 0.5:
+        return {
+            "valuation_method": "I have miles required - tell me max cash price",
+            "breakeven_miles": _k(rng.choice([13600, 25000, 50000, 80000])),
+        }, "Calculate Maximum Cash Price"
+    return {
+        "valuation_method": "I have cash price - tell me max miles",
+        "breakeven_cash": str(rng.choice([250, 480, 900, 1500])),
+    }, "Calculate Maximum Miles"
+
+
+def upgrade_inputs(rng):
+    origin, destination = rng.choice([("SFO", "EWR"), ("ORD", "LHR"), ("IAH", "DEN"), ("EWR", "NRT")])
+    return {
+        "upgrade_origin": origin,
+        "upgrade_destination": destination,
+        "upgrade_miles": _k(rng.choice([15000, 20000, 40000])),
+        "upgrade_mixed_cash": str(rng.choice([0, 200, 500])),
+        "upgrade_cash_only": str(rng.choice([350, 800, 1500])),
+    }, "Evaluate Upgrade Offer"
+
+
+def accelerator_inputs(rng):
+    miles = rng.choice([5000, 10000, 25000, 50000])
+    return {
+        "accelerator_miles": _k(miles),
+        "accelerator_pqp": str(rng.choice([0, 250, 500, 1000])),
+        "accelerator_cost": str(round(miles * rng.uniform(0.01, 0.035))),
+    }, "Evaluate Award Accelerator"
+
+
+def buy_miles_inputs(rng):
+    miles = rng.choice([10000, 30000, 60000, 100000])
+    return {
+        "purchase_price": str(round(miles * rng.uniform(0.011, 0.035))),
+        "purchase_miles_offer": _k(miles),
+        "purchase_miles_bonus_offer": _k(miles * rng.choice([0, 0.25, 0.5])),
+    }, "Evaluate the Offer"
+
+
+# Tab label -> rng -> ({widget key: text/radio value} in the order a user fills them, evaluate button label)
+SCENARIOS = {
+    "🎟️ Ticket Purchase": ticket_inputs,
+    "💰 Break-Even Calculator": break_even_inputs,
+    "💺 Upgrade Offer": upgrade_inputs,
+    "🏆 Award Accelerator": accelerator_inputs,
+    "💵 Buy Miles": buy_miles_inputs,
+}
+
+
+class ServerProcess:
+    """``streamlit run`` on a free local port, with CPU and memory readings from ``/proc``"""
+
+    def __init__(self, app):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        self.url = f"ws://127.0.0.1:{self.port}/_stcore/stream"
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", app, "--server.headless", "true",
+             "--server.port", str(self.port), "--server.address", "127.0.0.1",
+             "--server.enableXsrfProtection", "false", "--browser.gatherUsageStats", "false"],
+            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+        deadline = time.monotonic() + STARTUP_TIMEOUT_S
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{self.port}/_stcore/health", timeout=1):
+                    return
+            except OSError:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError(f"streamlit did not start: {self.process.stderr.read().decode()[-2000:]}")
+                time.sleep(0.2)
+
+    def cpu_seconds(self):
+        try:
+            with open(f"/proc/{self.process.pid}/stat", encoding="ascii") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            return None
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")  # utime + stime
+
+    def rss_mb(self):
+        try:
+            with open(f"/proc/{self.process.pid}/status", encoding="ascii") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        return None
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def _element_ids(message, found):
+    """``(widget id, label)`` for every widget or keyed block inside a protobuf message"""
+    for field, value in message.ListFields():
+        if field.name == "id" and isinstance(value, str) and value.startswith("$$ID"):
+            found.append((value, getattr(message, "label", None)))
+        elif field.message_type is not None:
+            for item in value if field.is_repeated else (value,):
+                _element_ids(item, found)
+
+
+class Session:
+    """One simulated browser; ``timings`` holds ``(tab, action, seconds)`` per rerun"""
+
+    def __init__(self, url, seed, think_ms=0):
+        self.url = url
+        self.rng = random.Random(seed)
+        self.think_ms = think_ms
+        self.widgets = {}  # user key (or label, for widgets without a key) -> (widget id, fragment id)
+        self.timings = []
+        self.errors = []
+        self.ws = None
+
+    async def connect(self):
+        from websockets.asyncio.client import connect
+
+        self.ws = await connect(self.url, max_size=None)
+
+    async def close(self):
+        await self.ws.close()
+
+    async def _rerun(self, tab, action, widget_states=(), fragment_id=""):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        message = BackMsg()
+        message.rerun_script.fragment_id = fragment_id
+        message.rerun_script.widget_states.widgets.extend(widget_states)
+        start = time.perf_counter()
+        await self.ws.send(message.SerializeToString())
+        async with asyncio.timeout(RERUN_TIMEOUT_S):
+            while True:
+                reply = ForwardMsg()
+                reply.ParseFromString(await self.ws.recv())
+                kind = reply.WhichOneof("type")
+                if kind == "delta":
+                    self._read_delta(tab, reply.delta)
+                elif kind == "script_finished":
+                    break
+        self.timings.append((tab, action, time.perf_counter() - start))
+        if reply.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+            self.errors.append(f"{tab} / {action}: script failed to compile")
+
+    def _read_delta(self, tab, delta):
+        found = []
+        _element_ids(delta, found)
+        for widget_id, label in found:
+            key = widget_id.rsplit("-", 1)[1]
+            self.widgets[label if key == "None" else key] = (widget_id, delta.fragment_id)
+        element = delta.new_element
+        if delta.WhichOneof("type") == "new_element" and element.WhichOneof("type") == "exception":
+            self.errors.append(f"{tab}: {element.exception.type}: {element.exception.message}")
+
+    async def _change(self, tab, action, key, **value):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        widget_id, fragment_id = self.widgets[key]
+        await self._rerun(tab, action, [WidgetState(id=widget_id, **value)], fragment_id)
+
+    async def _think(self):
+        if self.think_ms:
+            await asyncio.sleep(self.rng.expovariate(1000 / self.think_ms))
+
+    async def visit(self, tab):
+        await self._change(tab, "switch tab", "active_tab", string_value=tab)
+        inputs, button = SCENARIOS[tab](self.rng)
+        for key, value in inputs.items():
+            await self._think()
+            await self._change(tab, "input", key, string_value=value)
+        await self._think()
+        await self._change(tab, "evaluate", button, trigger_value=True)
+
+    async def run(self, iterations):
+        await self._rerun(None, "page load")
+        for _ in range(iterations):
+            for tab in self.rng.sample(list(SCENARIOS), len(SCENARIOS)):
+                await self.visit(tab)
+        return self
+
+
+def percentiles(seconds):
+    """``{"p50_ms": ..., ..., "max_ms": ...}`` for a list of latencies"""
+    if len(seconds) < 2:
+        seconds = list(seconds) * 2
+    cuts = statistics.quantiles(seconds, n=100, method="inclusive")
+    result = {f"p{p}_ms": cuts[p - 1] * 1000 for p in PERCENTILES}
+    result["max_ms"] = max(seconds) * 1000
+    return result
+
+
+async def run_level(url, sessions, iterations, think_ms=0, seed=0, server=None):
+    """Run ``sessions`` concurrent users and summarize latency, throughput and server CPU and memory"""
+    # Warm imports and shared caches first so the baseline excludes one-off costs
+    warm = Session(url, seed=-1)
+    await warm.connect()
+    await warm.run(iterations=1)
+    await warm.close()
+
+    baseline_mb = server.rss_mb() if server else None
+    cpu_start = server.cpu_seconds() if server else None
+    users = [Session(url, seed=seed * 10_000 + i, think_ms=think_ms) for i in range(sessions)]
+    await asyncio.gather(*(user.connect() for user in users))
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(user.run(iterations) for user in users))
+    wall = time.perf_counter() - wall_start
+    cpu = server.cpu_seconds() - cpu_start if server and cpu_start is not None else None
+    loaded_mb = server.rss_mb() if server else None  # Every session is still connected here
+    await asyncio.gather(*(user.close() for user in users))
+    timings = [t for user in users for t in user.timings]
+
+    def by(index):
+        groups = {}
+        for timing in timings:
+            if timing[index] is not None:
+                groups.setdefault(timing[index], []).append(timing[2])
+        return {name: percentiles(values) for name, values in groups.items()}
+
+    return {
+        "sessions": sessions,
+        "iterations": iterations,
+        "think_ms": think_ms,
+        "timestamp": time.time(),
+        "reruns": len(timings),
+        "errors": [e for user in users for e in user.errors][:10],
+        "wall_s": wall,
+        "reruns_per_s": len(timings) / wall,
+        "cpu_s": cpu,
+        "cpu_cores": cpu / wall if cpu is not None else None,
+        "cpu_ms_per_rerun": cpu / len(timings) * 1000 if cpu is not None else None,
+        "rss_baseline_mb": baseline_mb,
+        "rss_loaded_mb": loaded_mb,
+        "rss_per_session_mb": (loaded_mb - baseline_mb) / sessions if loaded_mb is not None else None,
+        "latency": percentiles([seconds for _, _, seconds in timings]),
+        "latency_by_action": by(1),
+        "latency_by_tab": by(0),
+    }
+
+
+def _latency_row(name, stats):
+    cells = "".join(f"{stats[f'p{p}_ms']:9.1f}" for p in PERCENTILES)
+    return f"  {name:<26}{cells}{stats['max_ms']:9.1f}"
+
+
+def _fmt(value, spec):
+    return "n/a" if value is None else format(value, spec)
+
+
+def print_report(summary):
+    print(f"Sessions: {summary['sessions']}   Reruns: {summary['reruns']}   Wall: {summary['wall_s']:.1f} s   "
+          f"Throughput: {summary['reruns_per_s']:.1f} reruns/s")
+    print(f"Server CPU: {_fmt(summary['cpu_s'], '.1f')} s ({_fmt(summary['cpu_cores'], '.2f')} cores, "
+          f"{_fmt(summary['cpu_ms_per_rerun'], '.1f')} ms per rerun)")
+    print(f"Server memory: {_fmt(summary['rss_baseline_mb'], '.0f')} MB baseline, "
+          f"{_fmt(summary['rss_loaded_mb'], '.0f')} MB loaded, "
+          f"{_fmt(summary['rss_per_session_mb'], '.2f')} MB per session")
+    print(f"\n  {'Rerun latency (ms)':<26}" + "".join(f"{'p' + str(p):>9}" for p in PERCENTILES) + f"{'max':>9}")
+    print(_latency_row("all", summary["latency"]))
+    for group in ("latency_by_action", "latency_by_tab"):
+        for name, stats in summary[group].items():
+            print(_latency_row(name, stats))
+    if summary["errors"]:
+        print("\nScript errors:")
+        for error in summary["errors"]:
+            print(f"  {error}")
+
+
+def print_sweep(summaries):
+    print(f"{'sessions':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'reruns/s':>10}{'cores':>7}{'MB/sess':>9}")
+    for s in summaries:
+        print(f"{s['sessions']:>8}{s['latency']['p50_ms']:>9.1f}{s['latency']['p95_ms']:>9.1f}"
+              f"{s['latency']['p99_ms']:>9.1f}{s['reruns_per_s']:>10.1f}{_fmt(s['cpu_cores'], '.2f'):>7}"
+              f"{_fmt(s['rss_per_session_mb'], '.2f'):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[8],
+                        help="Concurrent users; several values run one level each against a fresh server")
+    parser.add_argument("--iterations", type=int, default=2, help="Passes over all five tabs per user")
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean pause between a user's actions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--app", default="streamlit_app.py")
+    parser.add_argument("--url", help="Websocket URL of a running app (e.g. ws://host:8501/_stcore/stream)")
+    parser.add_argument("--json", help="Append each level's summary as one JSON line to this file")
+    args = parser.parse_args()
+
+    summaries = []
+    for sessions in args.sessions:
+        server = None if args.url else ServerProcess(os.path.join(ROOT, args.app))
+        try:
+            summary = asyncio.run(run_level(args.url or server.url, sessions, args.iterations,
+                                            args.think_ms, args.seed, server))
+        finally:
+            if server is not None:
+                server.stop()
+        summary["app"] = args.url or args.app
+        summaries.append(summary)
+        if len(args.sessions) == 1:
+            print_report(summary)
+    if len(args.sessions) > 1:
+        print_sweep(summaries)
+
+    if args.json:
+        with open(args.json, "a", encoding="utf-8") as f:
+            for summary in summaries:
+                f.write(json.dumps(summary) + "\n")
+
+
+if __name__ == "__main__":
+    main()
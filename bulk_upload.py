@@ -0,0 +1,399 @@
+"""Bulk evaluation of uploaded spreadsheets of offers.
+
+A CSV or XLSX file holds one offer per row, with the same column names as the
+JSON API (``miles_price``, ``cash_price``, ... for tickets; ``miles``,
+``cash_cost``, ``full_cash_upgrade``, ... for upgrades; ``miles``, ``pqp``,
+``cost`` for accelerators); missing columns take the API's defaults. Upgrade
+rows may give ``origin`` and ``destination`` airport codes instead of
+``travel_hours``; the whole column of routes is turned into block-time
+estimates by ``airports`` in one vectorized call. Cells go through
+``parse_user_input`` like the form fields, so "13.6K" works, but each distinct
+value in a chunk is parsed only once.
+
+The file is read and evaluated ``CHUNK_ROWS`` rows at a time by numpy versions
+of the ``*_figures`` functions (upgrade verdicts come from the precomputed
+``UpgradeVerdictTable``; the tests check every evaluator against its scalar
+version). Only the raw figures are kept: formatted text is produced a page at
+a time for display and a chunk at a time for the CSV download. Reading XLSX
+needs the optional ``openpyxl`` package.
+"""
+import io
+import math
+import os
+import tempfile
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from calculators import (
+    DEFAULT_VALUATION,
+    cabin_classes,
+    evaluate_accelerator,
+    evaluate_best_option,
+    evaluate_upgrade,
+    parse_user_input,
+    upgrade_comfort_factor,
+    upgrade_multipliers,
+)
+from evaluation_history import field_label
+from verdict_rules import get_rules
+
+CHUNK_ROWS = 5000
+PAGE_ROWS = 25
+MAX_ROWS = int(os.environ.get("UNITED_MILES_BULK_MAX_ROWS", "200000"))
+UPLOAD_TYPES = ["csv", "xlsx"]
+
+# Input columns per offer type, with their defaults (as in the JSON API)
+OFFER_FIELDS = {
+    "ticket": {"miles_price": 0, "cash_price": 0, "miles_plus_cash_miles": 0, "miles_plus_cash_cash": 0},
+    "upgrade": {
+        "miles": 0, "cash_cost": 0, "full_cash_upgrade": 0, "full_fare_cost": 0, "travel_hours": 1,
+        "from_class": cabin_classes[0], "to_class": cabin_classes[-1],
+    },
+    "accelerator": {"miles": 0, "pqp": 0, "cost": 0},
+}
+CABIN_FIELDS = ("from_class", "to_class")
+# Optional upgrade columns: rows with a route but no travel_hours get the estimated block time
+ROUTE_FIELDS = {"upgrade": ("origin", "destination")}
+# Figures the scalar evaluators leave as None; a results frame holds them as NaN
+OPTIONAL_FIGURES = {
+    "ticket": {"total_cost_mixed_low", "total_cost_mixed_high", "advice"},
+    "upgrade": {"miles_cash_upgrade_low", "miles_cash_upgrade_high", "savings_miles_cash_low",
+                "savings_miles_cash_high", "warning"},
+    "accelerator": {"cost_per_mile", "pqp_cost_low", "pqp_cost_high"},
+}
+FORMATTERS = {"ticket": evaluate_best_option, "upgrade": evaluate_upgrade, "accelerator": evaluate_accelerator}
+SAME_CABIN_WARNING = "⚠️ You've selected the same cabin class for both options. No upgrade needed."
+
+
+class BulkUploadError(ValueError):
+    """An uploaded file that cannot be evaluated; shown to the user as is"""
+
+
+def normalize_header(name):
+    return "_".join(str(name).strip().lower().replace("-", " ").split())
+
+
+def parse_amounts(cells):
+    """``parse_user_input`` over a column of cells, parsing each distinct value once"""
+    codes, uniques = pd.factorize(cells)
+    # Code -1 (a missing cell) picks the trailing 0, like an empty form field
+    parsed = np.array([parse_user_input(str(value)) for value in uniques] + [0], dtype=float)
+    return parsed[codes]
+
+
+def _xlsx_chunks(data, chunk_rows):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise BulkUploadError("Reading .xlsx files needs the openpyxl package (pip install openpyxl); upload a CSV instead") from None
+    workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = ["" if cell is None else str(cell) for cell in header]
+        width = len(columns)
+        batch = []
+        for row in rows:
+            if all(cell is None for cell in row):
+                continue
+            cells = ["" if cell is None else str(cell) for cell in row[:width]]
+            batch.append(cells + [""] * (width - len(cells)))
+            if len(batch) == chunk_rows:
+                yield pd.DataFrame(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns)
+    finally:
+        workbook.close()
+
+
+def read_chunks(data, filename, chunk_rows=CHUNK_ROWS):
+    """Cells of an uploaded CSV or XLSX file as string DataFrames of at most ``chunk_rows`` rows"""
+    if filename.lower().endswith(".xlsx"):
+        yield from _xlsx_chunks(data, chunk_rows)
+        return
+    try:
+        with pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False, chunksize=chunk_rows) as reader:
+            yield from reader
+    except pd.errors.EmptyDataError:
+        return
+    except (pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise BulkUploadError(f"Could not read {filename} as CSV: {e}") from None
+
+
+def estimate_rows(data, filename):
+    """Approximate number of data rows for progress reporting, or None when unknown"""
+    if filename.lower().endswith(".xlsx"):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            return None
+        workbook = load_workbook(io.BytesIO(data), read_only=True)
+        try:
+            max_row = workbook.active.max_row  # From the sheet's recorded dimension, if any
+        finally:
+            workbook.close()
+        return max_row - 1 if max_row else None
+    lines = data.count(b"\n") + (0 if data.endswith(b"\n") else 1)
+    return max(lines - 1, 0)  # Less the header; quoted line breaks make this an upper bound
+
+
+def offer_inputs(cells, offer):
+    """Evaluator inputs for a chunk of cells: amounts parsed, cabins stripped, missing columns defaulted"""
+    cells = cells.rename(columns=normalize_header)
+    cells = cells.loc[:, ~cells.columns.duplicated()]
+    inputs = {}
+    for field, default in OFFER_FIELDS[offer].items():
+        if field not in cells:
+            inputs[field] = np.full(len(cells), default, dtype=object if field in CABIN_FIELDS else float)
+        elif field in CABIN_FIELDS:
+            inputs[field] = cells[field].str.strip().replace("", default).to_numpy(dtype=object)
+        else:
+            inputs[field] = parse_amounts(cells[field])
+    route = ROUTE_FIELDS.get(offer)
+    if route and all(field in cells for field in route):
+        inputs["travel_hours"] = _route_hours(cells, inputs["travel_hours"])
+    return pd.DataFrame(inputs)
+
+
+def _route_hours(cells, hours):
+    """``hours``, with blank travel_hours cells filled from the origin/destination block-time estimate"""
+    from airports import get_airport_index  # Loads the airport dataset only for files with routes
+    blank = cells["travel_hours"].str.strip().eq("").to_numpy() if "travel_hours" in cells else True
+    estimated = get_airport_index().block_hours(cells["origin"].to_numpy(dtype=str), cells["destination"].to_numpy(dtype=str))
+    return np.where(blank & ~np.isnan(estimated), estimated, hours)
+
+
+def _divide(numerator, denominator, where, fill=np.nan):
+    return np.divide(numerator, denominator, out=np.full(len(numerator), fill, dtype=float), where=where)
+
+
+def _input_errors(errors):
+    """Object array of the first failing check per row, checks given in order of precedence"""
+    result = np.full(len(errors[0][0]), None, dtype=object)
+    for failed, message in reversed(errors):
+        result[failed] = message
+    return result
+
+
+def ticket_figures_frame(inputs, valuation=DEFAULT_VALUATION, verdict_table=None):
+    """``best_option_figures`` for every row of ``inputs``"""
+    miles, cash = inputs["miles_price"].to_numpy(), inputs["cash_price"].to_numpy()
+    mixed_miles, mixed_cash = inputs["miles_plus_cash_miles"].to_numpy(), inputs["miles_plus_cash_cash"].to_numpy()
+    value_low, value_high = miles * valuation.low, miles * valuation.high
+    valid_mixed = (mixed_miles > 0) & (mixed_cash > 0)
+    mixed_low = np.where(valid_mixed, mixed_miles * valuation.low + mixed_cash, np.inf)
+    mixed_high = np.where(valid_mixed, mixed_miles * valuation.high + mixed_cash, np.inf)
+
+    # Cheapest positive cost of Cash, Miles and Miles + Cash; ties go to the first, like min()
+    costs = np.column_stack([cash, value_low, mixed_low])
+    options = np.array(["Cash", "Miles", "Miles + Cash"], dtype=object)
+    best = options[np.argmin(np.where(costs > 0, costs, np.inf), axis=1)]
+
+    with np.errstate(invalid="ignore", over="ignore"):
+        cpm_miles = _divide(cash, miles, miles > 0, fill=0) * 100
+        cpm_mixed = _divide(cash - mixed_cash, mixed_miles, mixed_miles > 0, fill=0) * 100
+    advice = np.full(len(inputs), None, dtype=object)
+    advice[(best == "Miles") & (cpm_miles > 1.5)] = "🎯 Great redemption value! Above average cents-per-mile."
+    advice[(best == "Miles + Cash") & (cpm_mixed > 1.5)] = "🎯 Good value for your miles in the Miles + Cash option!"
+
+    return pd.DataFrame({
+        "miles_value_low": value_low,
+        "miles_value_high": value_high,
+        "total_cost_miles_low": value_low,
+        "total_cost_miles_high": value_high,
+        "total_cost_mixed_low": np.where(valid_mixed, mixed_low, np.nan),
+        "total_cost_mixed_high": np.where(valid_mixed, mixed_high, np.nan),
+        "total_cost_cash": cash,
+        "cpm_miles": cpm_miles,
+        "cpm_mixed": cpm_mixed,
+        "best_option": best,
+        "advice": advice,
+    })
+
+
+def upgrade_figures_frame(inputs, valuation=DEFAULT_VALUATION, verdict_table=None):
+    """``upgrade_figures`` (with a verdict table) for every row of ``inputs``"""
+    if verdict_table is None:
+        from upgrade_table import load_upgrade_table
+        verdict_table = load_upgrade_table()
+    miles, cash_cost = inputs["miles"].to_numpy(), inputs["cash_cost"].to_numpy()
+    full_cash_upgrade, original_full_fare = inputs["full_cash_upgrade"].to_numpy(), inputs["full_fare_cost"].to_numpy()
+    hours = inputs["travel_hours"].to_numpy()
+    from_class, to_class = inputs["from_class"].to_numpy(dtype=object), inputs["to_class"].to_numpy(dtype=object)
+    cabins = ", ".join(cabin_classes)
+    error = _input_errors([
+        (~np.isin(from_class, cabin_classes), f"from_class must be one of: {cabins}"),
+        (~np.isin(to_class, cabin_classes), f"to_class must be one of: {cabins}"),
+        (cash_cost < 0, "Cost cannot be negative"),
+        (miles < 0, "Miles cannot be negative"),
+    ])
+    same_cabin = from_class == to_class
+
+    comfort_factor = upgrade_comfort_factor(hours)
+    multiplier = np.array([upgrade_multipliers.get(pair, 1.0) for pair in zip(from_class, to_class)], dtype=float)
+    full_fare = np.where(original_full_fare == 0, np.maximum(full_cash_upgrade * 1.5, 1000), original_full_fare)
+    cash_cost = np.where((miles == 0) & (cash_cost == 0), full_cash_upgrade, cash_cost)
+    worth_low, worth_high = miles * valuation.low, miles * valuation.high
+    mixed_low, mixed_high = cash_cost + worth_low, cash_cost + worth_high
+    savings_low = (full_fare - mixed_high) * comfort_factor * multiplier
+    savings_high = (full_fare - mixed_low) * comfort_factor * multiplier
+    cash_upgrade = np.where(full_cash_upgrade == 0, full_fare, full_cash_upgrade)
+    savings_cash = (full_fare - cash_upgrade) * comfort_factor * multiplier
+
+    evaluated = np.equal(error, None) & ~same_cabin
+    best = np.full(len(inputs), None, dtype=object)
+    warning = np.where(same_cabin, SAME_CABIN_WARNING, None).astype(object)
+    best[evaluated], warning[evaluated] = verdict_table.lookup_many(*(
+        values[evaluated] for values in (hours, from_class, to_class, cash_upgrade, full_fare,
+                                         miles, cash_cost, mixed_low, original_full_fare)
+    ), valuation=valuation)
+    warning[~np.equal(error, None)] = None
+
+    has_miles = evaluated & (miles > 0)
+    frame = pd.DataFrame({
+        "miles_worth_low": worth_low,
+        "miles_worth_high": worth_high,
+        "miles_cash_upgrade_low": np.where(has_miles, mixed_low, np.nan),
+        "miles_cash_upgrade_high": np.where(has_miles, mixed_high, np.nan),
+        "cash_upgrade_cost": cash_upgrade,
+        "full_fare_cost": full_fare,
+        "savings_miles_cash_low": np.where(has_miles, savings_low, np.nan),
+        "savings_miles_cash_high": np.where(has_miles, savings_high, np.nan),
+        "savings_cash_upgrade": savings_cash,
+        "best_option": best,
+        "warning": warning,
+        "comfort_factor": comfort_factor,
+        "error": error,
+    })
+    numbers = [column for column in frame if column not in ("best_option", "warning", "error")]
+    frame.loc[~evaluated, numbers] = np.nan
+    return frame
+
+
+def accelerator_figures_frame(inputs, valuation=DEFAULT_VALUATION, verdict_table=None):
+    """``accelerator_figures`` for every row of ``inputs``"""
+    miles, pqp, cost = (inputs[field].to_numpy() for field in ("miles", "pqp", "cost"))
+    error = _input_errors([(cost < 0, "Cost cannot be negative"), (miles < 0, "Miles cannot be negative")])
+    rules = get_rules()
+    worth_low, worth_high = miles * valuation.low, miles * valuation.high
+    effective_low = np.where(pqp != 0, cost - worth_high, cost)
+    effective_high = np.where(pqp != 0, cost - worth_low, cost)
+    with np.errstate(invalid="ignore", over="ignore"):
+        cost_per_mile = _divide(cost, miles, miles > 0)
+        pqp_cost_low = _divide(effective_low, pqp, pqp > 0)
+        pqp_cost_high = _divide(effective_high, pqp, pqp > 0)
+    verdict = np.where(
+        pqp > 0,
+        rules.pqp_cost.classify_many(pqp_cost_low),
+        rules.cost_per_mile.classify_many(np.where(miles > 0, cost_per_mile, np.inf)),
+    )
+    frame = pd.DataFrame({
+        "miles_worth_low": worth_low,
+        "miles_worth_high": worth_high,
+        "cost_per_mile": cost_per_mile,
+        "pqp_cost_low": pqp_cost_low,
+        "pqp_cost_high": pqp_cost_high,
+        "cpm": np.where(miles > 0, cost_per_mile * 100, 0),
+        "verdict": verdict,
+        "error": error,
+    })
+    failed = ~np.equal(error, None)
+    frame.loc[failed, [column for column in frame if column != "error"]] = None
+    return frame
+
+
+FIGURES_FRAMES = {
+    "ticket": ticket_figures_frame,
+    "upgrade": upgrade_figures_frame,
+    "accelerator": accelerator_figures_frame,
+}
+
+
+def evaluate_upload(data, filename, offer, valuation=DEFAULT_VALUATION, verdict_table=None,
+                    chunk_rows=CHUNK_ROWS, max_rows=MAX_ROWS):
+    """Evaluate an uploaded file chunk by chunk, yielding ``(rows_done, results)`` per chunk.
+
+    ``results`` has the 1-based data ``row``, the parsed inputs (prefixed
+    ``input_``) and the raw figures. Stops after ``max_rows`` rows.
+    """
+    done = 0
+    for cells in read_chunks(data, filename, chunk_rows):
+        if done == 0 and not set(map(normalize_header, cells.columns)) & {*OFFER_FIELDS[offer], *ROUTE_FIELDS.get(offer, ())}:
+            raise BulkUploadError(f"No {offer} columns found; expected some of: {', '.join(OFFER_FIELDS[offer])}")
+        cells = cells.iloc[:max_rows - done]
+        inputs = offer_inputs(cells, offer)
+        figures = FIGURES_FRAMES[offer](inputs, valuation=valuation, verdict_table=verdict_table)
+        rows = pd.DataFrame({"row": np.arange(done + 1, done + len(cells) + 1)})
+        done += len(cells)
+        yield done, pd.concat([rows, inputs.add_prefix("input_"), figures], axis=1)
+        if done >= max_rows:
+            return
+
+
+def combine_results(chunks):
+    """One results frame from the evaluated chunks, with repeated labels stored as categories"""
+    if not chunks:
+        return pd.DataFrame()
+    frame = pd.concat(chunks, ignore_index=True)
+    for column in frame.columns[frame.dtypes == object]:
+        frame[column] = frame[column].astype("category")
+    return frame
+
+
+def _missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+@lru_cache(maxsize=None)
+def result_columns(offer):
+    """Columns of a formatted results table, in a fixed order across chunks"""
+    fields = list(OFFER_FIELDS[offer])
+    sample = {"ticket": (2, 2, 1, 1), "upgrade": (1, 1, 1, 1, 1, cabin_classes[0], cabin_classes[-1]),
+              "accelerator": (1, 1, 1)}[offer]
+    columns = ["Row", *map(field_label, fields), *FORMATTERS[offer](*sample)]
+    return columns + (["Error"] if offer != "ticket" else [])
+
+
+def format_results(results, offer):
+    """Formatted results (as in the tabs) for some rows of an ``evaluate_upload`` frame"""
+    fields = list(OFFER_FIELDS[offer])
+    labels = list(map(field_label, fields))
+    figure_columns = [c for c in results.columns if c != "row" and not c.startswith("input_")]
+    optional = OPTIONAL_FIGURES[offer]
+    rows = []
+    for record in results.to_dict("records"):
+        inputs = [record[f"input_{field}"] for field in fields]
+        if not _missing(record.get("error")):
+            figures = {"error": record["error"]}
+        elif offer == "upgrade" and _missing(record["best_option"]):
+            figures = {"best_option": None, "warning": record["warning"]}
+        else:
+            figures = {name: None if name in optional and _missing(record[name]) else record[name]
+                       for name in figure_columns if name != "error"}
+        formatted = FORMATTERS[offer](*inputs, figures=figures)
+        rows.append({"Row": record["row"], **dict(zip(labels, inputs)), **formatted})
+    return pd.DataFrame(rows).reindex(columns=result_columns(offer))
+
+
+def export_csv(results, offer, chunk_rows=CHUNK_ROWS):
+    """Formatted results as CSV, yielded as bytes one chunk of rows at a time"""
+    for start in range(0, max(len(results), 1), chunk_rows):
+        yield format_results(results.iloc[start:start + chunk_rows], offer).to_csv(index=False, header=start == 0).encode()
+
+
+def spool_csv(results, offer, chunk_rows=CHUNK_ROWS):
+    """
+    ``export_csv`` written chunk by chunk to an anonymous temporary file,
+    rewound for reading, so the full CSV is never assembled in memory before
+    the download button reads it.
+    """
+    spool = tempfile.TemporaryFile(buffering=0)  # Unbuffered, so st.download_button takes it as raw file data
+    with open(spool.fileno(), "wb", closefd=False) as out:
+        out.writelines(export_csv(results, offer, chunk_rows))
+    spool.seek(0)
+    return spool
@@ -0,0 +1,487 @@
+"""Pure calculation helpers shared by the United Miles evaluator apps."""
+from dataclasses import dataclass
+
+from metrics import instrumented
+from verdict_rules import get_rules
+
+# Constants for easier maintenance
+MILE_VALUE_LOW = 0.012  # United miles valuation low (1.2 cents)
+MILE_VALUE_HIGH = 0.015  # United miles valuation high (1.5 cents)
+ADVICE_CPM = 1.5  # Cents per mile a ticket redemption must beat for the advice when the route has no history
+
+# Cabin Class Options
+cabin_classes = ["Economy", "Premium Plus", "Business (Polaris)"]
+
+# Upgrade Value Multipliers
+upgrade_multipliers = {
+    ("Economy", "Premium Plus"): 1.2,
+    ("Economy", "Business (Polaris)"): 1.5,
+    ("Premium Plus", "Business (Polaris)"): 1.3,
+    ("Business (Polaris)", "Business (Polaris)"): 1.0,  # No upgrade
+    ("Economy", "Economy"): 1.0,  # No upgrade
+    ("Premium Plus", "Premium Plus"): 1.0,  # No upgrade
+}
+
+@dataclass(frozen=True)
+class MileValuation:
+    """
+    Dollar value of one mile (low and high estimate).
+
+    Immutable and hashable so it can be passed to every evaluator explicitly,
+    used as a cache key and shipped to threads or worker processes.
+    """
+    low: float = MILE_VALUE_LOW
+    high: float = MILE_VALUE_HIGH
+
+    @classmethod
+    def from_cents(cls, low_cents, high_cents):
+        """Build a valuation from cents-per-mile figures as shown in the UI"""
+        return cls(low_cents / 100, high_cents / 100)
+
+DEFAULT_VALUATION = MileValuation()
+
+# Helper functions
+def calculate_miles_value(miles, low_val=None, high_val=None, valuation=DEFAULT_VALUATION):
+    """Calculate low and high dollar value of miles"""
+    if low_val is None:
+        low_val = valuation.low
+    if high_val is None:
+        high_val = valuation.high
+    return miles * low_val, miles * high_val
+
+def format_currency(value):
+    """Format a value as USD currency"""
+    return f"${value:.2f}"
+
+def parse_user_input(input_str):
+    """
+    Parse user-friendly input formats like "13.6K", "1.2K", "500", etc.
+    Returns the numeric value.
+    """
+    if not input_str or input_str.strip() == "":
+        return 0
+    
+    input_str = str(input_str).strip().upper()
+    
+    # Handle K (thousands)
+    if 'K' in input_str:
+        try:
+            return float(input_str.replace('K', '')) * 1000
+        except ValueError:
+            return 0
+    
+    # Handle M (millions)
+    if 'M' in input_str:
+        try:
+            return float(input_str.replace('M', '')) * 1000000
+        except ValueError:
+            return 0
+    
+    # Handle regular numbers
+    try:
+        return float(input_str)
+    except ValueError:
+        return 0
+
+def validate_inputs(miles, cost):
+    """Validate basic inputs"""
+    if cost < 0:
+        return False, "Cost cannot be negative"
+    if miles < 0:
+        return False, "Miles cannot be negative"
+    return True, ""
+
+# Award Accelerator figures (miles + PQP purchases), unformatted
+@instrumented(name="evaluate_accelerator")
+def accelerator_figures(miles, pqp, cost, valuation=DEFAULT_VALUATION):
+    """Raw numbers behind ``evaluate_accelerator``; ``{"error": ...}`` for invalid inputs"""
+    # Validate inputs
+    valid, error_message = validate_inputs(miles, cost)
+    if not valid:
+        return {"error": error_message}
+    
+    # Calculate values
+    rules = get_rules()
+    miles_worth_low, miles_worth_high = calculate_miles_value(miles, valuation=valuation)
+    effective_cost_low = cost - miles_worth_high if pqp else cost
+    effective_cost_high = cost - miles_worth_low if pqp else cost
+    cost_per_mile = cost / miles if miles > 0 else None
+    
+    # Calculate PQP cost values
+    if pqp > 0:
+        pqp_cost_low = effective_cost_low / pqp
+        pqp_cost_high = effective_cost_high / pqp
+        
+        # Determine verdict based on PQP cost
+        verdict = rules.pqp_cost.classify(pqp_cost_low)
+    else:
+        pqp_cost_low = pqp_cost_high = None
+        # Determine verdict based on cost per mile
+        verdict = rules.cost_per_mile.classify(cost_per_mile if miles > 0 else float('inf'))
+
+    return {
+        "miles_worth_low": miles_worth_low,
+        "miles_worth_high": miles_worth_high,
+        "cost_per_mile": cost_per_mile,
+        "pqp_cost_low": pqp_cost_low,
+        "pqp_cost_high": pqp_cost_high,
+        "cpm": cost_per_mile * 100 if miles > 0 else 0,
+        "verdict": verdict,
+    }
+
+# Function to evaluate Award Accelerator (miles + PQP purchases)
+def evaluate_accelerator(miles, pqp, cost, valuation=DEFAULT_VALUATION, figures=None):
+    """Formatted accelerator verdict; pass ``figures`` from ``accelerator_figures`` to reuse them"""
+    if figures is None:
+        figures = accelerator_figures(miles, pqp, cost, valuation=valuation)
+    if "error" in figures:
+        return {"Error": figures["error"]}
+
+    return {
+        "Miles Worth (Low)": format_currency(figures["miles_worth_low"]),
+        "Miles Worth (High)": format_currency(figures["miles_worth_high"]),
+        "Cost Per Mile": f"{figures['cost_per_mile']:.3f} cents" if miles > 0 else "N/A",
+        "PQP Cost per Dollar": format_currency(figures["pqp_cost_low"]) if pqp else None,
+        "Verdict": figures["verdict"],
+        "CPM": figures["cpm"]
+    }
+
+
+def upgrade_comfort_factor(travel_hours):
+    """Weight on upgrade savings; longer flights increase perceived value (works on numpy arrays too)"""
+    return 1 + (0.05 * travel_hours)
+
+def is_upgrade_not_worth_it(travel_hours, cash_upgrade, full_fare, miles, cash_cost, from_class, to_class, original_full_fare, valuation=DEFAULT_VALUATION):
+    """ Determines if an upgrade is not worth it """
+    rules = get_rules()
+    if travel_hours < rules.upgrade_comfort_hours and from_class == "Economy" and to_class == "Premium Plus":
+        return "⚠️ Short flight – upgrade may not be worth it."
+    
+    if cash_upgrade > rules.upgrade_full_fare_ratio * full_fare and original_full_fare > 0:
+        return "⚠️ Upgrade cost is too close to full fare price."
+
+    if (miles > 0 and cash_cost > 0) and (cash_cost + calculate_miles_value(miles, valuation=valuation)[0] > full_fare) and full_fare > 0:
+        return "⚠️ Miles + Cash upgrade is costing more than a full-fare business class ticket."
+
+    if from_class == "Premium Plus" and to_class == "Business (Polaris)" and travel_hours < rules.premium_upgrade_comfort_hours:
+        return "⚠️ Small difference in comfort for this flight length – not worth upgrading."
+
+    return None  # Upgrade is reasonable
+
+def choose_upgrade_option(savings_high, savings_cash_upgrade):
+    """Pick the best upgrade method from the (comfort-weighted) savings"""
+    if savings_high > savings_cash_upgrade and savings_high > 0:
+        return "Miles + Cash"
+    elif savings_cash_upgrade > 0:
+        return "Cash Upgrade"
+    else:
+        return "Buy Full Fare Ticket"
+
+def evaluate_relative_upgrade_cost(base_fare, upgrade_cost):
+    if base_fare == 0:
+        return None
+    return get_rules().relative_upgrade_cost.classify(upgrade_cost / base_fare)
+
+# Upgrade figures, unformatted
+@instrumented(name="evaluate_upgrade")
+def upgrade_figures(miles, cash_cost, full_cash_upgrade, full_fare_cost, travel_hours, from_class, to_class, verdict_table=None, valuation=DEFAULT_VALUATION, clearance_probability=1.0):
+    """
+    Raw numbers behind ``evaluate_upgrade``; ``{"error": ...}`` for invalid inputs.
+    Pass an ``UpgradeVerdictTable`` as ``verdict_table`` to take the best option
+    and warning from the precomputed table instead of the exact checks.
+    ``clearance_probability`` below 1 marks the Miles + Cash upgrade as
+    waitlisted: it is only charged (and only pays off) if it clears, so it is
+    compared by its expected cost and savings against the confirmed cash upgrade.
+    """
+    # Validate inputs
+    valid, error_message = validate_inputs(miles, cash_cost)
+    if not valid:
+        return {"error": error_message}
+    if not 0 <= clearance_probability <= 1:
+        return {"error": "Clearance chance must be between 0 and 1"}
+    
+    # Skip calculation if no upgrade is selected
+    if from_class == to_class:
+        return {
+            "best_option": None,
+            "warning": "⚠️ You've selected the same cabin class for both options. No upgrade needed.",
+        }
+    
+    # Calculate comfort factor (longer flights increase perceived value)
+    comfort_factor = upgrade_comfort_factor(travel_hours)
+    
+    # Get upgrade multiplier based on cabin classes
+    upgrade_multiplier = upgrade_multipliers.get((from_class, to_class), 1.0)
+
+    # Handle missing inputs by making best estimates
+    original_full_fare_cost = full_fare_cost
+    if full_fare_cost == 0:
+        full_fare_cost = max(full_cash_upgrade * 1.5, 1000)  # Estimate based on upgrade cost
+
+    if miles == 0 and cash_cost == 0:
+        miles, cash_cost = 0, full_cash_upgrade  # Assume only cash upgrade available
+
+    # Value of miles in cash terms
+    miles_worth_low, miles_worth_high = calculate_miles_value(miles, valuation=valuation)
+    total_miles_cash_upgrade_low = cash_cost + miles_worth_low
+    total_miles_cash_upgrade_high = cash_cost + miles_worth_high
+
+    # Full Cash Upgrade (No Miles)
+    total_cash_upgrade = full_cash_upgrade
+
+    # Apply comfort factor to savings
+    savings_low, savings_high = ((full_fare_cost - total_miles_cash_upgrade_high) * comfort_factor * upgrade_multiplier, 
+                                 (full_fare_cost - total_miles_cash_upgrade_low) * comfort_factor * upgrade_multiplier)
+    if total_cash_upgrade == 0:
+        total_cash_upgrade = full_fare_cost
+    savings_cash_upgrade = (full_fare_cost - total_cash_upgrade) * comfort_factor * upgrade_multiplier
+
+    waitlisted = miles > 0 and clearance_probability < 1
+    if waitlisted:
+        savings_low, savings_high = savings_low * clearance_probability, savings_high * clearance_probability
+
+    if verdict_table is not None and not waitlisted:  # The table assumes the upgrade is confirmed
+        # Precomputed O(1) lookup of the best option and warning
+        best_option, warning_message = verdict_table.lookup(
+            travel_hours, from_class, to_class, total_cash_upgrade, full_fare_cost,
+            miles, cash_cost, total_miles_cash_upgrade_low, original_full_fare_cost, valuation=valuation
+        )
+    else:
+        # Best Upgrade Method Decision
+        best_option = choose_upgrade_option(savings_high, savings_cash_upgrade)
+
+        # ❌ Detect When the Upgrade is "Not Worth It"
+        warning_message = is_upgrade_not_worth_it(travel_hours,total_cash_upgrade,full_fare_cost, miles, cash_cost, from_class, to_class, original_full_fare_cost, valuation=valuation)
+
+    has_miles_option = miles > 0
+    return {
+        "miles_worth_low": miles_worth_low,
+        "miles_worth_high": miles_worth_high,
+        "miles_cash_upgrade_low": total_miles_cash_upgrade_low if has_miles_option else None,
+        "miles_cash_upgrade_high": total_miles_cash_upgrade_high if has_miles_option else None,
+        "cash_upgrade_cost": total_cash_upgrade,
+        "full_fare_cost": full_fare_cost,
+        "savings_miles_cash_low": savings_low if has_miles_option else None,
+        "savings_miles_cash_high": savings_high if has_miles_option else None,
+        "savings_cash_upgrade": savings_cash_upgrade,
+        "best_option": best_option,
+        "warning": warning_message,
+        "comfort_factor": comfort_factor,
+        "clearance_probability": clearance_probability if waitlisted else 1.0,
+        "expected_miles_cash_upgrade_low": total_miles_cash_upgrade_low * clearance_probability if waitlisted else None,
+        "expected_miles_cash_upgrade_high": total_miles_cash_upgrade_high * clearance_probability if waitlisted else None,
+    }
+
+# Function to evaluate upgrade options & detect bad deals
+def evaluate_upgrade(miles, cash_cost, full_cash_upgrade, full_fare_cost, travel_hours, from_class, to_class, verdict_table=None, valuation=DEFAULT_VALUATION, figures=None, clearance_probability=1.0):
+    """
+    Compare Miles + Cash, cash-only and full-fare upgrades.
+    Pass an ``UpgradeVerdictTable`` as ``verdict_table`` to take the best option
+    and warning from the precomputed table instead of the exact checks,
+    ``figures`` from ``upgrade_figures`` to only format them, and a
+    ``clearance_probability`` below 1 for a waitlisted Miles + Cash upgrade.
+    """
+    f = figures
+    if f is None:
+        f = upgrade_figures(miles, cash_cost, full_cash_upgrade, full_fare_cost, travel_hours, from_class, to_class,
+                            verdict_table=verdict_table, valuation=valuation, clearance_probability=clearance_probability)
+    if "error" in f:
+        return {"Error": f["error"]}
+    if f["best_option"] is None:
+        return {
+            "Warning": f["warning"],
+            "Verdict": "ℹ️ No upgrade selected"
+        }
+
+    has_miles_option = f["miles_cash_upgrade_low"] is not None
+    result = {
+        "Miles Worth (Low)": f"${f['miles_worth_low']:.2f}",
+        "Miles Worth (High)": f"${f['miles_worth_high']:.2f}",
+        "Total Upgrade Cost (Miles + Cash)": f"${f['miles_cash_upgrade_low']:.2f} - ${f['miles_cash_upgrade_high']:.2f}" if has_miles_option else "N/A",
+        "Total Upgrade Cost (Cash-Only)": f"${f['cash_upgrade_cost']:.2f}",
+        "Full-Fare Business/First Class Price": f"${f['full_fare_cost']:.2f}",
+        "Savings (Miles + Cash Upgrade)": f"${f['savings_miles_cash_low']:.2f} - ${f['savings_miles_cash_high']:.2f}" if has_miles_option else "N/A",
+        "Savings (Cash-Only Upgrade)": f"${f['savings_cash_upgrade']:.2f}",
+        "Best Option": f["best_option"],
+        "Verdict": f"✅ **Best Option:** {f['best_option']}",
+        "Warning": f["warning"],
+        "Comfort Factor": f["comfort_factor"]
+    }
+    if f.get("expected_miles_cash_upgrade_low") is not None:
+        result["Clearance Chance"] = f"{f['clearance_probability']:.0%}"
+        result["Expected Upgrade Cost (Miles + Cash)"] = f"${f['expected_miles_cash_upgrade_low']:.2f} - ${f['expected_miles_cash_upgrade_high']:.2f}"
+    return result
+
+# Ticket purchase figures (Miles vs. Cash vs. Miles + Cash), unformatted
+@instrumented(name="evaluate_best_option")
+def best_option_figures(miles_price, cash_price, miles_plus_cash_miles, miles_plus_cash_cash, valuation=DEFAULT_VALUATION,
+                        advice_cpm=None):
+    """Raw numbers behind ``evaluate_best_option``; Miles + Cash totals are None when that option is incomplete
+
+    ``advice_cpm`` is the CPM a redemption must beat to earn the advice, e.g.
+    the route's median from its quote history; without one it is ``ADVICE_CPM``.
+    """
+    # Calculate miles values
+    miles_cash_value_low, miles_cash_value_high = calculate_miles_value(miles_price, valuation=valuation)
+    mixed_miles_value_low, mixed_miles_value_high = calculate_miles_value(miles_plus_cash_miles, valuation=valuation)
+    
+    # Calculate total costs for different options
+    total_cost_miles_low = miles_cash_value_low
+    total_cost_miles_high = miles_cash_value_high
+
+    valid_mixed = miles_plus_cash_miles > 0 and miles_plus_cash_cash > 0
+    total_cost_mixed_low = (
+        mixed_miles_value_low + miles_plus_cash_cash if valid_mixed else float('inf')
+    )
+    total_cost_mixed_high = (
+        mixed_miles_value_high + miles_plus_cash_cash if valid_mixed else float('inf')
+    )
+
+    # Create dictionary of options for easier comparison
+    options = {
+        "Cash": cash_price,
+        "Miles": total_cost_miles_low,  # Use low estimate for conservative comparison
+        "Miles + Cash": total_cost_mixed_low,
+    }
+    
+    # Find option with lowest cost
+    best_option = min(options.items(), key=lambda x: x[1] if x[1] > 0 else float('inf'))[0]
+    
+    # Determine CPM (cents per mile) for award redemptions
+    cpm_miles = (cash_price / miles_price) * 100 if miles_price > 0 else 0
+    cpm_miles_plus_cash = ((cash_price - miles_plus_cash_cash) / miles_plus_cash_miles) * 100 if miles_plus_cash_miles > 0 else 0
+    
+    # Add advice based on CPM
+    if advice_cpm is None:
+        advice_cpm = ADVICE_CPM
+    advice = None
+    if best_option == "Miles" and cpm_miles > advice_cpm:
+        advice = "🎯 Great redemption value! Above average cents-per-mile."
+    elif best_option == "Miles + Cash" and cpm_miles_plus_cash > advice_cpm:
+        advice = "🎯 Good value for your miles in the Miles + Cash option!"
+
+    return {
+        "miles_value_low": miles_cash_value_low,
+        "miles_value_high": miles_cash_value_high,
+        "total_cost_miles_low": total_cost_miles_low,
+        "total_cost_miles_high": total_cost_miles_high,
+        "total_cost_mixed_low": total_cost_mixed_low if valid_mixed else None,
+        "total_cost_mixed_high": total_cost_mixed_high if valid_mixed else None,
+        "total_cost_cash": cash_price,
+        "cpm_miles": cpm_miles,
+        "cpm_mixed": cpm_miles_plus_cash,
+        "best_option": best_option,
+        "advice": advice,
+    }
+
+# Function to evaluate Ticket Purchase (Miles vs. Cash vs. Miles + Cash)
+def evaluate_best_option(miles_price, cash_price, miles_plus_cash_miles, miles_plus_cash_cash, valuation=DEFAULT_VALUATION, figures=None,
+                         advice_cpm=None):
+    """Formatted ticket comparison; pass ``figures`` from ``best_option_figures`` to reuse them"""
+    f = figures
+    if f is None:
+        f = best_option_figures(miles_price, cash_price, miles_plus_cash_miles, miles_plus_cash_cash, valuation=valuation,
+                                advice_cpm=advice_cpm)
+    return {
+        "Miles Cash Value (Low)": format_currency(f["miles_value_low"]),
+        "Miles Cash Value (High)": format_currency(f["miles_value_high"]),
+        "Total Cost (Miles)": f"{format_currency(f['total_cost_miles_low'])} - {format_currency(f['total_cost_miles_high'])}",
+        "Total Cost (Miles + Cash)": (
+            f"{format_currency(f['total_cost_mixed_low'])} - {format_currency(f['total_cost_mixed_high'])}"
+            if f["total_cost_mixed_low"] is not None
+            else "N/A"
+        ),
+        "Total Cost (Cash)": format_currency(cash_price),
+        "CPM (Miles Option)": f"{f['cpm_miles']:.2f} cents" if miles_price > 0 else "N/A",
+        "CPM (Miles + Cash)": f"{f['cpm_mixed']:.2f} cents" if miles_plus_cash_miles > 0 else "N/A",
+        "Best Option": f["best_option"],
+        "Verdict": f"✅ Best Option: **{f['best_option']}**",
+        "Advice": f["advice"],
+        "CPM_Miles": f["cpm_miles"],
+        "CPM_Mixed": f["cpm_mixed"]
+    }
+
+# Buy Miles offer figures, unformatted
+@instrumented(name="evaluate_miles_purchase")
+def miles_purchase_figures(miles_price, cash_price, valuation=DEFAULT_VALUATION):
+    """Raw numbers behind ``evaluate_miles_purchase``"""
+    # Calculate miles values
+    miles_cash_value_low, miles_cash_value_high = calculate_miles_value(miles_price, valuation=valuation)
+        
+    # Determine CPM (cents per mile) for award redemptions
+    cpm_miles = (cash_price / miles_price) * 100 if miles_price > 0 else 0
+    
+    # Add advice based on CPM
+    advice = None
+    if cpm_miles < 1.2:
+        advice = "🎯 Great redemption value! Above average cents-per-mile."
+    
+    return {
+        "miles_value_low": miles_cash_value_low,
+        "miles_value_high": miles_cash_value_high,
+        "total_cost_cash": cash_price,
+        "cpm_miles": cpm_miles,
+        "advice": advice,
+    }
+
+# Function to evaluate a Buy Miles offer
+def evaluate_miles_purchase(miles_price, cash_price, valuation=DEFAULT_VALUATION, figures=None):
+    """Formatted Buy Miles verdict; pass ``figures`` from ``miles_purchase_figures`` to reuse them"""
+    f = figures
+    if f is None:
+        f = miles_purchase_figures(miles_price, cash_price, valuation=valuation)
+    return {
+        "Miles Cash Value (Low)": format_currency(f["miles_value_low"]),
+        "Miles Cash Value (High)": format_currency(f["miles_value_high"]),
+        "Total Cost (Miles)": f"{format_currency(f['miles_value_low'])} - {format_currency(f['miles_value_high'])}",
+        "Total Cost (Cash)": format_currency(cash_price),
+        "CPM (Miles Option)": f"{f['cpm_miles']:.2f} cents" if miles_price > 0 else "N/A",
+        "Advice": f["advice"],
+        "CPM_Miles": f["cpm_miles"],
+    }
+
+# Function to calculate maximum purchase values
+@instrumented
+def calculate_max_purchase_value(miles_input=None, cash_input=None, valuation=DEFAULT_VALUATION):
+    """
+    Calculate the maximum value a user should be willing to pay.
+    If miles are provided, calculate max cash price.
+    If cash is provided, calculate max miles.
+    """
+    if miles_input is not None and miles_input > 0:
+        # User entered miles, calculate max cash price
+        miles_worth_low, miles_worth_high = calculate_miles_value(miles_input, valuation=valuation)
+        max_cash_price = miles_worth_high  # Use high valuation for conservative max price
+        
+        # Calculate CPM
+        cpm = (max_cash_price / miles_input) * 100 if miles_input > 0 else 0
+        
+        return {
+            "type": "miles_to_cash",
+            "input_miles": miles_input,
+            "max_cash_price": max_cash_price,
+            "cpm": cpm,
+            "miles_worth_low": miles_worth_low,
+            "miles_worth_high": miles_worth_high,
+            "valuation_range": f"{format_currency(miles_worth_low)} - {format_currency(miles_worth_high)}"
+        }
+    
+    elif cash_input is not None and cash_input > 0:
+        # User entered cash, calculate max miles
+        max_miles_low = int(cash_input / valuation.high)  # Conservative estimate
+        max_miles_high = int(cash_input / valuation.low)  # Optimistic estimate
+        
+        # Calculate CPM for the conservative estimate
+        cpm = (cash_input / max_miles_low) * 100 if max_miles_low > 0 else 0
+        
+        return {
+            "type": "cash_to_miles",
+            "input_cash": cash_input,
+            "max_miles_low": max_miles_low,
+            "max_miles_high": max_miles_high,
+            "cpm": cpm,
+            "recommended_miles": max_miles_low  # Use conservative estimate
+        }
+    
+    else:
+        return {"error": "Please provide either miles or cash amount"}
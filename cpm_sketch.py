@@ -0,0 +1,157 @@
+"""Streaming cents-per-mile distributions per route and cabin.
+
+Each (route, cabin) keeps a KLL quantile sketch of the CPM of every quote seen
+(cash price / miles * 100). A sketch holds O(k log n) values no matter how many
+quotes arrive, answers rank and quantile queries with roughly 1/k relative
+rank error, and two sketches can be merged into one describing both streams.
+That lets the tabs show "this CPM beats 85% of SFO-JFK quotes" instantly
+instead of scanning the quote history on every rerun.
+"""
+import math
+import random
+import threading
+
+DEFAULT_K = 200
+ANY_CABIN = None  # Key for the all-cabins sketch of a route
+
+
+class KLLSketch:
+    """KLL quantile sketch (Karnin, Lang & Liberty) over floats"""
+
+    def __init__(self, k=DEFAULT_K, seed=None):
+        self.k = k
+        self.count = 0
+        self.compactors = [[]]
+        self._rng = random.Random(seed)
+        self._size = 0
+        self._max_size = self._capacity(0)
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(int(math.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _grow(self):
+        self.compactors.append([])
+        self._max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def update(self, value):
+        self.compactors[0].append(value)
+        self._size += 1
+        self.count += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def _compress(self):
+        while self._size >= self._max_size:
+            for level, items in enumerate(self.compactors):
+                if len(items) >= self._capacity(level):
+                    if level + 1 == len(self.compactors):
+                        self._grow()
+                    # Keep every other sorted item at twice the weight; an odd item stays behind
+                    items.sort()
+                    keep = len(items) % 2
+                    offset = self._rng.random() < 0.5
+                    promoted = items[offset:len(items) - keep:2]
+                    self.compactors[level] = items[len(items) - keep:]
+                    self.compactors[level + 1].extend(promoted)
+                    self._size -= len(items) - keep - len(promoted)
+                    break
+
+    def merge(self, other):
+        """Fold ``other`` into this sketch in place"""
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.count += other.count
+        self._size = sum(len(items) for items in self.compactors)
+        self._compress()
+        return self
+
+    def rank(self, value):
+        """Estimated number of values ``<= value``"""
+        return sum(sum(1 for x in items if x <= value) << level for level, items in enumerate(self.compactors))
+
+    def percentile_rank(self, value):
+        """Estimated share (0-1) of values ``<= value``, or None for an empty sketch"""
+        if not self.count:
+            return None
+        return min(self.rank(value) / self.count, 1.0)
+
+    def quantile(self, q):
+        """Estimated ``q``-quantile (0-1), or None for an empty sketch"""
+        if not self.count:
+            return None
+        weighted = sorted((x, 1 << level) for level, items in enumerate(self.compactors) for x in items)
+        target = q * sum(w for _, w in weighted)
+        seen = 0
+        for x, weight in weighted:
+            seen += weight
+            if seen >= target:
+                return x
+        return weighted[-1][0]
+
+
+def quote_cpm(miles, cash):
+    """Cents per mile of an award quote, matching ``evaluate_best_option``"""
+    return cash / miles * 100 if miles and miles > 0 else None
+
+
+class CpmSketches:
+    """Thread-safe registry of CPM sketches keyed by (route, cabin)"""
+
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self.sketches = {}
+        self.last_rowid = 0  # Highest PriceHistory row already folded in
+        self._lock = threading.Lock()
+        self._feed_lock = threading.Lock()  # Serializes catch_up so rows are counted once
+
+    def record(self, route, cabin, miles, cash):
+        cpm = quote_cpm(miles, cash)
+        if cpm is None:
+            return
+        with self._lock:
+            for key in ((route, cabin), (route, ANY_CABIN)):
+                sketch = self.sketches.get(key)
+                if sketch is None:
+                    sketch = self.sketches[key] = KLLSketch(self.k)
+                sketch.update(cpm)
+
+    def record_quote(self, quote):
+        """Listener for ``award_api.add_quote_listener`` (use either this or ``catch_up``, not both)"""
+        self.record(quote["route"], quote["cabin"], quote["miles"], quote["cash"])
+
+    def catch_up(self, history):
+        """Fold in quotes stored in ``history`` since the last call; returns how many"""
+        with self._feed_lock:
+            rows = history.rows_since(self.last_rowid)
+            for rowid, route, cabin, _, miles, cash in rows:
+                self.record(route, cabin, miles, cash)
+                self.last_rowid = rowid
+            return len(rows)
+
+    def merge(self, other):
+        with self._lock:
+            for key, sketch in other.sketches.items():
+                mine = self.sketches.get(key)
+                if mine is None:
+                    mine = self.sketches[key] = KLLSketch(self.k)
+                mine.merge(sketch)
+        return self
+
+    def percentile_rank(self, cpm, route, cabin=ANY_CABIN):
+        """``(share of quotes with CPM <= cpm, quote count)``, or ``(None, 0)`` without data"""
+        with self._lock:
+            sketch = self.sketches.get((route, cabin))
+            if sketch is None:
+                return None, 0
+            return sketch.percentile_rank(cpm), sketch.count
+
+    def quantile(self, q, route, cabin=ANY_CABIN):
+        """``(estimated q-quantile CPM, quote count)``, or ``(None, 0)`` without data"""
+        with self._lock:
+            sketch = self.sketches.get((route, cabin))
+            if sketch is None:
+                return None, 0
+            return sketch.quantile(q), sketch.count
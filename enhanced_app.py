@@ -1,65 +1,60 @@
+import calendar
+import datetime
+
 import streamlit as st
-import requests
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-
-# United Airlines logo
-UA_LOGO_URL = "https://logos-world.net/wp-content/uploads/2021/03/United-Airlines-Logo.png"
-
-# Function to send email notification
-def send_email_notification(to_email, origin, destination, date, miles_required, cash_price):
-    """Sends an email notification when a better redemption option is found"""
-    sender_email = "your-email@gmail.com"  # Replace with your email
-    sender_password = "your-email-password"  # Replace with your email password
-
-    subject = f"United Award Seat Found for {origin} to {destination}!"
-    body = f"""
-    A lower redemption award seat has been found for your trip:
-    
-    🛫 Route: {origin} → {destination}
-    📅 Travel Date: {date}
-    🎟️ Miles Required: {miles_required} miles
-    💰 Cash Price: ${cash_price}
-    
-    Book now on United's website before it disappears!
-    """
-
-    msg = MIMEMultipart()
-    msg["From"] = sender_email
-    msg["To"] = to_email
-    msg["Subject"] = subject
-    msg.attach(MIMEText(body, "plain"))
-
-    try:
-        with smtplib.SMTP("smtp.gmail.com", 587) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_email, to_email, msg.as_string())
-        return "✅ Notification sent!"
-    except Exception as e:
-        return f"❌ Email error: {str(e)}"
-
-# Function to check real-time award availability (United API)
-def check_award_availability(origin, destination, date):
-    """Fetches live award availability from United (requires API key)"""
-    try:
-        API_URL = f"https://api.united.com/award-search?origin={origin}&destination={destination}&date={date}"
-        headers = {"Authorization": "Bearer YOUR_API_KEY"}  # Replace with actual API Key
-        response = requests.get(API_URL, headers=headers)
-
-        if response.status_code == 200:
-            data = response.json()
-            award_miles = data.get("lowest_miles", "N/A")
-            cash_price = data.get("cash_price", "N/A")
-            return award_miles, cash_price
-        else:
-            return None, f"Error: {response.status_code}"
-    except Exception as e:
-        return None, f"API Error: {str(e)}"
+
+from anomaly import AnomalyDetector
+from award_api import add_quote_listener, check_award_availability, route_key, send_email_notification
+from io_telemetry import summary as io_summary
+from price_history import PriceHistory
+from static_assets import UA_LOGO, UA_LOGO_URL, asset_source
+
+CABINS = ["Economy", "Premium Plus", "Business (Polaris)"]
+
+
+@st.cache_resource
+def get_price_history():
+    """One quote store per server process, fed by every successful award search"""
+    history = PriceHistory()
+    add_quote_listener(history.record_quote)
+    return history
+
+
+@st.cache_resource
+def get_anomaly_detector():
+    """Per-route price norms, seeded from the stored history and scoring every new quote"""
+    detector = AnomalyDetector()
+    detector.warm_up(get_price_history())
+    add_quote_listener(detector.record_quote)
+    return detector
+
+
+@st.cache_resource
+def get_award_calendars():
+    """Date-indexed award calendars per route and cabin, updated in place by every search"""
+    from award_calendar import AwardCalendars  # numpy is only loaded once a route is looked up
+
+    calendars = AwardCalendars()
+    calendars.catch_up(get_price_history())
+    add_quote_listener(calendars.record_quote)
+    return calendars
+
+
+@st.cache_resource
+def get_award_router():
+    """Connecting-itinerary search over every cached award segment"""
+    from award_routing import AwardRouter, segments_from_calendars  # Loads the airport dataset on first search
+
+    router = AwardRouter(segments_from_calendars(get_award_calendars()))
+    add_quote_listener(router.record_quote)
+    return router
+
+
+price_history = get_price_history()
+anomaly_detector = get_anomaly_detector()
 
 # Streamlit UI with Tabs
-st.image(UA_LOGO_URL, width=250)  # Display United Airlines Logo
+st.image(asset_source(UA_LOGO, UA_LOGO_URL), width=250)  # Display United Airlines Logo
 st.title("United Airlines Deal Evaluator ✈️")
 st.markdown("Analyze **Award Accelerators, Upgrade Offers, and Ticket Purchases** to find the best value.")
 
@@ -68,22 +63,115 @@ st.subheader("🔍 Check Real-Time Award Availability")
 origin = st.text_input("Departure Airport (e.g., SFO)")
 destination = st.text_input("Arrival Airport (e.g., JFK)")
 date = st.date_input("Travel Date")
+cabin = st.selectbox("Cabin", CABINS)
+search_nearby = st.checkbox("🧭 Also search nearby airports (e.g. OAK/SJC → EWR/LGA)")
+nearby_radius = st.slider("Nearby airport radius (miles)", 20, 150, 60, step=10) if search_nearby else None
 
 send_email = st.checkbox("📩 Enable Email Notifications for Lower Award Seats")
 email_address = st.text_input("Enter your email for alerts") if send_email else None
+alert_mode = st.radio(
+    "Email me about",
+    ["Every award seat found", "Only unusually cheap awards for this route"],
+    horizontal=True,
+) if send_email else None
 
 if st.button("Check Availability"):
     if origin and destination and date:
-        award_miles, cash_price = check_award_availability(origin, destination, date.strftime("%Y-%m-%d"))
+        seen_events = anomaly_detector.last_sequence()
+        award_miles, cash_price = check_award_availability(origin, destination, date.strftime("%Y-%m-%d"), cabin=cabin)
 
         if award_miles and cash_price:
             st.write(f"🎟️ **Award Seat Available:** {award_miles} miles")
             st.write(f"💰 **Cash Price:** ${cash_price}")
 
-            if send_email and email_address:
-                email_result = send_email_notification(email_address, origin, destination, date, award_miles, cash_price)
+            # Anomalies scored while this search's quote was published
+            anomalies = anomaly_detector.events_since(seen_events, route=route_key(origin, destination))
+            for event in anomalies:
+                st.success(f"🚨 **Unusually cheap award:** {event['Reason']}")
+
+            if send_email and email_address and (anomalies or alert_mode == "Every award seat found"):
+                note = "; ".join(event["Reason"] for event in anomalies) or None
+                email_result = send_email_notification(email_address, origin, destination, date, award_miles, cash_price, note=note)
                 st.write(email_result)
         else:
             st.error("No award seats found or an API issue occurred.")
+
+        if search_nearby:
+            from nearby_search import MAX_PAIRS, search_nearby_awards  # numpy only when fanning out
+
+            with st.spinner("Searching nearby airport pairs..."):
+                nearby = search_nearby_awards(origin, destination, date.strftime("%Y-%m-%d"),
+                                              radius_miles=nearby_radius, cabin=cabin,
+                                              known={(origin, destination): (award_miles, cash_price)})
+            st.markdown("##### 🧭 **Nearby Airport Awards (best cents per mile first)**")
+            if nearby["Results"]:
+                st.dataframe(nearby["Results"], hide_index=True,
+                             column_config={"CPM": st.column_config.NumberColumn("CPM (¢)", format="%.2f")})
+            else:
+                st.caption("No award seats found on nearby airport pairs.")
+            if nearby["Errors"]:
+                st.caption(f"{len(nearby['Errors'])} airport pairs could not be searched.")
+            if nearby["Skipped"]:
+                st.caption(f"Only the {MAX_PAIRS} closest airport pairs were searched; {nearby['Skipped']} farther "
+                           "pairs were skipped. Narrow the radius to search them.")
     else:
         st.error("Please enter valid origin, destination, and date.")
+
+# Previously observed quotes for the same route and month
+if origin and destination and date:
+    route = route_key(origin, destination)
+    with st.expander(f"🗂️ Price History: {route} in {date:%B %Y}"):
+        month_start = date.replace(day=1)
+        month_end = date.replace(day=calendar.monthrange(date.year, date.month)[1])
+        lows = price_history.daily_lows(route, month_start, month_end, cabin=cabin)
+        if lows:
+            st.write(f"📉 **Lowest miles seen:** {min(m for _, m, _ in lows):,} miles")
+            st.write(f"💵 **Lowest cash seen:** ${min(c for _, _, c in lows):,.2f}")
+            st.dataframe(
+                [{"Travel Date": day, "Lowest Miles": miles, "Lowest Cash": cash} for day, miles, cash in lows],
+                hide_index=True,
+            )
+        else:
+            st.caption(f"No {cabin} quotes recorded for this route and month yet.")
+
+    # Range-minimum over the route's award calendar, no per-day API calls
+    with st.expander(f"📅 Cheapest Known Award: {route}"):
+        window = st.date_input("Travel Window", value=(date, date + datetime.timedelta(days=14)))
+        if len(window) == 2:
+            award_calendars = get_award_calendars()
+            cheapest = award_calendars.cheapest(route, cabin, window[0], window[1])
+            cheapest_cash = award_calendars.cheapest(route, cabin, window[0], window[1], by="cash")
+            if cheapest:
+                st.write(f"🎟️ **Fewest miles:** {cheapest['Miles']:,} miles on {cheapest['Travel Date']:%b %d} "
+                         f"(cash ${cheapest['Cash']:,.2f})")
+                st.write(f"💰 **Lowest cash fare:** ${cheapest_cash['Cash']:,.2f} on {cheapest_cash['Travel Date']:%b %d}")
+            else:
+                st.caption(f"No {cabin} quotes recorded for this route in that window yet.")
+
+    # Connecting itineraries stitched together from cached segments
+    # Expander bodies run even while collapsed, so the search waits for the toggle
+    with st.expander(f"🔀 Connecting Awards: {route} on {date:%b %d}"):
+        if st.toggle("Search connecting itineraries", key="search_connecting"):
+            itineraries = get_award_router().search(*route.split("-"), date, cabin=cabin)
+            if itineraries:
+                st.dataframe(
+                    [{k: v for k, v in itinerary.items() if k != "Legs"} for itinerary in itineraries],
+                    hide_index=True,
+                    column_config={"Cost": st.column_config.NumberColumn("Cost ($, miles valued + fees)", format="%.2f")},
+                )
+                st.caption("Built from previously searched segments; departure times of date-only quotes are estimated.")
+            else:
+                st.caption("No connecting itineraries found in the cached award segments.")
+
+# Outbound call telemetry for this server process
+with st.expander("📈 API & Email Telemetry"):
+    telemetry = io_summary()
+    if telemetry:
+        st.dataframe(
+            [{"Endpoint": name, **{k: v for k, v in stats.items() if k not in ("statuses", "errors")},
+              "Statuses": str(stats["statuses"]), "Errors": str(stats["errors"])}
+             for name, stats in telemetry.items()],
+            hide_index=True,
+        )
+    else:
+        st.caption("No outbound calls recorded yet.")
@@ -0,0 +1,90 @@
+"""Per-session history of evaluations, for comparing offers side by side.
+
+Each evaluation keeps its inputs and the raw figures from the ``*_figures``
+functions in ``calculators`` (numbers, not formatted text). Entries live in a
+``deque`` with a fixed ``maxlen``, so once a session has ``HISTORY_CAPACITY``
+entries the oldest is dropped for each new one and a session on a shared
+server never holds more, however many offers it compares.
+"""
+import datetime
+import io
+from collections import deque
+
+HISTORY_CAPACITY = 50
+COMPARE_LAST = 6  # Most recent evaluations shown side by side
+EXPORT_FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+ACRONYMS = {"cpm": "CPM", "pqp": "PQP"}
+
+
+def _display(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, int) or value.is_integer():
+        return f"{value:,.0f}"
+    return f"{value:,.2f}" if abs(value) >= 1 else f"{value:.4g}"
+
+
+def field_label(name):
+    """Display label for a snake_case field name, e.g. "Cost per mile" for ``cost_per_mile``"""
+    words = [ACRONYMS.get(word, word) for word in name.split("_")]
+    return " ".join(words)[:1].upper() + " ".join(words)[1:]
+
+
+class EvaluationHistory:
+    """Fixed-capacity ring buffer of ``{"number", "evaluated_at", "evaluator", "inputs", "figures"}`` entries"""
+
+    def __init__(self, capacity=HISTORY_CAPACITY):
+        self.entries = deque(maxlen=capacity)
+        self.total = 0  # Evaluations recorded, including ones already dropped
+
+    def __len__(self):
+        return len(self.entries)
+
+    def record(self, evaluator, inputs, figures):
+        self.total += 1
+        self.entries.append({
+            "number": self.total,
+            "evaluated_at": datetime.datetime.now().replace(microsecond=0),
+            "evaluator": evaluator,
+            "inputs": dict(inputs),
+            "figures": dict(figures),
+        })
+
+    def clear(self):
+        self.entries.clear()
+
+    def compare(self, evaluator, last=COMPARE_LAST):
+        """One row per input or figure, one column per recent ``evaluator`` entry (oldest first)"""
+        entries = [e for e in self.entries if e["evaluator"] == evaluator][-last:]
+        rows = {}
+        for entry in entries:
+            column = f"#{entry['number']} · {entry['evaluated_at']:%H:%M:%S}"
+            for name, value in (*entry["inputs"].items(), *entry["figures"].items()):
+                rows.setdefault(name, {})[column] = _display(value)
+        return [{"Field": field_label(name), **values} for name, values in rows.items()]
+
+    def records(self):
+        """Flat rows for export: inputs are prefixed ``input_``, figures keep their names"""
+        return [
+            {
+                "number": e["number"],
+                "evaluated_at": e["evaluated_at"],
+                "evaluator": e["evaluator"],
+                **{f"input_{name}": value for name, value in e["inputs"].items()},
+                **e["figures"],
+            }
+            for e in self.entries
+        ]
+
+    def export(self, fmt="csv"):
+        """The whole history as CSV or Parquet bytes"""
+        import pandas as pd
+
+        frame = pd.DataFrame(self.records())
+        if fmt == "parquet":
+            buffer = io.BytesIO()
+            frame.to_parquet(buffer, index=False)
+            return buffer.getvalue()
+        return frame.to_csv(index=False).encode()
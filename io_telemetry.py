@@ -0,0 +1,149 @@
+"""Telemetry for outbound I/O (award search API, SMTP).
+
+Every outbound call records its duration, status, retry count, payload sizes
+and error class. Durations are aggregated per endpoint into log-spaced
+histograms (constant memory, ~10% relative error) so tail percentiles can be
+queried locally with ``summary()``. Setting ``UNITED_MILES_IO_LOG`` also
+appends each event as a JSON line; ``python io_telemetry.py <log>`` then
+prints the per-endpoint summary across processes and restarts.
+"""
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+IO_LOG_PATH = os.environ.get("UNITED_MILES_IO_LOG")
+
+# Histogram buckets grow by 10% from 1 ms; the last bucket catches everything slower than ~2 minutes
+MIN_SECONDS = 0.001
+GROWTH = 1.1
+BUCKET_COUNT = 125
+
+_LOG_GROWTH = math.log(GROWTH)
+
+
+def _bucket(seconds):
+    if seconds <= MIN_SECONDS:
+        return 0
+    return min(int(math.log(seconds / MIN_SECONDS) / _LOG_GROWTH) + 1, BUCKET_COUNT - 1)
+
+
+def _bucket_upper(index):
+    return MIN_SECONDS * GROWTH ** index
+
+
+class EndpointStats:
+    """Aggregated telemetry for one endpoint"""
+
+    def __init__(self):
+        self.histogram = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.retries = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.statuses = Counter()
+        self.errors = Counter()
+
+    def add(self, event):
+        seconds = event["duration"]
+        self.histogram[_bucket(seconds)] += 1
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.retries += event.get("retries", 0)
+        self.request_bytes += event.get("request_bytes", 0)
+        self.response_bytes += event.get("response_bytes", 0)
+        self.statuses[str(event.get("status"))] += 1
+        if event.get("error"):
+            self.errors[event["error"]] += 1
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the ``q``-th percentile (0-100)"""
+        if not self.count:
+            return None
+        rank = math.ceil(q / 100 * self.count)
+        seen = 0
+        for index, n in enumerate(self.histogram):
+            seen += n
+            if seen >= rank:
+                return min(_bucket_upper(index), self.max_seconds)
+        return self.max_seconds
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "p50_s": self.percentile(50),
+            "p90_s": self.percentile(90),
+            "p99_s": self.percentile(99),
+            "max_s": self.max_seconds,
+            "mean_s": self.total_seconds / self.count if self.count else None,
+            "retries": self.retries,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "statuses": dict(self.statuses),
+            "errors": dict(self.errors),
+        }
+
+
+_lock = threading.Lock()
+_endpoints = {}
+
+
+def record_call(endpoint, duration, status=None, retries=0, request_bytes=0, response_bytes=0, error=None):
+    """Record one outbound call. ``error`` is the exception (or its class name) if it failed."""
+    event = {
+        "endpoint": endpoint,
+        "ts": time.time(),
+        "duration": duration,
+        "status": status,
+        "retries": retries,
+        "request_bytes": request_bytes,
+        "response_bytes": response_bytes,
+        "error": error if error is None or isinstance(error, str) else type(error).__name__,
+    }
+    with _lock:
+        _endpoints.setdefault(endpoint, EndpointStats()).add(event)
+        if IO_LOG_PATH:
+            with open(IO_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(event) + "\n")
+    return event
+
+
+def summary(endpoint=None):
+    """Per-endpoint percentiles and counters (or a single endpoint's)"""
+    with _lock:
+        if endpoint is not None:
+            stats = _endpoints.get(endpoint)
+            return stats.summary() if stats else None
+        return {name: stats.summary() for name, stats in _endpoints.items()}
+
+
+def reset():
+    with _lock:
+        _endpoints.clear()
+
+
+def summarize_log(path):
+    """Aggregate a JSONL event log written via ``UNITED_MILES_IO_LOG``"""
+    endpoints = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                event = json.loads(line)
+                endpoints.setdefault(event["endpoint"], EndpointStats()).add(event)
+    return {name: stats.summary() for name, stats in endpoints.items()}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        raise SystemExit("usage: python io_telemetry.py <io-log.jsonl>")
+    for name, stats in sorted(summarize_log(sys.argv[1]).items()):
+        print(f"{name}: {stats['count']} calls, p50 {stats['p50_s'] * 1000:.0f} ms, "
+              f"p90 {stats['p90_s'] * 1000:.0f} ms, p99 {stats['p99_s'] * 1000:.0f} ms, "
+              f"max {stats['max_s'] * 1000:.0f} ms, {stats['retries']} retries")
+        print(f"  statuses: {stats['statuses']}  errors: {stats['errors']}")
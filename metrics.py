@@ -0,0 +1,163 @@
+"""Lightweight, opt-in instrumentation for the evaluator hot paths.
+
+Set ``UNITED_MILES_METRICS=1`` to enable. When disabled, ``instrumented``
+returns the function untouched and ``record_cache`` returns immediately, so
+production calls pay nothing. When enabled it records call counts, latency
+histograms and cache hit/miss counts, exposed in the Prometheus text format
+through ``render_prometheus()``, ``dump_metrics()`` or a small local HTTP
+endpoint (``start_metrics_server()``).
+"""
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_ENABLED = os.environ.get("UNITED_MILES_METRICS", "").lower() in ("1", "true", "yes")
+METRICS_PORT = int(os.environ.get("UNITED_MILES_METRICS_PORT", "9464"))
+
+# Latency histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+_lock = threading.Lock()
+_calls = {}  # name -> [count, errors, total_seconds, bucket counts...]
+_cache = {}  # name -> [hits, misses]
+
+
+def _observe(name, seconds, failed):
+    with _lock:
+        stats = _calls.get(name)
+        if stats is None:
+            stats = _calls[name] = [0, 0, 0.0] + [0] * (len(LATENCY_BUCKETS) + 1)
+        stats[0] += 1
+        stats[1] += failed
+        stats[2] += seconds
+        stats[3 + bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+
+def instrumented(func=None, *, name=None):
+    """Decorator recording call count and latency of ``func`` when metrics are enabled"""
+    if func is None:
+        return functools.partial(instrumented, name=name)
+    if not METRICS_ENABLED:
+        return func
+    metric_name = name or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = func(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            _observe(metric_name, time.perf_counter() - start, failed)
+
+    return wrapper
+
+
+def record_cache(name, hit, count=1):
+    """Count ``count`` hits or misses for the cache called ``name``"""
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        _cache.setdefault(name, [0, 0])[0 if hit else 1] += count
+
+
+def snapshot():
+    """Copy of the current counters: ``{"calls": {...}, "cache": {...}}``"""
+    with _lock:
+        calls = {
+            name: {
+                "count": stats[0],
+                "errors": stats[1],
+                "sum_seconds": stats[2],
+                "buckets": list(zip(LATENCY_BUCKETS + (float("inf"),), stats[3:])),
+            }
+            for name, stats in _calls.items()
+        }
+        cache = {
+            name: {"hits": hits, "misses": misses, "hit_ratio": hits / (hits + misses) if hits + misses else 0.0}
+            for name, (hits, misses) in _cache.items()
+        }
+    return {"calls": calls, "cache": cache}
+
+
+def reset():
+    with _lock:
+        _calls.clear()
+        _cache.clear()
+
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format"""
+    data = snapshot()
+    lines = [
+        "# HELP united_miles_evaluator_calls_total Evaluator calls.",
+        "# TYPE united_miles_evaluator_calls_total counter",
+    ]
+    for name, stats in sorted(data["calls"].items()):
+        lines.append(f'united_miles_evaluator_calls_total{{function="{name}"}} {stats["count"]}')
+    lines += [
+        "# HELP united_miles_evaluator_errors_total Evaluator calls that raised.",
+        "# TYPE united_miles_evaluator_errors_total counter",
+    ]
+    for name, stats in sorted(data["calls"].items()):
+        lines.append(f'united_miles_evaluator_errors_total{{function="{name}"}} {stats["errors"]}')
+    lines += [
+        "# HELP united_miles_evaluator_latency_seconds Evaluator latency.",
+        "# TYPE united_miles_evaluator_latency_seconds histogram",
+    ]
+    for name, stats in sorted(data["calls"].items()):
+        cumulative = 0
+        for bound, count in stats["buckets"]:
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'united_miles_evaluator_latency_seconds_bucket{{function="{name}",le="{le}"}} {cumulative}')
+        lines.append(f'united_miles_evaluator_latency_seconds_sum{{function="{name}"}} {stats["sum_seconds"]}')
+        lines.append(f'united_miles_evaluator_latency_seconds_count{{function="{name}"}} {stats["count"]}')
+    lines += [
+        "# HELP united_miles_cache_requests_total Cache lookups by result.",
+        "# TYPE united_miles_cache_requests_total counter",
+    ]
+    for name, stats in sorted(data["cache"].items()):
+        lines.append(f'united_miles_cache_requests_total{{cache="{name}",result="hit"}} {stats["hits"]}')
+        lines.append(f'united_miles_cache_requests_total{{cache="{name}",result="miss"}} {stats["misses"]}')
+    lines += [
+        "# HELP united_miles_cache_hit_ratio Share of cache lookups that hit.",
+        "# TYPE united_miles_cache_hit_ratio gauge",
+    ]
+    for name, stats in sorted(data["cache"].items()):
+        lines.append(f'united_miles_cache_hit_ratio{{cache="{name}"}} {stats["hit_ratio"]}')
+    return "\n".join(lines) + "\n"
+
+
+def dump_metrics(path):
+    """Write the Prometheus text dump to ``path``"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep scrapes out of the app logs
+
+
+def start_metrics_server(port=METRICS_PORT, host="127.0.0.1"):
+    """Serve ``/metrics`` on a local port from a daemon thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
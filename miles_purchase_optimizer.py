@@ -0,0 +1,118 @@
+"""Cover a miles shortfall with the cheapest set of Buy Miles purchases.
+
+Purchases come in blocks (1,000 miles) between a per-transaction minimum and
+cap, and promotions add a bonus by stepped tier: the highest tier whose
+"buy at least" threshold a purchase reaches sets its bonus, as a percentage
+of the miles bought and/or a flat number of miles. Because a bigger purchase
+can reach a richer tier, the cheapest way to get N miles is often not N miles
+in one go; the optimizer solves it as an unbounded min-cost cover over every
+purchasable quantity, with prices in whole cents so the DP is exact integer
+arithmetic.
+"""
+import math
+from collections import Counter
+from functools import reduce
+
+import numpy as np
+
+# Upper bound on DP cells; larger shortfalls are counted in coarser steps
+MAX_DP_CELLS = 20_000
+
+
+def tier_bonus(miles, tiers):
+    """Bonus miles for buying ``miles`` in one transaction.
+
+    ``tiers`` is a list of ``(buy_at_least, bonus_percent, bonus_miles)``;
+    percentage bonuses are rounded down to whole miles.
+    """
+    reached = [tier for tier in tiers if miles >= tier[0]]
+    if not reached:
+        return 0
+    _, bonus_percent, bonus_miles = max(reached, key=lambda tier: tier[0])
+    return math.floor(miles * bonus_percent / 100) + int(bonus_miles)
+
+
+def purchase_options(price_per_block, tiers, block_miles=1000, min_miles=1000, max_miles=150000):
+    """Every single purchase as ``(miles_bought, bonus_miles, price_cents)``, smallest first"""
+    block_cents = round(price_per_block * 100)
+    first = max(math.ceil(min_miles / block_miles), 1)
+    return [
+        (blocks * block_miles, tier_bonus(blocks * block_miles, tiers), blocks * block_cents)
+        for blocks in range(first, int(max_miles // block_miles) + 1)
+    ]
+
+
+def _credit_step(credits, shortfall):
+    """DP granularity: the common divisor of all credited amounts, or coarser if needed"""
+    step = reduce(math.gcd, credits, int(shortfall)) or 1
+    if shortfall // step > MAX_DP_CELLS:
+        step = math.ceil(shortfall / MAX_DP_CELLS)
+    return step
+
+
+def optimize_miles_purchase(shortfall, price_per_block, tiers, block_miles=1000, min_miles=1000, max_miles=150000):
+    """
+    Find the cheapest set of purchases crediting at least ``shortfall`` miles.
+
+    ``price_per_block`` is the price in dollars of ``block_miles`` miles and
+    ``tiers`` the promotion's ``(buy_at_least, bonus_percent, bonus_miles)``
+    steps. Returns a dict with the purchases, totals and the effective cents
+    per mile of every single purchase size (the CPM curve).
+    """
+    if shortfall <= 0:
+        return {"Error": "Enter how many miles you need"}
+    if price_per_block <= 0:
+        return {"Error": "Enter the price per 1,000 miles"}
+    if any(tier[0] < 0 or tier[1] < 0 or tier[2] < 0 for tier in tiers):
+        return {"Error": "Bonus tiers cannot be negative"}
+    options = purchase_options(price_per_block, tiers, block_miles, min_miles, max_miles)
+    if not options:
+        return {"Error": "No purchase fits between the minimum and maximum per transaction"}
+
+    shortfall = math.ceil(shortfall)
+    credited = [miles + bonus for miles, bonus, _ in options]
+    step = _credit_step(credited, shortfall)
+    target = math.ceil(shortfall / step)
+    # Round down so a coarse step can never leave the plan short
+    credit = np.array([c // step for c in credited], dtype=np.int64)
+    price = np.array([cents for _, _, cents in options], dtype=np.int64)
+
+    # dp[k] = cheapest price crediting at least k steps; choice[k] = purchase made last
+    dp = np.zeros(target + 1, dtype=np.int64)
+    choice = np.zeros(target + 1, dtype=np.int64)
+    for k in range(1, target + 1):
+        candidates = price + dp[np.maximum(k - credit, 0)]
+        candidates[credit == 0] = np.iinfo(np.int64).max  # Cannot make progress
+        choice[k] = np.argmin(candidates)
+        dp[k] = candidates[choice[k]]
+
+    bought = Counter()
+    k = target
+    while k > 0:
+        bought[int(choice[k])] += 1
+        k = max(k - int(credit[choice[k]]), 0)
+
+    purchases = [
+        {
+            "Buy": options[i][0],
+            "Bonus": options[i][1],
+            "Miles Credited": credited[i],
+            "Price": options[i][2] / 100,
+            "Times": count,
+        }
+        for i, count in sorted(bought.items(), key=lambda item: -options[item[0]][0])
+    ]
+    total_cents = sum(options[i][2] * count for i, count in bought.items())
+    total_credited = sum(credited[i] * count for i, count in bought.items())
+    return {
+        "Purchases": purchases,
+        "Total Cost": total_cents / 100,
+        "Miles Credited": total_credited,
+        "Extra Miles": total_credited - shortfall,
+        "Effective CPM": total_cents / total_credited,
+        "CPM Curve": [
+            {"Miles Bought": miles, "Miles Credited": miles + bonus, "Price": cents / 100,
+             "Effective CPM": cents / (miles + bonus)}
+            for miles, bonus, cents in options
+        ],
+    }
@@ -0,0 +1,149 @@
+"""Award search that fans out to airports near the origin and destination.
+
+Airports are placed on the unit sphere as 3-D vectors and indexed with a small
+k-d tree (each node keeps its bounding box, so a radius query only opens
+boxes that can hold a match). A great-circle radius maps to a straight-line
+chord, so "within 60 miles of SFO" finds OAK and SJC without trigonometry per
+airport and without special cases at the date line.
+
+Every origin/destination pair is then looked up concurrently with
+``check_award_availability`` (nearest pairs first, at most ``MAX_PAIRS``
+calls) and the results are ranked by the cents-per-mile that
+``evaluate_best_option`` reports for redeeming miles on them.
+"""
+import math
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from airports import EARTH_RADIUS_MILES, get_airport_index
+from award_api import DEFAULT_CABIN, check_award_availability
+from calculators import DEFAULT_VALUATION, evaluate_best_option
+
+DEFAULT_RADIUS_MILES = 60
+MAX_PAIRS = 25  # Upper bound on award API calls per search
+MAX_WORKERS = 8
+LEAF_SIZE = 8
+
+
+def unit_vectors(lat, lon):
+    """Degrees to points on the unit sphere, one row per coordinate"""
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def chord_for_miles(miles):
+    """Straight-line distance on the unit sphere matching a great-circle distance in miles"""
+    return 2 * math.sin(min(miles / EARTH_RADIUS_MILES, math.pi) / 2)
+
+
+class KDTree:
+    """Static k-d tree with bounding boxes, for radius queries"""
+
+    def __init__(self, points, leaf_size=LEAF_SIZE):
+        self.points = np.asarray(points, dtype=np.float64)
+        self.leaf_size = leaf_size
+        self.order = np.arange(len(self.points))
+        # Node: (start, end, box_low, box_high, left child, right child); children are -1 for leaves
+        self.nodes = []
+        self._build(0, len(self.points))
+
+    def _build(self, start, end):
+        node = len(self.nodes)
+        points = self.points[self.order[start:end]]
+        low, high = points.min(axis=0), points.max(axis=0)
+        self.nodes.append((start, end, low, high, -1, -1))
+        if end - start > self.leaf_size:
+            axis = int(np.argmax(high - low))  # Split the widest side at its median
+            mid = (end - start) // 2
+            self.order[start:end] = self.order[start:end][np.argpartition(points[:, axis], mid)]
+            left = self._build(start, start + mid)
+            right = self._build(start + mid, end)
+            self.nodes[node] = (start, end, low, high, left, right)
+        return node
+
+    def query_radius(self, point, radius):
+        """Indices of points within ``radius`` of ``point``, nearest first"""
+        point = np.asarray(point, dtype=np.float64)
+        radius_sq = radius * radius
+        found, distances = [], []
+        stack = [0] if self.nodes else []
+        while stack:
+            start, end, low, high, left, right = self.nodes[stack.pop()]
+            gap = np.maximum(0.0, np.maximum(low - point, point - high))
+            if gap @ gap > radius_sq:
+                continue
+            if left < 0:
+                members = self.order[start:end]
+                d_sq = ((self.points[members] - point) ** 2).sum(axis=1)
+                inside = d_sq <= radius_sq
+                found.extend(members[inside])
+                distances.extend(d_sq[inside])
+            else:
+                stack += [left, right]
+        return [int(found[i]) for i in np.argsort(distances, kind="stable")]
+
+
+@lru_cache(maxsize=1)
+def get_airport_tree():
+    index = get_airport_index()
+    return KDTree(unit_vectors(index.lat, index.lon))
+
+
+def nearby_airports(code, radius_miles=DEFAULT_RADIUS_MILES):
+    """Airport codes within ``radius_miles`` of ``code`` (itself first); ``[code]`` if unknown"""
+    index = get_airport_index()
+    i = int(index.lookup(code))
+    if i < 0:
+        return [code.strip().upper()]
+    tree = get_airport_tree()
+    return [str(index.codes[j]) for j in tree.query_radius(tree.points[i], chord_for_miles(radius_miles))]
+
+
+def search_nearby_awards(origin, destination, date, radius_miles=DEFAULT_RADIUS_MILES, cabin=DEFAULT_CABIN,
+                         valuation=DEFAULT_VALUATION, max_workers=MAX_WORKERS, fetch=check_award_availability,
+                         known=None):
+    """Query every nearby origin/destination pair concurrently and rank the awards by CPM.
+
+    ``known`` maps ``(origin, destination)`` to an ``(award_miles, cash_price)``
+    answer already fetched (e.g. the search the user just ran); those pairs
+    are ranked without being queried again. Returns ``{"Results": [...],
+    "Errors": [...], "Skipped": n}``; results are sorted best CPM first and
+    ``Skipped`` counts the farthest pairs left out to stay within ``MAX_PAIRS``.
+    """
+    known = {(o.strip().upper(), d.strip().upper()): answer for (o, d), answer in (known or {}).items()}
+    # Both lists are nearest first; order pairs by combined rank so a cut drops the farthest ones
+    ranked = sorted(
+        (i + j, o, d)
+        for i, o in enumerate(nearby_airports(origin, radius_miles))
+        for j, d in enumerate(nearby_airports(destination, radius_miles))
+    )
+    pairs = [(o, d) for _, o, d in ranked if o != d and (o, d) not in known]
+    skipped = max(len(pairs) - MAX_PAIRS, 0)
+    pairs = pairs[:MAX_PAIRS]
+
+    def lookup(pair):
+        return pair, fetch(pair[0], pair[1], date, cabin=cabin)
+
+    results, errors = [], []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pairs)))) as pool:
+        for (o, d), (award_miles, cash_price) in [*known.items(), *pool.map(lookup, pairs)]:
+            try:
+                miles, cash = int(award_miles), float(cash_price)
+            except (TypeError, ValueError):
+                errors.append({"Origin": o, "Destination": d, "Error": str(cash_price)})
+                continue
+            if miles <= 0 or cash <= 0:
+                continue
+            option = evaluate_best_option(miles, cash, 0, 0, valuation=valuation)
+            results.append({
+                "Origin": o,
+                "Destination": d,
+                "Miles": miles,
+                "Cash": cash,
+                "CPM": option["CPM_Miles"],
+                "Best Option": option["Best Option"],
+            })
+    results.sort(key=lambda row: (-row["CPM"], row["Miles"]))
+    return {"Results": results, "Errors": errors, "Skipped": skipped}
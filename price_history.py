@@ -0,0 +1,173 @@
+"""Local time-series store of observed award and cash prices.
+
+Every quote seen by ``check_award_availability`` can be recorded as
+``(route, travel_date, cabin, miles, cash, fetched_at)`` in a SQLite database
+running in WAL mode. Inserts are buffered and written with ``executemany`` in
+one transaction per batch, and composite indexes on (route, travel_date,
+miles) and (route, cabin, travel_date, miles) make range queries such as
+"lowest miles for SFO-JFK in March" index-only scans.
+"""
+import atexit
+import datetime
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from award_api import route_key
+
+# Same cache directory as upgrade_table, without importing numpy into the alerts page
+CACHE_DIR = os.environ.get("UNITED_MILES_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+HISTORY_DB_PATH = os.environ.get("UNITED_MILES_HISTORY_DB", os.path.join(CACHE_DIR, "award_history.sqlite"))
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 2.0  # Seconds a quote may sit in the buffer
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS award_quotes (
+    route TEXT NOT NULL,          -- "SFO-JFK"
+    travel_date INTEGER NOT NULL, -- YYYYMMDD, compact and still sortable
+    cabin TEXT NOT NULL,
+    miles INTEGER,
+    cash REAL,
+    fetched_at REAL NOT NULL      -- Unix timestamp
+);
+CREATE INDEX IF NOT EXISTS idx_quotes_route_date ON award_quotes (route, travel_date, miles);
+CREATE INDEX IF NOT EXISTS idx_quotes_route_cabin_date ON award_quotes (route, cabin, travel_date, miles);
+"""
+
+
+def parse_route(text):
+    """``"sfo-jfk"``, ``"SFO JFK"`` or ``"SFO→JFK"`` to ``"SFO-JFK"``; None if it isn't two airport codes"""
+    codes = re.findall(r"[A-Za-z]{3}", text or "")
+    return route_key(codes[0], codes[1]) if len(codes) == 2 else None
+
+
+def date_key(value):
+    """``date``/``datetime``/ISO string to the integer YYYYMMDD used in the table"""
+    if isinstance(value, str):
+        value = datetime.date.fromisoformat(value[:10])
+    return value.year * 10000 + value.month * 100 + value.day
+
+
+def _from_date_key(key):
+    return datetime.date(key // 10000, key // 100 % 100, key % 100)
+
+
+class PriceHistory:
+    """Buffered writer and query helper for the quote database"""
+
+    def __init__(self, path=HISTORY_DB_PATH, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._buffered_since = None
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        atexit.register(self.flush)
+
+    def record(self, route, travel_date, cabin, miles, cash, fetched_at=None):
+        """Buffer one quote; the batch is written once it is full or old enough"""
+        row = (route, date_key(travel_date), cabin, miles, cash, fetched_at or time.time())
+        with self._lock:
+            self._buffer.append(row)
+            if self._buffered_since is None:
+                self._buffered_since = time.monotonic()
+            if len(self._buffer) >= self.batch_size or time.monotonic() - self._buffered_since >= self.flush_interval:
+                self._flush_locked()
+
+    def record_quote(self, quote):
+        """Listener for ``award_api.add_quote_listener``"""
+        self.record(quote["route"], quote["travel_date"], quote["cabin"], quote["miles"], quote["cash"], quote["fetched_at"])
+
+    def record_many(self, rows):
+        """Bulk-insert ``(route, travel_date, cabin, miles, cash, fetched_at)`` tuples"""
+        rows = [(r, date_key(d), c, m, p, t) for r, d, c, m, p, t in rows]
+        with self._lock:
+            self._write(rows)
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._buffer:
+            self._write(self._buffer)
+            self._buffer = []
+        self._buffered_since = None
+
+    def _write(self, rows):
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany(
+                "INSERT INTO award_quotes (route, travel_date, cabin, miles, cash, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _query(self, sql, params):
+        self.flush()
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _filters(route, start, end, cabin):
+        sql = "route = ?"
+        params = [route]
+        if cabin is not None:
+            sql += " AND cabin = ?"
+            params.append(cabin)
+        sql += " AND travel_date BETWEEN ? AND ?"
+        params += [date_key(start), date_key(end)]
+        return sql, params
+
+    def lowest_miles(self, route, start, end, cabin=None):
+        """Lowest miles price seen for travel between ``start`` and ``end`` (inclusive), or None"""
+        where, params = self._filters(route, start, end, cabin)
+        return self._query(f"SELECT MIN(miles) FROM award_quotes WHERE {where}", params)[0][0]
+
+    def lowest_cash(self, route, start, end, cabin=None):
+        where, params = self._filters(route, start, end, cabin)
+        return self._query(f"SELECT MIN(cash) FROM award_quotes WHERE {where}", params)[0][0]
+
+    def daily_lows(self, route, start, end, cabin=None):
+        """``[(date, lowest miles, lowest cash), ...]`` for each travel date with quotes"""
+        where, params = self._filters(route, start, end, cabin)
+        rows = self._query(
+            f"SELECT travel_date, MIN(miles), MIN(cash) FROM award_quotes WHERE {where} "
+            "GROUP BY travel_date ORDER BY travel_date",
+            params,
+        )
+        return [(_from_date_key(day), miles, cash) for day, miles, cash in rows]
+
+    def quotes(self, route, start, end, cabin=None, limit=1000):
+        """Raw quotes, newest first"""
+        where, params = self._filters(route, start, end, cabin)
+        rows = self._query(
+            f"SELECT route, travel_date, cabin, miles, cash, fetched_at FROM award_quotes WHERE {where} "
+            "ORDER BY fetched_at DESC LIMIT ?",
+            params + [limit],
+        )
+        return [(r, _from_date_key(d), c, m, p, t) for r, d, c, m, p, t in rows]
+
+    def rows_since(self, rowid, limit=100_000):
+        """``[(rowid, route, cabin, travel_date, miles, cash), ...]`` inserted after ``rowid``, oldest first"""
+        rows = self._query(
+            "SELECT rowid, route, cabin, travel_date, miles, cash FROM award_quotes WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            [rowid, limit],
+        )
+        return [(i, r, c, _from_date_key(d), m, p) for i, r, c, d, m, p in rows]
+
+    def close(self):
+        self.flush()
+        atexit.unregister(self.flush)
+        self._conn.close()
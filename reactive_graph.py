@@ -0,0 +1,85 @@
+"""Small reactive graph, so a rerun recomputes only what its changes affect.
+
+Inputs are set from the widget values on every rerun; each derived node
+declares the nodes it reads and is recomputed, when asked for, only if one of
+them has changed since it was last computed. Every node carries a version that
+moves only when its value actually changes: setting an input to the value it
+already has, or recomputing a node to an equal value, leaves the version
+alone, so a change stops propagating as soon as it no longer makes a
+difference downstream. Nodes are evaluated lazily, so a tab that is not open
+never computes anything.
+"""
+from collections import Counter
+
+
+def _equal(a, b):
+    try:
+        return bool(a == b)
+    except Exception:  # e.g. arrays, whose == is elementwise
+        return False
+
+
+class ReactiveGraph:
+    """Named inputs and derived nodes, memoizing the last value of each"""
+
+    def __init__(self):
+        self._inputs = set()
+        self._derived = {}  # name -> (func, deps)
+        self._values = {}
+        self._versions = {}
+        self._computed_from = {}  # derived name -> versions of its deps when last computed
+        self.recomputes = Counter()
+
+    def __contains__(self, name):
+        return name in self._inputs or name in self._derived
+
+    def input(self, *names):
+        for name in names:
+            if name in self:
+                raise ValueError(f"{name} is already defined")
+            self._inputs.add(name)
+
+    def derive(self, deps, name=None):
+        """Decorator adding ``func(*dep_values)`` as a node; deps must already exist, so there are no cycles"""
+        def decorator(func):
+            node = name or func.__name__
+            if node in self:
+                raise ValueError(f"{node} is already defined")
+            missing = [dep for dep in deps if dep not in self]
+            if missing:
+                raise ValueError(f"{node} depends on undefined {', '.join(missing)}")
+            self._derived[node] = (func, tuple(deps))
+            return func
+        return decorator
+
+    def _store(self, name, value):
+        if name in self._values and _equal(self._values[name], value):
+            return False
+        self._values[name] = value
+        self._versions[name] = self._versions.get(name, 0) + 1
+        return True
+
+    def set(self, name, value):
+        """Set an input; returns whether its value changed"""
+        if name not in self._inputs:
+            raise KeyError(f"{name} is not an input")
+        return self._store(name, value)
+
+    def update(self, **values):
+        for name, value in values.items():
+            self.set(name, value)
+
+    def get(self, name):
+        """Current value of a node, recomputing it (and what it reads) only if an input it depends on changed"""
+        if name in self._inputs:
+            if name not in self._values:
+                raise KeyError(f"input {name} has not been set")
+            return self._values[name]
+        func, deps = self._derived[name]
+        args = [self.get(dep) for dep in deps]
+        versions = tuple(self._versions[dep] for dep in deps)
+        if self._computed_from.get(name) != versions:
+            self.recomputes[name] += 1
+            self._store(name, func(*args))
+            self._computed_from[name] = versions
+        return self._values[name]
@@ -0,0 +1,135 @@
+"""Opt-in profiler for a single Streamlit script run.
+
+``RunProfiler`` combines two views of where a rerun spends its time:
+
+* named sections timed with ``section()`` (header, sidebar, each tab), and
+* a sampling profiler: a daemon thread that snapshots the script thread's
+  stack every few milliseconds via ``sys._current_frames()``. Samples are
+  aggregated into hot functions (self and cumulative), a coarse category
+  breakdown (widgets, evaluator math, image loading, network) and folded
+  stacks that flamegraph tools and speedscope can import.
+
+The profiler only exists while profiling is switched on, so normal runs pay
+nothing.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+SAMPLE_INTERVAL = 0.002  # Seconds between stack samples
+MAX_PROFILE_SECONDS = 60  # Safety stop for runs that never call stop()
+MAX_STACK_DEPTH = 64
+
+# First matching module prefix wins
+CATEGORIES = (
+    ("Network", ("requests", "urllib3", "http.", "socket", "ssl", "smtplib", "award_api")),
+    ("Image loading", ("static_assets", "PIL", "streamlit.elements.lib.image_utils", "streamlit.elements.image")),
+    ("Evaluator math", ("calculators", "wallet_optimizer", "upgrade_table", "verdict_rules", "numpy")),
+    ("Widgets & layout", ("streamlit",)),
+)
+
+
+def _categorize(modules):
+    """Category of a sample, judged from its innermost recognizable frame"""
+    for module in modules:
+        for category, prefixes in CATEGORIES:
+            if module.startswith(prefixes):
+                return category
+    return "App script"
+
+
+class RunProfiler:
+    """Section timer plus sampling profiler for the thread that creates it"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.sections = []
+        self.self_counts = Counter()
+        self.total_counts = Counter()
+        self.categories = Counter()
+        self.folded = Counter()
+        self.samples = 0
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._sampler = None
+        self._started = None
+        self.elapsed = 0.0
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample_loop, name="run-profiler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def stop(self):
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+            self.elapsed = time.perf_counter() - self._started
+        return self
+
+    @contextmanager
+    def section(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections.append((name, time.perf_counter() - start))
+
+    def _sample_loop(self):
+        deadline = time.perf_counter() + MAX_PROFILE_SECONDS
+        while not self._stop.wait(self.interval) and time.perf_counter() < deadline:
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._record(frame)
+
+    def _record(self, frame):
+        stack = []
+        modules = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            module = frame.f_globals.get("__name__", "?")
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            modules.append(module)
+            frame = frame.f_back
+        if not stack:
+            return
+        self.samples += 1
+        self.self_counts[stack[0]] += 1
+        for name in set(stack):
+            self.total_counts[name] += 1
+        self.categories[_categorize(modules)] += 1
+        self.folded[";".join(reversed(stack))] += 1
+
+    def report(self, top=15):
+        """Plain-data summary suitable for display and JSON export"""
+        per_sample = self.interval * 1000
+        return {
+            "elapsed_ms": self.elapsed * 1000,
+            "sample_interval_ms": per_sample,
+            "samples": self.samples,
+            "sections": [{"Section": name, "Time (ms)": seconds * 1000} for name, seconds in self.sections],
+            "categories": [
+                {"Category": name, "Samples": n, "Share": n / self.samples}
+                for name, n in self.categories.most_common()
+            ],
+            "hot_functions": [
+                {"Function": name, "Self (ms)": n * per_sample, "Total (ms)": self.total_counts[name] * per_sample}
+                for name, n in self.self_counts.most_common(top)
+            ],
+            "folded_stacks": [f"{stack} {n}" for stack, n in self.folded.most_common()],
+        }
+
+
+@contextmanager
+def profile_section(profiler, name):
+    """``profiler.section(name)`` when profiling, otherwise a no-op"""
+    if profiler is None:
+        yield
+    else:
+        with profiler.section(name):
+            yield
@@ -0,0 +1,43 @@
+"""Bundled static assets (logo etc.) served without any network fetch.
+
+Assets are read and base64-encoded once per process; ``st.image`` passes the
+resulting ``data:`` URI straight to the browser, so reruns neither hit the
+disk nor re-encode the file. An asset that has not been vendored into
+``assets/`` yet falls back to its remote URL.
+"""
+import base64
+import mimetypes
+import os
+from functools import lru_cache
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+UA_LOGO = "united_logo.png"
+UA_LOGO_URL = "https://logos-world.net/wp-content/uploads/2020/11/United-Airlines-Logo-700x394.png"
+
+
+def asset_path(name):
+    """Absolute path of a bundled asset"""
+    return os.path.join(ASSETS_DIR, name)
+
+
+@lru_cache(maxsize=None)
+def asset_bytes(name):
+    """Raw bytes of a bundled asset, read once per process"""
+    with open(asset_path(name), "rb") as f:
+        return f.read()
+
+
+@lru_cache(maxsize=None)
+def asset_data_uri(name):
+    """Bundled asset as a ``data:`` URI, encoded once per process"""
+    mime = "image/svg+xml" if name.endswith(".svg") else mimetypes.guess_type(name)[0]
+    encoded = base64.b64encode(asset_bytes(name)).decode("ascii")
+    return f"data:{mime or 'application/octet-stream'};base64,{encoded}"
+
+
+@lru_cache(maxsize=None)
+def asset_source(name, fallback_url):
+    """``data:`` URI of a bundled asset, or ``fallback_url`` while it is not in ``assets/``"""
+    if not os.path.isfile(asset_path(name)):
+        return fallback_url
+    return asset_data_uri(name)
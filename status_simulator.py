@@ -0,0 +1,122 @@
+"""Cheapest way to each Premier status level with Award Accelerator offers.
+
+Every level can be earned two ways: enough PQP plus enough PQF, or a higher
+PQP total alone. Planned flights add known PQP and PQF, so the PQF earned
+decides which of the two PQP targets applies and each level reduces to "PQP
+still needed". Each accelerator offer can be bought once, so the cheapest set
+of offers reaching a PQP target is a 0/1 min-cost cover; one DP over PQP
+(counted in steps of the common divisor of the offers' PQP, coarsened past
+``MAX_DP_CELLS``) answers every level at once.
+"""
+import math
+from collections import namedtuple
+from functools import reduce
+
+import numpy as np
+
+from calculators import DEFAULT_VALUATION, calculate_miles_value
+
+PremierLevel = namedtuple("PremierLevel", ["name", "pqp", "pqf", "pqp_only"])
+
+# PQP with PQF, the PQF needed alongside it, and PQP alone
+PREMIER_LEVELS = [
+    PremierLevel("Premier Silver", 5000, 15, 6000),
+    PremierLevel("Premier Gold", 10000, 30, 12000),
+    PremierLevel("Premier Platinum", 15000, 45, 18000),
+    PremierLevel("Premier 1K", 22000, 60, 28000),
+]
+
+# Upper bound on DP cells; larger PQP targets are counted in coarser steps
+MAX_DP_CELLS = 5_000
+
+
+def pqp_needed(level, pqp, pqf):
+    """PQP still needed for ``level`` after earning ``pqp`` and ``pqf``"""
+    target = level.pqp if pqf >= level.pqf else level.pqp_only
+    return max(target - pqp, 0)
+
+
+def _pqp_step(weights, capacity):
+    """DP granularity: the common divisor of the offers' PQP, or coarser if needed.
+
+    Any set of offers earns a multiple of their divisor, so counting targets
+    in those steps (rounded up) is exact.
+    """
+    step = reduce(math.gcd, weights, 0) or 1
+    if capacity / step > MAX_DP_CELLS:
+        step = math.ceil(capacity / MAX_DP_CELLS)
+    return step
+
+
+def simulate_status(current_pqp, current_pqf, flights, offers, levels=PREMIER_LEVELS, valuation=DEFAULT_VALUATION):
+    """
+    Find the cheapest set of accelerator offers that reaches each status level.
+
+    ``flights`` are planned flights as dicts with ``pqp`` and ``pqf`` (and an
+    optional ``name``); ``offers`` are accelerator offers with ``pqp``,
+    ``miles`` and ``cost`` (and an optional ``name``), each of which can be
+    bought once. Miles that come with an offer are valued at the low
+    valuation to give a net cost. Returns a dict with the PQP and PQF after
+    the planned flights and one row per level.
+    """
+    if current_pqp < 0 or current_pqf < 0:
+        return {"Error": "PQP and PQF cannot be negative"}
+    pqp = current_pqp + sum(flight.get("pqp", 0) for flight in flights)
+    pqf = current_pqf + sum(flight.get("pqf", 0) for flight in flights)
+    offers = [
+        {**offer, "name": offer.get("name") or f"Offer {i + 1}"}
+        for i, offer in enumerate(offers)
+        if offer.get("pqp", 0) > 0 and offer.get("cost", 0) >= 0
+    ]
+
+    needs = [math.ceil(pqp_needed(level, pqp, pqf)) for level in levels]
+    capacity = max(needs, default=0)
+    weights = [math.floor(offer["pqp"]) for offer in offers]
+    step = _pqp_step(weights, capacity)
+    cells = math.ceil(capacity / step)
+    # Round offers down and targets up so a coarse step never overstates progress
+    w = np.array([weight // step for weight in weights], dtype=np.int64)
+    cost = np.array([offer.get("cost", 0) for offer in offers], dtype=float)
+
+    # dp[k] = cheapest cost of at least k steps of PQP; take[i, k] = offer i is part of that set
+    dp = np.full(cells + 1, np.inf)
+    dp[0] = 0.0
+    take = np.zeros((len(offers), cells + 1), dtype=bool)
+    index = np.arange(cells + 1)
+    for i in range(len(offers)):
+        candidate = cost[i] + dp[np.maximum(index - w[i], 0)]
+        take[i] = candidate < dp
+        dp = np.where(take[i], candidate, dp)
+
+    rows = []
+    for level, need in zip(levels, needs):
+        k = math.ceil(need / step)
+        row = {
+            "Status": level.name,
+            "Requirement": f"{level.pqp:,} PQP + {level.pqf} PQF or {level.pqp_only:,} PQP",
+            "PQP Short": need,
+        }
+        if not need:
+            rows.append({**row, "Buy": "Already qualified", "Cost": 0.0, "Miles Received": 0, "Net Cost": 0.0})
+            continue
+        if not np.isfinite(dp[k]):
+            rows.append({**row, "Buy": "Out of reach with these offers", "Cost": None, "Miles Received": None, "Net Cost": None})
+            continue
+        chosen = []
+        for i in range(len(offers) - 1, -1, -1):
+            if take[i, k]:
+                chosen.append(offers[i])
+                k = max(k - int(w[i]), 0)
+        chosen.reverse()
+        total_cost = sum(offer.get("cost", 0) for offer in chosen)
+        miles = sum(offer.get("miles", 0) for offer in chosen)
+        miles_value_low, _ = calculate_miles_value(miles, valuation=valuation)
+        rows.append({
+            **row,
+            "Buy": ", ".join(offer["name"] for offer in chosen),
+            "Cost": total_cost,
+            "Miles Received": miles,
+            "Net Cost": total_cost - miles_value_low,
+        })
+
+    return {"PQP": pqp, "PQF": pqf, "Levels": rows}
@@ -1,3 +1,5 @@
+import json
+
 import streamlit as st
 
 st.set_page_config(
@@ -7,416 +9,287 @@ st.set_page_config(
     initial_sidebar_state="auto"                # Optional
 )
 
+from calculators import (
+    MILE_VALUE_LOW,
+    MILE_VALUE_HIGH,
+    MileValuation,
+    cabin_classes,
+    calculate_miles_value,
+    format_currency,
+    parse_user_input,
+    evaluate_accelerator,
+    evaluate_relative_upgrade_cost,
+    evaluate_upgrade,
+    evaluate_best_option,
+    evaluate_miles_purchase,
+    calculate_max_purchase_value,
+    accelerator_figures,
+    best_option_figures,
+    miles_purchase_figures,
+    upgrade_figures,
+)
+from evaluation_history import EXPORT_FORMATS, EvaluationHistory
+from metrics import METRICS_ENABLED, start_metrics_server
+from reactive_graph import ReactiveGraph
+from run_profiler import RunProfiler, profile_section
+from static_assets import UA_LOGO, UA_LOGO_URL, asset_source
+from verdict_rules import get_rules
+
 # Constants for easier maintenance
-MILE_VALUE_LOW = 0.012  # United miles valuation low (1.2 cents)
-MILE_VALUE_HIGH = 0.015  # United miles valuation high (1.5 cents)
-UA_LOGO_URL = "https://logos-world.net/wp-content/uploads/2020/11/United-Airlines-Logo-700x394.png"
 VERSION = "6.6"
-UPGRADE_COMFORT_HOURS = 6
-
-# Cabin Class Options
-cabin_classes = ["Economy", "Premium Plus", "Business (Polaris)"]
-
-# Upgrade Value Multipliers
-upgrade_multipliers = {
-    ("Economy", "Premium Plus"): 1.2,
-    ("Economy", "Business (Polaris)"): 1.5,
-    ("Premium Plus", "Business (Polaris)"): 1.3,
-    ("Business (Polaris)", "Business (Polaris)"): 1.0,  # No upgrade
-    ("Economy", "Economy"): 1.0,  # No upgrade
-    ("Premium Plus", "Premium Plus"): 1.0,  # No upgrade
-}
 
-# Helper functions
-def calculate_miles_value(miles, low_val=None, high_val=None):
-    """Calculate low and high dollar value of miles"""
-    if low_val is None:
-        low_val = CURRENT_MILE_VALUE_LOW
-    if high_val is None:
-        high_val = CURRENT_MILE_VALUE_HIGH
-    return miles * low_val, miles * high_val
+@st.cache_resource
+def get_upgrade_verdict_table(rules_digest):
+    """Load the precomputed upgrade verdicts once per server process and rules version"""
+    # Imported here so numpy is only loaded once an upgrade is evaluated
+    from upgrade_table import load_upgrade_table
+    return load_upgrade_table()
 
-def format_currency(value):
-    """Format a value as USD currency"""
-    return f"${value:.2f}"
+@st.cache_resource
+def start_metrics_endpoint():
+    """Expose evaluator metrics on a local /metrics endpoint once per server process"""
+    return start_metrics_server()
 
-def parse_user_input(input_str):
-    """
-    Parse user-friendly input formats like "13.6K", "1.2K", "500", etc.
-    Returns the numeric value.
-    """
-    if not input_str or input_str.strip() == "":
-        return 0
-    
-    input_str = str(input_str).strip().upper()
-    
-    # Handle K (thousands)
-    if 'K' in input_str:
-        try:
-            return float(input_str.replace('K', '')) * 1000
-        except ValueError:
-            return 0
-    
-    # Handle M (millions)
-    if 'M' in input_str:
-        try:
-            return float(input_str.replace('M', '')) * 1000000
-        except ValueError:
-            return 0
-    
-    # Handle regular numbers
-    try:
-        return float(input_str)
-    except ValueError:
-        return 0
-
-def validate_inputs(miles, cost):
-    """Validate basic inputs"""
-    if cost < 0:
-        return False, "Cost cannot be negative"
-    if miles < 0:
-        return False, "Miles cannot be negative"
-    return True, ""
-
-# Function to evaluate Award Accelerator (miles + PQP purchases)
-def evaluate_accelerator(miles, pqp, cost):
-    # Validate inputs
-    valid, error_message = validate_inputs(miles, cost)
-    if not valid:
-        return {"Error": error_message}
-    
-    # Calculate values
-    miles_worth_low, miles_worth_high = calculate_miles_value(miles)
-    effective_cost_low = cost - miles_worth_high if pqp else cost
-    effective_cost_high = cost - miles_worth_low if pqp else cost
-    cost_per_mile = cost / miles if miles > 0 else float('inf')
-    
-    # Calculate PQP cost values
-    if pqp > 0:
-        pqp_cost_low = effective_cost_low / pqp
-        pqp_cost_high = effective_cost_high / pqp
-        
-        # Determine verdict based on PQP cost
-        if pqp_cost_low < 1.30:
-            verdict = "✅ Excellent Deal!"
-        elif pqp_cost_low < 1.50:
-            verdict = "🟡 Decent Value."
-        else:
-            verdict = "❌ Not Worth It."
-    else:
-        pqp_cost_low = pqp_cost_high = None
-        # Determine verdict based on cost per mile
-        if cost_per_mile < 0.01:  # Less than 1 cent per mile is good
-            verdict = "✅ Good Deal!"
-        elif cost_per_mile < 0.012:  # Less than our low valuation
-            verdict = "🟡 Decent Value."
+if METRICS_ENABLED:
+    start_metrics_endpoint()
+
+@st.cache_resource
+def get_cpm_sketches():
+    """Per-route CPM sketches, fed from the award quote history shared with the alerts page"""
+    from cpm_sketch import CpmSketches
+    from price_history import PriceHistory
+    return CpmSketches(), PriceHistory()
+
+ANY_CABIN_LABEL = "Any cabin"
+
+def route_cpm_inputs(key_prefix):
+    """Optional route and cabin inputs for comparing a CPM against history"""
+    col1, col2 = st.columns(2)
+    with col1:
+        route_text = st.text_input("Route (optional)", placeholder="e.g., SFO-JFK", key=f"{key_prefix}_route",
+                                   help="Compare against award prices previously seen on this route")
+    with col2:
+        cabin = st.selectbox("Cabin", [ANY_CABIN_LABEL] + cabin_classes, key=f"{key_prefix}_route_cabin")
+    return route_text, None if cabin == ANY_CABIN_LABEL else cabin
+
+def route_cpm_percentile(cpm, route_text, cabin):
+    """``(route, share of recorded quotes at or below cpm, quote count)`` or None without a route"""
+    from price_history import parse_route
+    route = parse_route(route_text)
+    if route is None:
+        return None
+    sketches, history = get_cpm_sketches()
+    sketches.catch_up(history)  # Only reads quotes stored since the last rerun
+    rank, count = sketches.percentile_rank(cpm, route, cabin)
+    return route, rank, count
+
+ADVICE_QUANTILE = 0.5  # Redemptions above the route's median CPM earn the advice
+ADVICE_MIN_QUOTES = 20  # Fewer quotes than this fall back to the fixed ADVICE_CPM
+
+def route_advice_cpm(route_text, cabin):
+    """The route's median CPM once it has enough recorded quotes, else None (the fixed cutoff applies)"""
+    from price_history import parse_route
+    route = parse_route(route_text)
+    if route is None:
+        return None
+    sketches, history = get_cpm_sketches()
+    sketches.catch_up(history)
+    cpm, count = sketches.quantile(ADVICE_QUANTILE, route, cabin)
+    return cpm if count >= ADVICE_MIN_QUOTES else None
+
+def get_evaluation_history():
+    """This session's bounded ``EvaluationHistory``"""
+    if "evaluation_history" not in st.session_state:
+        st.session_state["evaluation_history"] = EvaluationHistory()
+    return st.session_state["evaluation_history"]
+
+def record_evaluation(evaluator, inputs, figures, valuation):
+    """Keep a successful evaluation's inputs and raw figures for comparison and export"""
+    if "error" in figures:
+        return
+    inputs = {**inputs, "valuation_low_cents": valuation.low * 100, "valuation_high_cents": valuation.high * 100}
+    get_evaluation_history().record(evaluator, inputs, figures)
+
+def render_evaluation_history(evaluator):
+    """Side-by-side view of this session's recent ``evaluator`` results, with export of the whole history"""
+    history = get_evaluation_history()
+    if not len(history):
+        return
+    with st.expander(f"🗂️ Compare Earlier Evaluations ({len(history)} this session)"):
+        table = history.compare(evaluator)
+        if table:
+            st.dataframe(table, hide_index=True)
         else:
-            verdict = "❌ Not Worth It."
-
-    return {
-        "Miles Worth (Low)": format_currency(miles_worth_low),
-        "Miles Worth (High)": format_currency(miles_worth_high),
-        "Cost Per Mile": f"{cost_per_mile:.3f} cents" if miles > 0 else "N/A",
-        "PQP Cost per Dollar": format_currency(pqp_cost_low) if pqp else None,
-        "Verdict": verdict,
-        "CPM": cost_per_mile * 100 if miles > 0 else 0
-    }
+            st.caption(f"No {evaluator} evaluations yet this session.")
+        columns = st.columns(len(EXPORT_FORMATS) + 1)
+        for column, (fmt, mime) in zip(columns, EXPORT_FORMATS.items()):
+            column.download_button(f"⬇️ {fmt.upper()}", data=lambda fmt=fmt: history.export(fmt),
+                                   file_name=f"united_evaluations.{fmt}", mime=mime, on_click="ignore",
+                                   key=f"{evaluator}_history_{fmt}")
+        columns[-1].button("Clear History", on_click=history.clear, key=f"{evaluator}_history_clear")
+
+def build_evaluation_graph():
+    """Every tab's derived values as a ``ReactiveGraph`` over the parsed widget values.
+
+    Inputs are named after the widgets they come from. The valuation is one
+    input shared by all tabs, so changing it recomputes each tab's figures once
+    (when the tab next asks for them), while editing a field recomputes only
+    the nodes that read it. Nodes whose verdicts come from the verdict rules
+    also read ``rules_digest``, so a hot reload of the rules file reaches them.
+    """
+    graph = ReactiveGraph()
+    graph.input(
+        "valuation", "rules_digest",
+        "purchase_miles", "purchase_cash", "purchase_mixed_miles", "purchase_mixed_cash", "purchase_advice_cpm",
+        "breakeven_miles", "breakeven_cash",
+        "upgrade_miles", "upgrade_mixed_cash", "upgrade_cash_only", "upgrade_full_fare", "upgrade_duration",
+        "upgrade_from", "upgrade_to", "upgrade_base_fare", "upgrade_base_fare_miles",
+        "upgrade_origin", "upgrade_destination",
+        "upgrade_waitlisted", "upgrade_status", "upgrade_fare_class", "upgrade_load", "upgrade_days_out",
+        "accelerator_miles", "accelerator_pqp", "accelerator_cost",
+        "purchase_price", "purchase_miles_offer", "purchase_miles_bonus_offer",
+    )
 
+    ticket_inputs = ["purchase_miles", "purchase_cash", "purchase_mixed_miles", "purchase_mixed_cash", "valuation"]
 
-def is_upgrade_not_worth_it(travel_hours, cash_upgrade, full_fare, miles, cash_cost, from_class, to_class, original_full_fare):
-    """ Determines if an upgrade is not worth it """
-    if travel_hours < UPGRADE_COMFORT_HOURS and from_class == "Economy" and to_class == "Premium Plus":
-        return "⚠️ Short flight – upgrade may not be worth it."
-    
-    if cash_upgrade > 0.8 * full_fare and original_full_fare > 0:
-        return "⚠️ Upgrade cost is too close to full fare price."
+    @graph.derive(ticket_inputs + ["purchase_advice_cpm"])
+    def ticket(miles_price, cash_price, mixed_miles, mixed_cash, valuation, advice_cpm):
+        return best_option_figures(miles_price, cash_price, mixed_miles, mixed_cash, valuation=valuation,
+                                   advice_cpm=advice_cpm)
 
-    if (miles > 0 and cash_cost > 0) and (cash_cost + (miles * 0.012) > full_fare) and full_fare > 0:
-        return "⚠️ Miles + Cash upgrade is costing more than a full-fare business class ticket."
+    @graph.derive(ticket_inputs + ["ticket"])
+    def ticket_result(miles_price, cash_price, mixed_miles, mixed_cash, valuation, figures):
+        return evaluate_best_option(miles_price, cash_price, mixed_miles, mixed_cash, valuation=valuation, figures=figures)
 
-    if from_class == "Premium Plus" and to_class == "Business (Polaris)" and travel_hours < 5:
-        return "⚠️ Small difference in comfort for this flight length – not worth upgrading."
+    @graph.derive(["breakeven_miles", "valuation"])
+    def breakeven_from_miles(miles, valuation):
+        return calculate_max_purchase_value(miles_input=miles, valuation=valuation)
 
-    return None  # Upgrade is reasonable
+    @graph.derive(["breakeven_cash", "valuation"])
+    def breakeven_from_cash(cash, valuation):
+        return calculate_max_purchase_value(cash_input=cash, valuation=valuation)
 
-def evaluate_relative_upgrade_cost(base_fare, upgrade_cost):
-    if base_fare == 0:
-        return None
-    if upgrade_cost < 0.5 * base_fare:
-        return "✅ Upgrade is reasonably priced relative to your original fare."
-    elif upgrade_cost < 0.8 * base_fare:
-        return "🟡 Upgrade is borderline—consider only for longer flights or big comfort boost."
-    else:
-        return "❌ Upgrade is expensive compared to your base fare."
-
-# Function to evaluate upgrade options & detect bad deals
-def evaluate_upgrade(miles, cash_cost, full_cash_upgrade, full_fare_cost, travel_hours, from_class, to_class):
-    # Validate inputs
-    valid, error_message = validate_inputs(miles, cash_cost)
-    if not valid:
-        return {"Error": error_message}
-    
-    # Skip calculation if no upgrade is selected
-    if from_class == to_class:
-        return {
-            "Warning": "⚠️ You've selected the same cabin class for both options. No upgrade needed.",
-            "Verdict": "ℹ️ No upgrade selected"
-        }
-    
-    # Calculate comfort factor (longer flights increase perceived value)
-    comfort_factor = 1 + (0.05 * travel_hours)
-    
-    # Get upgrade multiplier based on cabin classes
-    upgrade_multiplier = upgrade_multipliers.get((from_class, to_class), 1.0)
-
-    # Handle missing inputs by making best estimates
-    original_full_fare_cost = full_fare_cost
-    if full_fare_cost == 0:
-        full_fare_cost = max(full_cash_upgrade * 1.5, 1000)  # Estimate based on upgrade cost
-
-    if miles == 0 and cash_cost == 0:
-        miles, cash_cost = 0, full_cash_upgrade  # Assume only cash upgrade available
-
-    # Value of miles in cash terms
-# Calculate miles value
-    miles_worth_low, miles_worth_high = calculate_miles_value(miles)
-    total_miles_cash_upgrade_low = cash_cost + miles_worth_low
-    total_miles_cash_upgrade_high = cash_cost + miles_worth_high
-
-    # Full Cash Upgrade (No Miles)
-    total_cash_upgrade = full_cash_upgrade
-
-    # Apply comfort factor to savings
-    savings_low, savings_high = ((full_fare_cost - total_miles_cash_upgrade_high) * comfort_factor * upgrade_multiplier, 
-                                 (full_fare_cost - total_miles_cash_upgrade_low) * comfort_factor * upgrade_multiplier)
-    if total_cash_upgrade == 0:
-        total_cash_upgrade = full_fare_cost
-    savings_cash_upgrade = (full_fare_cost - total_cash_upgrade) * comfort_factor * upgrade_multiplier
-
-    # Best Upgrade Method Decision
-    if savings_high > savings_cash_upgrade and savings_high > 0:
-        best_option = "Miles + Cash"
-    elif savings_cash_upgrade > 0:
-        best_option = "Cash Upgrade"
-    else:
-        best_option = "Buy Full Fare Ticket"
-
-    verdict = f"✅ **Best Option:** {best_option}"
-
-    # ❌ Detect When the Upgrade is "Not Worth It"
-    warning_message = is_upgrade_not_worth_it(travel_hours,total_cash_upgrade,full_fare_cost, miles, cash_cost, from_class, to_class, original_full_fare_cost)
-
-    return {
-        "Miles Worth (Low)": f"${miles_worth_low:.2f}",
-        "Miles Worth (High)": f"${miles_worth_high:.2f}",
-        "Total Upgrade Cost (Miles + Cash)": f"${total_miles_cash_upgrade_low:.2f} - ${total_miles_cash_upgrade_high:.2f}" if miles > 0 else "N/A",
-        "Total Upgrade Cost (Cash-Only)": f"${total_cash_upgrade:.2f}",
-        "Full-Fare Business/First Class Price": f"${full_fare_cost:.2f}",
-        "Savings (Miles + Cash Upgrade)": f"${savings_low:.2f} - ${savings_high:.2f}" if miles > 0 else "N/A",
-        "Savings (Cash-Only Upgrade)": f"${savings_cash_upgrade:.2f}",
-        "Best Option": best_option,
-        "Verdict": verdict,
-        "Warning": warning_message,
-        "Comfort Factor": comfort_factor
-    }
+    @graph.derive(["upgrade_waitlisted", "upgrade_status", "upgrade_fare_class", "upgrade_load", "upgrade_days_out"])
+    def upgrade_clearance(waitlisted, status, fare_class, load_percent, days_out):
+        if not waitlisted:
+            return None
+        from upgrade_clearance import estimate_clearance
+        return estimate_clearance(status, fare_class, load_percent, days_out)
 
-# Function to evaluate Ticket Purchase (Miles vs. Cash vs. Miles + Cash)
-def evaluate_best_option(miles_price, cash_price, miles_plus_cash_miles, miles_plus_cash_cash):
-    # Calculate miles values
-    miles_cash_value_low, miles_cash_value_high = calculate_miles_value(miles_price)
-    mixed_miles_value_low, mixed_miles_value_high = calculate_miles_value(miles_plus_cash_miles)
-    
-    # Calculate total costs for different options
-    total_cost_miles_low = miles_cash_value_low
-    total_cost_miles_high = miles_cash_value_high
+    @graph.derive(["upgrade_clearance"])
+    def upgrade_clearance_probability(clearance):
+        if not clearance or "Error" in clearance:
+            return 1.0
+        return clearance["Clearance Chance"]
 
-    valid_mixed = miles_plus_cash_miles > 0 and miles_plus_cash_cash > 0
-    total_cost_mixed_low = (
-        mixed_miles_value_low + miles_plus_cash_cash if valid_mixed else float('inf')
-    )
-    total_cost_mixed_high = (
-        mixed_miles_value_high + miles_plus_cash_cash if valid_mixed else float('inf')
-    )
+    upgrade_inputs = ["upgrade_miles", "upgrade_mixed_cash", "upgrade_cash_only", "upgrade_full_fare",
+                      "upgrade_duration", "upgrade_from", "upgrade_to", "valuation", "upgrade_clearance_probability"]
 
-    # Create dictionary of options for easier comparison
-    options = {
-        "Cash": cash_price,
-        "Miles": total_cost_miles_low,  # Use low estimate for conservative comparison
-        "Miles + Cash": total_cost_mixed_low,
-    }
-    
-    # Find option with lowest cost
-    best_option = min(options.items(), key=lambda x: x[1] if x[1] > 0 else float('inf'))[0]
-    
-    # Determine CPM (cents per mile) for award redemptions
-    cpm_miles = (cash_price / miles_price) * 100 if miles_price > 0 else 0
-    cpm_miles_plus_cash = ((cash_price - miles_plus_cash_cash) / miles_plus_cash_miles) * 100 if miles_plus_cash_miles > 0 else 0
-    
-    verdict = f"✅ Best Option: **{best_option}**"
-    
-    # Add advice based on CPM
-    advice = None
-    if best_option == "Miles" and cpm_miles > 1.5:
-        advice = "🎯 Great redemption value! Above average cents-per-mile."
-    elif best_option == "Miles + Cash" and cpm_miles_plus_cash > 1.5:
-        advice = "🎯 Good value for your miles in the Miles + Cash option!"
-
-    return {
-        "Miles Cash Value (Low)": format_currency(miles_cash_value_low),
-        "Miles Cash Value (High)": format_currency(miles_cash_value_high),
-        "Total Cost (Miles)": f"{format_currency(total_cost_miles_low)} - {format_currency(total_cost_miles_high)}",
-        "Total Cost (Miles + Cash)": (
-            f"{format_currency(total_cost_mixed_low)} - {format_currency(total_cost_mixed_high)}"
-            if valid_mixed
-            else "N/A"
-        ),
-        "Total Cost (Cash)": format_currency(cash_price),
-        "CPM (Miles Option)": f"{cpm_miles:.2f} cents" if miles_price > 0 else "N/A",
-        "CPM (Miles + Cash)": f"{cpm_miles_plus_cash:.2f} cents" if miles_plus_cash_miles > 0 else "N/A",
-        "Best Option": best_option,
-        "Verdict": verdict,
-        "Advice": advice,
-        "CPM_Miles": cpm_miles,
-        "CPM_Mixed": cpm_miles_plus_cash
-    }
+    @graph.derive(upgrade_inputs + ["rules_digest"])
+    def upgrade(miles, cash_cost, full_cash_upgrade, full_fare_cost, travel_hours, from_class, to_class, valuation, clearance_probability, rules_digest):
+        return upgrade_figures(miles, cash_cost, full_cash_upgrade, full_fare_cost, travel_hours, from_class, to_class,
+                               verdict_table=get_upgrade_verdict_table(rules_digest), valuation=valuation,
+                               clearance_probability=clearance_probability)
 
-# Function to evaluate Ticket Purchase (Miles vs. Cash vs. Miles + Cash)
-def evaluate_miles_purchase(miles_price, cash_price):
-    # Calculate miles values
-    miles_cash_value_low, miles_cash_value_high = calculate_miles_value(miles_price)
-    
-    # Calculate total costs for different options
-    total_cost_miles_low = miles_cash_value_low
-    total_cost_miles_high = miles_cash_value_high
-        
-    # Determine CPM (cents per mile) for award redemptions
-    cpm_miles = (cash_price / miles_price) * 100 if miles_price > 0 else 0
-        
-    #verdict = f"✅ Best Option: **{best_option}**"
-    
-    # Add advice based on CPM
-    advice = None
-    if cpm_miles < 1.2:
-        advice = "🎯 Great redemption value! Above average cents-per-mile."
-    
-    return {
-        "Miles Cash Value (Low)": format_currency(miles_cash_value_low),
-        "Miles Cash Value (High)": format_currency(miles_cash_value_high),
-        "Total Cost (Miles)": f"{format_currency(total_cost_miles_low)} - {format_currency(total_cost_miles_high)}",
-        "Total Cost (Cash)": format_currency(cash_price),
-        "CPM (Miles Option)": f"{cpm_miles:.2f} cents" if miles_price > 0 else "N/A",
-     #   "Verdict": verdict,
-        "Advice": advice,
-        "CPM_Miles": cpm_miles,
+    @graph.derive(upgrade_inputs + ["upgrade"])
+    def upgrade_result(miles, cash_cost, full_cash_upgrade, full_fare_cost, travel_hours, from_class, to_class, valuation, clearance_probability, figures):
+        return evaluate_upgrade(miles, cash_cost, full_cash_upgrade, full_fare_cost, travel_hours, from_class, to_class,
+                                valuation=valuation, figures=figures, clearance_probability=clearance_probability)
 
-    }
+    @graph.derive(["upgrade_base_fare", "upgrade_base_fare_miles", "valuation"])
+    def upgrade_total_base_fare(base_fare, base_fare_miles, valuation):
+        if base_fare_miles > 0:
+            return base_fare + calculate_miles_value(base_fare_miles, valuation=valuation)[1]
+        return base_fare
 
-# Function to calculate maximum purchase values
-def calculate_max_purchase_value(miles_input=None, cash_input=None):
-    """
-    Calculate the maximum value a user should be willing to pay.
-    If miles are provided, calculate max cash price.
-    If cash is provided, calculate max miles.
-    """
-    if miles_input is not None and miles_input > 0:
-        # User entered miles, calculate max cash price
-        miles_worth_low, miles_worth_high = calculate_miles_value(miles_input)
-        max_cash_price = miles_worth_high  # Use high valuation for conservative max price
-        
-        # Calculate CPM
-        cpm = (max_cash_price / miles_input) * 100 if miles_input > 0 else 0
-        
-        return {
-            "type": "miles_to_cash",
-            "input_miles": miles_input,
-            "max_cash_price": max_cash_price,
-            "cpm": cpm,
-            "valuation_range": f"{format_currency(miles_worth_low)} - {format_currency(miles_worth_high)}"
-        }
-    
-    elif cash_input is not None and cash_input > 0:
-        # User entered cash, calculate max miles
-        max_miles_low = int(cash_input / CURRENT_MILE_VALUE_HIGH)  # Conservative estimate
-        max_miles_high = int(cash_input / CURRENT_MILE_VALUE_LOW)  # Optimistic estimate
-        
-        # Calculate CPM for the conservative estimate
-        cpm = (cash_input / max_miles_low) * 100 if max_miles_low > 0 else 0
-        
-        return {
-            "type": "cash_to_miles",
-            "input_cash": cash_input,
-            "max_miles_low": max_miles_low,
-            "max_miles_high": max_miles_high,
-            "cpm": cpm,
-            "recommended_miles": max_miles_low  # Use conservative estimate
-        }
-    
-    else:
-        return {"error": "Please provide either miles or cash amount"}
+    @graph.derive(["upgrade_total_base_fare", "upgrade_cash_only", "rules_digest"])
+    def upgrade_relative_cost(base_fare, full_cash_upgrade, rules_digest):
+        return evaluate_relative_upgrade_cost(base_fare, full_cash_upgrade)
 
-# Initialize session state if not exists
-if 'show_help' not in st.session_state:
-    st.session_state.show_help = False
+    @graph.derive(["upgrade_origin", "upgrade_destination"])
+    def upgrade_route(origin, destination):
+        return estimate_upgrade_route(origin, destination)
 
-# Streamlit UI with Tabs
-col1, col2, col3 = st.columns([1, 2, 1])
-with col2:
-    st.image(UA_LOGO_URL, width=200)  # Reduced logo size
-st.title("United Airlines Deal Evaluator ✈️")
-st.caption("Analyze **Award Accelerators, Upgrade Offers, Ticket Purchases, and Buy Miles Offer** to find the best value.")
+    accelerator_inputs = ["accelerator_miles", "accelerator_pqp", "accelerator_cost", "valuation"]
 
-# Default mile values for calculations (will be overridden by settings tab)
-CURRENT_MILE_VALUE_LOW = MILE_VALUE_LOW
-CURRENT_MILE_VALUE_HIGH = MILE_VALUE_HIGH
+    @graph.derive(accelerator_inputs + ["rules_digest"])
+    def accelerator(miles, pqp, cost, valuation, rules_digest):
+        return accelerator_figures(miles, pqp, cost, valuation=valuation)
 
-# Sidebar Settings
-with st.sidebar:
-    st.markdown("### ⚙️ **Settings**")
-    
-    # Mile valuation settings
-    st.markdown("**Mile Valuations**")
-    custom_low = st.number_input(
-        "Low Value (¢/mile)", 
-        min_value=0.5, 
-        max_value=5.0, 
-        value=CURRENT_MILE_VALUE_LOW * 100, 
-        step=0.1,
-        help="Conservative mile valuation"
-    )
-    
-    custom_high = st.number_input(
-        "High Value (¢/mile)", 
-        min_value=0.5, 
-        max_value=5.0, 
-        value=CURRENT_MILE_VALUE_HIGH * 100, 
-        step=0.1,
-        help="Optimistic mile valuation"
-    )
-    
-    # Validation
-    if custom_high < custom_low:
-        st.error("High value must be greater than low value")
-        custom_high = custom_low + 0.1
-    
-    # Update the current values
-    CURRENT_MILE_VALUE_LOW = custom_low / 100
-    CURRENT_MILE_VALUE_HIGH = custom_high / 100
-    
-    st.markdown(f"**Current:** {custom_low:.1f}¢ - {custom_high:.1f}¢ per mile")
-    
-    st.markdown("---")
-    
-    # Help toggle
-    show_help = st.checkbox("Show Help", st.session_state.show_help)
-    st.session_state.show_help = show_help
+    @graph.derive(accelerator_inputs + ["rules_digest", "accelerator"])
+    def accelerator_result(miles, pqp, cost, valuation, rules_digest, figures):
+        return evaluate_accelerator(miles, pqp, cost, valuation=valuation, figures=figures)
 
-# Current settings info
-st.info(f"**Current Mile Valuations:** {CURRENT_MILE_VALUE_LOW*100:.1f}¢ - {CURRENT_MILE_VALUE_HIGH*100:.1f}¢ per mile | **Default:** 1.2¢ - 1.5¢ per mile (adjust in sidebar ⚙️)")
+    @graph.derive(["purchase_miles_offer", "purchase_miles_bonus_offer"])
+    def buy_miles_total(miles, bonus_miles):
+        return miles + bonus_miles
 
-# Create tabs
-tab1, tab2, tab3, tab4, tab5 = st.tabs(["🎟️ Ticket Purchase", "💰 Break-Even Calculator", "💺 Upgrade Offer", "🏆 Award Accelerator", "💵 Buy Miles"])
+    @graph.derive(["buy_miles_total", "purchase_price", "valuation"])
+    def buy_miles(total_miles, cash_price, valuation):
+        return miles_purchase_figures(total_miles, cash_price, valuation=valuation)
 
-with tab1:
+    @graph.derive(["buy_miles_total", "purchase_price", "valuation", "buy_miles"])
+    def buy_miles_result(total_miles, cash_price, valuation, figures):
+        return evaluate_miles_purchase(total_miles, cash_price, valuation=valuation, figures=figures)
+
+    return graph
+
+def get_evaluation_graph():
+    """This session's ``ReactiveGraph`` of derived values, with the verdict rules currently in effect.
+
+    Tabs rerun as fragments without the rest of the script, so the rules
+    digest is refreshed here rather than once per full run.
+    """
+    if "evaluation_graph" not in st.session_state:
+        st.session_state["evaluation_graph"] = build_evaluation_graph()
+    graph = st.session_state["evaluation_graph"]
+    graph.update(rules_digest=get_rules().digest)
+    return graph
+
+# Widgets on hidden tabs are not rendered, which would normally drop their
+# values; keep them in plain session state so inputs survive tab switches
+TAB_WIDGET_KEYS = (
+    "purchase_miles", "purchase_mixed_miles", "purchase_cash", "purchase_mixed_cash", "wallet_balance",
+    "valuation_method", "breakeven_miles", "breakeven_cash",
+    "upgrade_from", "upgrade_to", "upgrade_miles", "upgrade_cash_only", "upgrade_mixed_cash",
+    "upgrade_full_fare", "upgrade_base_fare", "upgrade_base_fare_miles", "upgrade_duration",
+    "upgrade_origin", "upgrade_destination",
+    "upgrade_waitlisted", "upgrade_status", "upgrade_fare_class", "upgrade_load", "upgrade_days_out",
+    "accelerator_miles", "accelerator_pqp", "accelerator_cost",
+    "purchase_price", "purchase_miles_offer", "purchase_miles_bonus_offer",
+    "purchase_route", "purchase_route_cabin", "breakeven_route", "breakeven_route_cabin",
+    "bulk_offer", "bulk_page",
+    "buy_miles_needed", "buy_miles_block_price", "buy_miles_min", "buy_miles_max",
+    "status_pqp", "status_pqf",
+)
+TAB_WIDGET_DEFAULTS = {
+    "valuation_method": "I have cash price - tell me max miles",
+    "breakeven_cash": "500",
+    "upgrade_to": cabin_classes[2],
+    "upgrade_duration": 5,
+    "upgrade_origin": "",
+    "upgrade_destination": "",
+    "upgrade_waitlisted": False,
+    "upgrade_status": "General Member",
+    "upgrade_fare_class": "V",
+    "upgrade_load": 80,
+    "upgrade_days_out": 14,
+    "buy_miles_min": "2K",
+    "buy_miles_max": "150K",
+}
+
+# Initialize session state if not exists
+if 'show_help' not in st.session_state:
+    st.session_state.show_help = False
+for key, default in TAB_WIDGET_DEFAULTS.items():
+    st.session_state.setdefault(key, default)
+for key in TAB_WIDGET_KEYS:
+    if key in st.session_state:
+        st.session_state[key] = st.session_state[key]
+
+# Each tab is a fragment: a widget change inside a tab reruns only that tab
+@st.fragment
+def render_ticket_purchase_tab(valuation, show_help):
     st.subheader("Compare Ticket Purchase Options")
     
     if show_help:
@@ -445,6 +318,12 @@ with tab1:
         miles_plus_cash_cash_text = st.text_input("Cash or Fees for Miles + Cash ($)", placeholder="e.g., 300, 0.5K", key="purchase_mixed_cash")
         miles_plus_cash_cash = parse_user_input(miles_plus_cash_cash_text)
 
+    route_text, route_cabin = route_cpm_inputs("purchase")
+    graph = get_evaluation_graph()
+    graph.update(purchase_miles=miles_price, purchase_cash=cash_price,
+                 purchase_mixed_miles=miles_plus_cash_miles, purchase_mixed_cash=miles_plus_cash_cash,
+                 purchase_advice_cpm=route_advice_cpm(route_text, route_cabin))
+
     if st.button("Evaluate Best Purchase Option"):
         # Check if we have enough data to make a comparison
         if miles_price == 0 and miles_plus_cash_miles == 0:
@@ -452,7 +331,13 @@ with tab1:
         elif cash_price == 0:
             st.warning("Please enter the full cash ticket price for comparison.")
         else:
-            result = evaluate_best_option(miles_price, cash_price, miles_plus_cash_miles, miles_plus_cash_cash)
+            figures, result = graph.get("ticket"), graph.get("ticket_result")
+            record_evaluation("Ticket Purchase", {
+                "miles_price": miles_price,
+                "cash_price": cash_price,
+                "miles_plus_cash_miles": miles_plus_cash_miles,
+                "miles_plus_cash_cash": miles_plus_cash_cash,
+            }, figures, valuation)
             
             # Stylized Output Section
             st.markdown("### 🎟️ **Ticket Purchase Analysis**")
@@ -486,6 +371,17 @@ with tab1:
             if miles_plus_cash_miles > 0 and miles_plus_cash_cash > 0:
                 cpm_mixed = result["CPM_Mixed"]
                 st.markdown(f"**CPM (Miles + Cash):** {cpm_mixed:.2f} cents per mile")
+
+            # Where this redemption falls among quotes seen on the route
+            if miles_price > 0:
+                ranked = route_cpm_percentile(result["CPM_Miles"], route_text, route_cabin)
+                if ranked:
+                    route, rank, count = ranked
+                    if count:
+                        st.info(f"📈 **{result['CPM_Miles']:.2f}¢ per mile beats {rank:.0%} of the {count:,} "
+                                f"{route_cabin or 'award'} quotes seen on {route}.**")
+                    else:
+                        st.caption(f"No award quotes recorded for {route} yet.")
             
             # Additional insights section
             st.markdown("##### 💡 **Redemption Value Insights**")
@@ -513,7 +409,62 @@ with tab1:
                 elif cpm_mixed < 1.0:
                     st.warning(f"Below average value with Miles + Cash option: {cpm_mixed:.2f} cents per mile")
 
-with tab2:
+    # Plan several trips against one miles balance
+    with st.expander("🧳 Plan Multiple Trips With One Miles Balance"):
+        if show_help:
+            st.info("""
+            Enter every trip you are planning and your current miles balance.
+            The optimizer decides which trips to book with miles, cash or Miles + Cash
+            so that your balance gives you the largest total savings.
+            """)
+
+        wallet_balance = parse_user_input(st.text_input("Miles Balance", placeholder="e.g., 120K, 250000", key="wallet_balance"))
+        wallet_trips = st.data_editor(
+            [{"Trip": "", "Cash Price": "", "Miles Price": "", "Miles + Cash (Miles)": "", "Miles + Cash (Cash)": ""}],
+            num_rows="dynamic",
+            key="wallet_trips",
+        )
+
+        if st.button("Optimize Miles Balance"):
+            from wallet_optimizer import optimize_trip_wallet
+
+            trips = [
+                {
+                    "name": row["Trip"] or f"Trip {i + 1}",
+                    "cash_price": parse_user_input(row["Cash Price"]),
+                    "miles_price": parse_user_input(row["Miles Price"]),
+                    "miles_plus_cash_miles": parse_user_input(row["Miles + Cash (Miles)"]),
+                    "miles_plus_cash_cash": parse_user_input(row["Miles + Cash (Cash)"]),
+                }
+                for i, row in enumerate(wallet_trips)
+            ]
+            trips = [trip for trip in trips if trip["cash_price"] > 0]
+
+            if not trips:
+                st.warning("Please enter the cash price for at least one trip.")
+            else:
+                plan = optimize_trip_wallet(trips, wallet_balance, valuation=valuation)
+                st.markdown("##### 🧳 **Recommended Bookings**")
+                st.dataframe(plan["Bookings"], hide_index=True)
+                st.success(f"Total savings vs. paying cash: {format_currency(plan['Total Savings'])}")
+                st.markdown(f"**Miles Used:** {plan['Miles Used']:,.0f} | **Miles Left:** {plan['Miles Left']:,.0f}")
+
+    render_evaluation_history("Ticket Purchase")
+
+def render_break_even_history(cpm, route_text, route_cabin):
+    """How often quotes on the route beat the break-even CPM"""
+    ranked = route_cpm_percentile(cpm, route_text, route_cabin)
+    if not ranked:
+        return
+    route, rank, count = ranked
+    if count:
+        st.info(f"📈 **{1 - rank:.0%} of the {count:,} {route_cabin or 'award'} quotes seen on {route} "
+                f"redeemed above your {cpm:.2f}¢ break-even.**")
+    else:
+        st.caption(f"No award quotes recorded for {route} yet.")
+
+@st.fragment
+def render_break_even_tab(valuation, show_help):
     st.subheader("💰 Break-Even Calculator")
     
     if show_help:
@@ -526,7 +477,7 @@ with tab2:
         **If you enter cash price:**
         - The app calculates the maximum number of miles you should spend before it becomes a bad deal
         
-        **Uses your custom mile valuations:** {CURRENT_MILE_VALUE_LOW*100:.1f}¢ - {CURRENT_MILE_VALUE_HIGH*100:.1f}¢ per mile
+        **Uses your custom mile valuations:** {valuation.low*100:.1f}¢ - {valuation.high*100:.1f}¢ per mile
         
         This helps you make informed decisions about whether a ticket price is reasonable.
         """)
@@ -535,8 +486,7 @@ with tab2:
     input_method = st.radio(
         "What would you like to evaluate?",
         ["I have miles required - tell me max cash price", "I have cash price - tell me max miles"],
-        index=1,  # Default to "I have cash price"
-        key="valuation_method"
+        key="valuation_method"  # Defaults to "I have cash price" via TAB_WIDGET_DEFAULTS
     )
     
     if input_method == "I have miles required - tell me max cash price":
@@ -545,13 +495,17 @@ with tab2:
         miles_input_text = st.text_input(
             "Miles Required for the Ticket",
             placeholder="e.g., 13.6K, 50000, 1.2M",
-            help="Enter miles (e.g., 13.6K for 13,600 miles, 50K for 50,000 miles)"
+            help="Enter miles (e.g., 13.6K for 13,600 miles, 50K for 50,000 miles)",
+            key="breakeven_miles"
         )
         miles_input = parse_user_input(miles_input_text)
+        get_evaluation_graph().set("breakeven_miles", miles_input)
+        route_text, route_cabin = route_cpm_inputs("breakeven")
         
         if st.button("Calculate Maximum Cash Price"):
             if miles_input > 0:
-                result = calculate_max_purchase_value(miles_input=miles_input)
+                result = get_evaluation_graph().get("breakeven_from_miles")
+                record_evaluation("Break-Even", {"miles": miles_input}, result, valuation)
                 
                 if "error" not in result:
                     st.markdown("### 💰 **Maximum Purchase Value**")
@@ -591,6 +545,8 @@ with tab2:
                     
                     if cpm > 1.5:
                         st.warning("**Consideration:** For high-value redemptions (international business class, premium routes), you might be willing to accept slightly higher CPM values.")
+
+                    render_break_even_history(cpm, route_text, route_cabin)
                 else:
                     st.error(result["error"])
             else:
@@ -601,15 +557,18 @@ with tab2:
         
         cash_input_text = st.text_input(
             "Cash Price of the Ticket ($)",
-            value="500",
             placeholder="e.g., 1.2K, 500, 2.5K",
-            help="Enter cash price (e.g., 1.2K for $1,200, 500 for $500)"
+            help="Enter cash price (e.g., 1.2K for $1,200, 500 for $500)",
+            key="breakeven_cash"
         )
         cash_input = parse_user_input(cash_input_text)
+        get_evaluation_graph().set("breakeven_cash", cash_input)
+        route_text, route_cabin = route_cpm_inputs("breakeven")
         
         if st.button("Calculate Maximum Miles"):
             if cash_input > 0:
-                result = calculate_max_purchase_value(cash_input=cash_input)
+                result = get_evaluation_graph().get("breakeven_from_cash")
+                record_evaluation("Break-Even", {"cash": cash_input}, result, valuation)
                 
                 if "error" not in result:
                     st.markdown("### 💰 **Maximum Miles Value**")
@@ -653,12 +612,35 @@ with tab2:
                     
                     if cpm > 1.5:
                         st.warning("**Consideration:** For high-value redemptions (international business class, premium routes), you might be willing to accept slightly higher CPM values.")
+
+                    render_break_even_history(cpm, route_text, route_cabin)
                 else:
                     st.error(result["error"])
             else:
                 st.warning("Please enter a valid cash price.")
 
-with tab3:
+    render_evaluation_history("Break-Even")
+
+def estimate_upgrade_route(origin, destination):
+    """Great-circle distance and block-time estimate for two airport codes, or None"""
+    if not (origin and destination):
+        return None
+    from airports import estimate_block_hours, get_airport_index  # numpy only once a route is entered
+    distance = float(get_airport_index().distance_miles(origin, destination))
+    if distance != distance:  # NaN: unknown airport
+        return None
+    return {"Distance": distance, "Hours": float(estimate_block_hours(distance))}
+
+def fill_upgrade_duration():
+    """Move the duration slider to the estimated block time when the route changes"""
+    graph = get_evaluation_graph()
+    graph.update(upgrade_origin=st.session_state["upgrade_origin"], upgrade_destination=st.session_state["upgrade_destination"])
+    estimate = graph.get("upgrade_route")
+    if estimate:
+        st.session_state["upgrade_duration"] = min(max(round(estimate["Hours"]), 1), 20)
+
+@st.fragment
+def render_upgrade_tab(valuation, show_help):
     st.subheader("💺 Evaluate Your Upgrade Offer")
     
     if show_help:
@@ -683,27 +665,80 @@ with tab3:
         full_cash_upgrade = parse_user_input(full_cash_upgrade_text)
 
     with col2:
-        to_class = st.selectbox("Upgrade To", cabin_classes, index=2, key="upgrade_to")
-        cash_cost_text = st.text_input("Cash Cost for Miles + Cash Upgrade ($, leave 0 if unknown)", placeholder="e.g., 200, 0.5K")
+        to_class = st.selectbox("Upgrade To", cabin_classes, key="upgrade_to")
+        cash_cost_text = st.text_input("Cash Cost for Miles + Cash Upgrade ($, leave 0 if unknown)", placeholder="e.g., 200, 0.5K", key="upgrade_mixed_cash")
         cash_cost = parse_user_input(cash_cost_text)
         
-        full_fare_cost_text = st.text_input("Full-Fare Business/First Class Cost ($, leave 0 if unknown)", placeholder="e.g., 2K, 2000")
+        full_fare_cost_text = st.text_input("Full-Fare Business/First Class Cost ($, leave 0 if unknown)", placeholder="e.g., 2K, 2000", key="upgrade_full_fare")
         full_fare_cost = parse_user_input(full_fare_cost_text)
     
-    base_fare_text = st.text_input("Base Fare You Paid for Economy/Premium ($, leave 0 if unknown)", placeholder="e.g., 800, 1.2K")
+    base_fare_text = st.text_input("Base Fare You Paid for Economy/Premium ($, leave 0 if unknown)", placeholder="e.g., 800, 1.2K", key="upgrade_base_fare")
     base_fare = parse_user_input(base_fare_text)
     
-    base_fare_miles_text = st.text_input("Base Miles You Paid for Economy/Premium (leave 0 if unknown)", placeholder="e.g., 25K, 0")
+    base_fare_miles_text = st.text_input("Base Miles You Paid for Economy/Premium (leave 0 if unknown)", placeholder="e.g., 25K, 0", key="upgrade_base_fare_miles")
     base_fare_miles = parse_user_input(base_fare_miles_text)
 
-    if base_fare_miles > 0:
-        base_fare_miles_value_low, base_fare_miles_value_high = calculate_miles_value(base_fare_miles)
-        base_fare = base_fare + base_fare_miles_value_high
+    # Optional route: estimates the flight duration instead of guessing it
+    col1, col2 = st.columns(2)
+    with col1:
+        st.text_input("From Airport (optional)", placeholder="e.g., SFO", key="upgrade_origin", on_change=fill_upgrade_duration)
+    with col2:
+        st.text_input("To Airport (optional)", placeholder="e.g., EWR", key="upgrade_destination", on_change=fill_upgrade_duration)
+    graph = get_evaluation_graph()
+    graph.update(upgrade_origin=st.session_state["upgrade_origin"], upgrade_destination=st.session_state["upgrade_destination"])
+    route_estimate = graph.get("upgrade_route")
+    if route_estimate:
+        st.caption(f"✈️ {route_estimate['Distance']:,.0f} miles, about {route_estimate['Hours']:.1f} hours gate to gate")
+
+    travel_hours = st.slider("Flight Duration (in hours)", min_value=1, max_value=20, key="upgrade_duration")
+
+    # A waitlisted Miles + Cash upgrade is only worth its cost times the chance it clears
+    waitlisted = st.checkbox("Miles + Cash upgrade is waitlisted (not confirmed)", key="upgrade_waitlisted")
+    if waitlisted:
+        if show_help:
+            st.info("""
+            Upgrade awards are only charged if they clear. The chance of clearing is estimated from how
+            full the higher cabin is, how many days are left to sell it and your place on the upgrade
+            list (status first, then fare class), and the Miles + Cash option is compared by its
+            expected cost against a confirmed cash upgrade.
+            """)
+        from upgrade_clearance import FARE_CLASS_RANK, STATUS_LIST_SHARE
+        col1, col2 = st.columns(2)
+        with col1:
+            st.selectbox("Your Status", list(STATUS_LIST_SHARE), key="upgrade_status")
+            st.slider("Higher Cabin Sold Today (%)", min_value=0, max_value=100, key="upgrade_load")
+        with col2:
+            st.selectbox("Fare Class", list(FARE_CLASS_RANK), key="upgrade_fare_class")
+            st.number_input("Days to Departure", min_value=0, max_value=330, key="upgrade_days_out")
+    graph.update(upgrade_waitlisted=waitlisted, upgrade_status=st.session_state["upgrade_status"],
+                 upgrade_fare_class=st.session_state["upgrade_fare_class"],
+                 upgrade_load=st.session_state["upgrade_load"], upgrade_days_out=st.session_state["upgrade_days_out"])
+    clearance = graph.get("upgrade_clearance")
+    if clearance:
+        if "Error" in clearance:
+            st.warning(clearance["Error"])
+        else:
+            st.caption(f"🎟️ About {clearance['Clearance Chance']:.0%} chance to clear: "
+                       f"{clearance['Seats Expected Open']:.1f} seats expected to open, "
+                       f"{clearance['Ahead of You']:.1f} passengers expected ahead of you")
+            st.line_chart(clearance["Curve"], x="Days Out", y="Clearance Chance")
 
-    travel_hours = st.slider("Flight Duration (in hours)", min_value=1, max_value=20, value=5, key="upgrade_duration")    
+    graph.update(upgrade_miles=miles, upgrade_mixed_cash=cash_cost, upgrade_cash_only=full_cash_upgrade,
+                 upgrade_full_fare=full_fare_cost, upgrade_duration=travel_hours, upgrade_from=from_class,
+                 upgrade_to=to_class, upgrade_base_fare=base_fare, upgrade_base_fare_miles=base_fare_miles)
 
     if st.button("Evaluate Upgrade Offer"):
-        result = evaluate_upgrade(miles, cash_cost, full_cash_upgrade, full_fare_cost, travel_hours, from_class, to_class)
+        figures, result = graph.get("upgrade"), graph.get("upgrade_result")
+        if figures.get("best_option") is not None:  # Not an error or the same cabin twice
+            record_evaluation("Upgrade Offer", {
+                "miles": miles,
+                "cash_cost": cash_cost,
+                "full_cash_upgrade": full_cash_upgrade,
+                "full_fare_cost": full_fare_cost,
+                "travel_hours": travel_hours,
+                "from_class": from_class,
+                "to_class": to_class,
+            }, figures, valuation)
         
         # Check for errors
         if "Error" in result:
@@ -729,13 +764,16 @@ with tab3:
                 st.markdown("##### 💰 **Cost Breakdown**")
                 st.markdown(f"**Miles Worth:** {result['Miles Worth (Low)']} - {result['Miles Worth (High)']}", unsafe_allow_html=True)
                 st.markdown(f"**Miles + Cash Upgrade Cost:** {result['Total Upgrade Cost (Miles + Cash)']}", unsafe_allow_html=True)
+                if "Clearance Chance" in result:
+                    st.markdown(f"**Expected Miles + Cash Cost ({result['Clearance Chance']} chance to clear):** "
+                                f"{result['Expected Upgrade Cost (Miles + Cash)']}", unsafe_allow_html=True)
                 if full_cash_upgrade != 0:
                     st.markdown(f"**Cash-Only Upgrade Cost:** {result['Total Upgrade Cost (Cash-Only)']}", unsafe_allow_html=True)
                 if full_fare_cost != 0:
                     st.markdown(f"**Full-Fare Business Class:** {result['Full-Fare Business/First Class Price']}", unsafe_allow_html=True)
                 
                 # Evaluate relative upgrade cost (based on cash-only upgrade)
-                relative_upgrade_msg = evaluate_relative_upgrade_cost(base_fare, full_cash_upgrade)
+                relative_upgrade_msg = graph.get("upgrade_relative_cost")
                 if relative_upgrade_msg:
                     st.markdown("### 💸 **Upgrade Cost vs. Base Fare**")
                     if "✅" in relative_upgrade_msg:
@@ -750,10 +788,13 @@ with tab3:
                     st.error(result["Warning"])
                 # Add flight duration insight
                 comfort_factor = result["Comfort Factor"]
-                if travel_hours >= UPGRADE_COMFORT_HOURS:
+                if travel_hours >= get_rules().upgrade_comfort_hours:
                     st.info(f"Long flight ({travel_hours}h) increases upgrade value by {(comfort_factor-1)*100:.0f}% in our calculations.")
 
-with tab4:
+    render_evaluation_history("Upgrade Offer")
+
+@st.fragment
+def render_accelerator_tab(valuation, show_help):
     st.subheader("Evaluate Award Accelerator Deals")
     
     if show_help:
@@ -772,9 +813,12 @@ with tab4:
     
     cost_text = st.text_input("Total Cost ($)", placeholder="e.g., 1.5K, 1500", key="accelerator_cost")
     cost = parse_user_input(cost_text)
+    graph = get_evaluation_graph()
+    graph.update(accelerator_miles=miles, accelerator_pqp=pqp, accelerator_cost=cost)
 
     if st.button("Evaluate Award Accelerator"):
-        result = evaluate_accelerator(miles, pqp, cost)
+        figures, result = graph.get("accelerator"), graph.get("accelerator_result")
+        record_evaluation("Award Accelerator", {"miles": miles, "pqp": pqp, "cost": cost}, figures, valuation)
         
         # Check for errors
         if "Error" in result:
@@ -828,7 +872,60 @@ with tab4:
                 if miles > 0 and cost > 0:
                     st.info("This offer doesn't include PQP, so it only helps with award travel, not elite status progress.")
 
-with tab5:
+    # Whether PQP is worth buying depends on how close the next status level is
+    with st.expander("🥇 Cheapest Path to Premier Status"):
+        if show_help:
+            st.info("""
+            Enter the PQP and PQF you have earned this year, the flights you still plan to take
+            and any other accelerator offers you have been shown. The simulator finds the cheapest
+            set of offers (including the one above, if it has PQP) that reaches each status level.
+            """)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            current_pqp = parse_user_input(st.text_input("PQP Earned So Far", placeholder="e.g., 4.2K, 0", key="status_pqp"))
+        with col2:
+            current_pqf = parse_user_input(st.text_input("PQF Earned So Far", placeholder="e.g., 12, 0", key="status_pqf"))
+        planned_flights = st.data_editor(
+            [{"Flight": "", "PQP": "", "PQF": ""}],
+            num_rows="dynamic",
+            key="status_flights",
+        )
+        other_offers = st.data_editor(
+            [{"Offer": "", "PQP": "", "Miles": "", "Cost ($)": ""}],
+            num_rows="dynamic",
+            key="status_offers",
+        )
+
+        if st.button("Find Cheapest Path"):
+            from status_simulator import simulate_status
+
+            flights = [
+                {"name": row["Flight"], "pqp": parse_user_input(row["PQP"]), "pqf": parse_user_input(row["PQF"])}
+                for row in planned_flights
+            ]
+            offers = [{"name": "This offer", "pqp": pqp, "miles": miles, "cost": cost}] if pqp > 0 else []
+            offers += [
+                {"name": row["Offer"] or f"Offer {i + 1}", "pqp": parse_user_input(row["PQP"]),
+                 "miles": parse_user_input(row["Miles"]), "cost": parse_user_input(row["Cost ($)"])}
+                for i, row in enumerate(other_offers)
+            ]
+            plan = simulate_status(current_pqp, current_pqf, flights, offers, valuation=valuation)
+
+            if "Error" in plan:
+                st.warning(plan["Error"])
+            else:
+                st.markdown(f"**After Planned Flights:** {plan['PQP']:,.0f} PQP | {plan['PQF']:,.0f} PQF")
+                st.dataframe(plan["Levels"], hide_index=True)
+                next_level = next((row for row in plan["Levels"] if row["PQP Short"] and row["Cost"] is not None), None)
+                if next_level:
+                    st.success(f"Next reachable level: **{next_level['Status']}** for {format_currency(next_level['Cost'])} "
+                               f"({format_currency(next_level['Net Cost'])} after the miles that come with it).")
+
+    render_evaluation_history("Award Accelerator")
+
+@st.fragment
+def render_buy_miles_tab(valuation, show_help):
     st.subheader("Miles Purchase Deal")
     
     if show_help:
@@ -848,6 +945,9 @@ with tab5:
         
         bonus_miles_text = st.text_input("Bonus Miles (if any)", placeholder="e.g., 10K, 0", key="purchase_miles_bonus_offer")
         bonus_miles = parse_user_input(bonus_miles_text)
+
+    graph = get_evaluation_graph()
+    graph.update(purchase_price=cash_price, purchase_miles_offer=miles_price, purchase_miles_bonus_offer=bonus_miles)
         
     if st.button("Evaluate the Offer"):
         # Check if we have enough data to make a comparison
@@ -856,7 +956,9 @@ with tab5:
         elif cash_price == 0:
             st.warning("Please enter the purchase price.")
         else:
-            result = evaluate_miles_purchase(miles_price + bonus_miles, cash_price)
+            figures, result = graph.get("buy_miles"), graph.get("buy_miles_result")
+            record_evaluation("Buy Miles", {"miles": miles_price, "bonus_miles": bonus_miles, "cash_price": cash_price},
+                              figures, valuation)
             
             # Stylized Output Section
             st.markdown("### 🎟️ **Miles Purchase Analysis**")
@@ -901,19 +1003,249 @@ with tab5:
                 elif cpm > 1.5:
                     st.warning(f"Below average miles redemption value: {cpm:.2f} cents per mile (above the typical 1.2-1.5¢ range)")
 
-# Add an expanded disclaimer and about section
-with st.expander("About & Disclaimer"):
-    st.write("This app helps United Airlines travelers evaluate different deals and options to maximize value.")
-    st.write("DISCLAIMER: This app is developed for informational purposes only. Please use your own judgment.")
-    st.write(f"Version {VERSION}")
-    
-    st.markdown(f"""
-    ### Miles Valuation
-    - This app uses customizable mile valuations (currently set to {CURRENT_MILE_VALUE_LOW*100:.1f}¢-{CURRENT_MILE_VALUE_HIGH*100:.1f}¢ per mile)
-    - You can adjust these values in the settings above based on your redemption patterns
-    - Premium cabin international redemptions often yield higher value
-    
-    ### Premier Status Considerations (where applicable)
-    - Higher status levels may access better upgrade availability
-    - PQP requirements vary by status level
-    """)
+    # Cover a shortfall through a promotion's bonus tiers
+    with st.expander("🎁 Cheapest Way to Buy the Miles You Need"):
+        if show_help:
+            st.info("""
+            Enter how many miles you are short and the promotion's bonus tiers.
+            The optimizer finds the cheapest set of purchases (within the per-purchase limits)
+            that credits at least that many miles, since a bigger purchase can reach a richer bonus tier.
+            """)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            needed = parse_user_input(st.text_input("Miles Needed", placeholder="e.g., 35K, 80000", key="buy_miles_needed"))
+            block_price = parse_user_input(st.text_input("Price per 1,000 Miles ($)", placeholder="e.g., 37.63", key="buy_miles_block_price"))
+        with col2:
+            min_miles = parse_user_input(st.text_input("Minimum per Purchase", placeholder="e.g., 2K", key="buy_miles_min"))
+            max_miles = parse_user_input(st.text_input("Maximum per Purchase", placeholder="e.g., 150K", key="buy_miles_max"))
+        bonus_tiers = st.data_editor(
+            [{"Buy At Least": "", "Bonus %": "", "Bonus Miles": ""}],
+            num_rows="dynamic",
+            key="buy_miles_tiers",
+        )
+
+        if st.button("Find Cheapest Purchase"):
+            from miles_purchase_optimizer import optimize_miles_purchase
+
+            tiers = [
+                (parse_user_input(row["Buy At Least"]), parse_user_input(row["Bonus %"]), parse_user_input(row["Bonus Miles"]))
+                for row in bonus_tiers
+                if row["Buy At Least"] or row["Bonus %"] or row["Bonus Miles"]
+            ]
+            plan = optimize_miles_purchase(needed, block_price, tiers, min_miles=min_miles, max_miles=max_miles)
+
+            if "Error" in plan:
+                st.warning(plan["Error"])
+            else:
+                st.markdown("##### 🛒 **Purchases to Make**")
+                st.dataframe(plan["Purchases"], hide_index=True)
+                st.markdown(f"**Total Cost:** {format_currency(plan['Total Cost'])} | "
+                            f"**Miles Credited:** {plan['Miles Credited']:,} ({plan['Extra Miles']:,} more than needed)")
+                cpm = plan["Effective CPM"]
+                if cpm <= valuation.low * 100:
+                    st.success(f"✅ {cpm:.2f}¢ per mile, below your {valuation.low*100:.1f}¢ low valuation.")
+                elif cpm <= valuation.high * 100:
+                    st.info(f"🟡 {cpm:.2f}¢ per mile, within your {valuation.low*100:.1f}¢ - {valuation.high*100:.1f}¢ valuation.")
+                else:
+                    st.warning(f"❌ {cpm:.2f}¢ per mile, above your {valuation.high*100:.1f}¢ high valuation.")
+
+                st.markdown("##### 📉 **Effective CPM by Purchase Size**")
+                st.line_chart(plan["CPM Curve"], x="Miles Bought", y="Effective CPM")
+
+    render_evaluation_history("Buy Miles")
+
+BULK_OFFER_LABELS = {"ticket": "Ticket Purchase", "upgrade": "Upgrade Offer", "accelerator": "Award Accelerator"}
+BULK_SUMMARY_COLUMNS = {"ticket": "best_option", "upgrade": "best_option", "accelerator": "verdict"}
+
+@st.fragment
+def render_bulk_upload_tab(valuation, show_help):
+    # Imported here so pandas and numpy are only loaded once this tab is opened
+    from bulk_upload import (
+        MAX_ROWS, OFFER_FIELDS, PAGE_ROWS, ROUTE_FIELDS, UPLOAD_TYPES, BulkUploadError,
+        combine_results, estimate_rows, evaluate_upload, format_results, spool_csv,
+    )
+
+    st.subheader("📤 Evaluate a Spreadsheet of Offers")
+
+    if show_help:
+        st.info("""
+        Upload a CSV or Excel file with one offer per row instead of typing them in one at a time.
+        - **Columns** use the names listed below (case and spaces don't matter); missing columns count as 0
+        - **Amounts** can be written like the form fields: 13.6K, 1.2K, 500
+        - **Results** can be paged through here and downloaded as CSV
+        """)
+
+    offer = st.radio("Offer Type", list(BULK_OFFER_LABELS), format_func=BULK_OFFER_LABELS.get, horizontal=True, key="bulk_offer")
+    st.caption(f"**Columns:** {', '.join(OFFER_FIELDS[offer])}"
+               + (f" (optional: {', '.join(ROUTE_FIELDS[offer])}, to estimate travel_hours)" if offer in ROUTE_FIELDS else ""))
+    upload = st.file_uploader("Offers File", type=UPLOAD_TYPES, key="bulk_file")
+
+    if upload is not None and st.button("Evaluate File"):
+        data = upload.getvalue()
+        expected = estimate_rows(data, upload.name)
+        progress = st.progress(0.0, text="Reading file...")
+        verdict_table = get_upgrade_verdict_table(get_rules().digest) if offer == "upgrade" else None
+        chunks, done = [], 0
+        try:
+            for done, chunk in evaluate_upload(data, upload.name, offer, valuation=valuation, verdict_table=verdict_table):
+                chunks.append(chunk)
+                fraction = min(done / expected, 1.0) if expected else 0.0
+                progress.progress(fraction, text=f"Evaluated {done:,} rows" + (f" of about {expected:,}" if expected else ""))
+        except BulkUploadError as e:
+            progress.empty()
+            st.error(str(e))
+        else:
+            progress.empty()
+            st.session_state["bulk_results"] = {
+                "offer": offer,
+                "name": upload.name,
+                "results": combine_results(chunks),
+                "valuation": valuation,
+                "truncated": done >= MAX_ROWS,
+            }
+            st.session_state["bulk_page"] = 1
+
+    evaluated = st.session_state.get("bulk_results")
+    if not evaluated:
+        return
+    results, evaluated_offer = evaluated["results"], evaluated["offer"]
+    st.markdown(f"### 📋 **{BULK_OFFER_LABELS[evaluated_offer]} Results** ({len(results):,} rows from {evaluated['name']})")
+    if evaluated["truncated"]:
+        st.warning(f"Only the first {MAX_ROWS:,} rows were evaluated.")
+    if evaluated["valuation"] != valuation:
+        st.info("The mile valuation changed since this file was evaluated; evaluate it again to update the results.")
+    if not len(results):
+        return
+
+    summary = results[BULK_SUMMARY_COLUMNS[evaluated_offer]].value_counts()
+    st.markdown(" · ".join(f"**{label}:** {count:,}" for label, count in summary.items() if count))
+    if "error" in results:
+        errors = int(results["error"].notna().sum())
+        if errors:
+            st.warning(f"{errors:,} row{'s' if errors > 1 else ''} could not be evaluated; see the Error column.")
+
+    pages = -(-len(results) // PAGE_ROWS)
+    page = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, step=1, key="bulk_page")
+    start = (page - 1) * PAGE_ROWS
+    st.dataframe(format_results(results.iloc[start:start + PAGE_ROWS], evaluated_offer), hide_index=True)
+
+    stem = evaluated["name"].rsplit(".", 1)[0]
+    st.download_button("⬇️ Results (CSV)", data=lambda: spool_csv(results, evaluated_offer),
+                       file_name=f"{stem}_evaluated.csv", mime="text/csv", on_click="ignore", key="bulk_download")
+
+# Opt-in profiler for this script run (toggled in the sidebar, applies from the next run)
+profiler = RunProfiler().start() if st.session_state.get("profile_run") else None
+try:
+    # Streamlit UI with Tabs
+    with profile_section(profiler, "Header & logo"):
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col2:
+            st.image(asset_source(UA_LOGO, UA_LOGO_URL), width=200)  # Reduced logo size, bundled locally when vendored
+        st.title("United Airlines Deal Evaluator ✈️")
+        st.caption("Analyze **Award Accelerators, Upgrade Offers, Ticket Purchases, and Buy Miles Offer** to find the best value.")
+
+    # Sidebar Settings
+    with profile_section(profiler, "Sidebar"), st.sidebar:
+        st.markdown("### ⚙️ **Settings**")
+
+        # Mile valuation settings
+        st.markdown("**Mile Valuations**")
+        custom_low = st.number_input(
+            "Low Value (¢/mile)", 
+            min_value=0.5, 
+            max_value=5.0, 
+            value=MILE_VALUE_LOW * 100, 
+            step=0.1,
+            help="Conservative mile valuation"
+        )
+
+        custom_high = st.number_input(
+            "High Value (¢/mile)", 
+            min_value=0.5, 
+            max_value=5.0, 
+            value=MILE_VALUE_HIGH * 100, 
+            step=0.1,
+            help="Optimistic mile valuation"
+        )
+
+        # Validation
+        if custom_high < custom_low:
+            st.error("High value must be greater than low value")
+            custom_high = custom_low + 0.1
+
+        # Session-local valuation passed explicitly to every evaluator
+        valuation = MileValuation.from_cents(custom_low, custom_high)
+
+        st.markdown(f"**Current:** {custom_low:.1f}¢ - {custom_high:.1f}¢ per mile")
+
+        st.markdown("---")
+
+        # Help toggle
+        show_help = st.checkbox("Show Help", st.session_state.show_help)
+        st.session_state.show_help = show_help
+
+        st.checkbox("Profile This Run", key="profile_run", help="Time each section of the page and sample the hottest functions")
+
+    # Current settings info
+    st.info(f"**Current Mile Valuations:** {valuation.low*100:.1f}¢ - {valuation.high*100:.1f}¢ per mile | **Default:** 1.2¢ - 1.5¢ per mile (adjust in sidebar ⚙️)")
+
+    # Shared by every tab's derived values; an unchanged valuation invalidates nothing
+    get_evaluation_graph().update(valuation=valuation)
+
+    # Create tabs; only the selected tab's fragment runs (hidden tabs are computed lazily)
+    tab_renderers = {
+        "🎟️ Ticket Purchase": render_ticket_purchase_tab,
+        "💰 Break-Even Calculator": render_break_even_tab,
+        "💺 Upgrade Offer": render_upgrade_tab,
+        "🏆 Award Accelerator": render_accelerator_tab,
+        "💵 Buy Miles": render_buy_miles_tab,
+        "📤 Bulk Upload": render_bulk_upload_tab,
+    }
+    tabs = st.tabs(list(tab_renderers), key="active_tab", on_change="rerun")
+    for tab, (label, render_tab) in zip(tabs, tab_renderers.items()):
+        with tab:
+            if tab.open:
+                with profile_section(profiler, f"Tab: {label}"):
+                    # While profiling, run the tab inside the full script run so every interaction is measured
+                    (render_tab.__wrapped__ if profiler else render_tab)(valuation, show_help)
+
+    # Add an expanded disclaimer and about section
+    with st.expander("About & Disclaimer"):
+        st.write("This app helps United Airlines travelers evaluate different deals and options to maximize value.")
+        st.write("DISCLAIMER: This app is developed for informational purposes only. Please use your own judgment.")
+        st.write(f"Version {VERSION}")
+
+        st.markdown(f"""
+        ### Miles Valuation
+        - This app uses customizable mile valuations (currently set to {valuation.low*100:.1f}¢-{valuation.high*100:.1f}¢ per mile)
+        - You can adjust these values in the settings above based on your redemption patterns
+        - Premium cabin international redemptions often yield higher value
+
+        ### Premier Status Considerations (where applicable)
+        - Higher status levels may access better upgrade availability
+        - PQP requirements vary by status level
+        """)
+finally:
+    # A rerun or stop raised mid-script must not leave the sampler thread running
+    if profiler is not None:
+        profiler.stop()
+
+# Rerun profile panel
+if profiler is not None:
+    report = profiler.report()
+    with st.expander("⏱️ Run Profile", expanded=True):
+        st.markdown(f"**Total:** {report['elapsed_ms']:.1f} ms | **Samples:** {report['samples']} every {report['sample_interval_ms']:.0f} ms")
+        st.markdown("##### Sections")
+        st.dataframe(report["sections"], hide_index=True)
+        if report["samples"]:
+            st.markdown("##### Where the Time Went")
+            st.dataframe(report["categories"], hide_index=True)
+            st.markdown("##### Hot Functions")
+            st.dataframe(report["hot_functions"], hide_index=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Export Profile (JSON)", json.dumps(report, indent=2), file_name="rerun_profile.json", mime="application/json", on_click="ignore")
+        with col2:
+            st.download_button("Export Folded Stacks", "\n".join(report["folded_stacks"]), file_name="rerun_profile.folded", mime="text/plain", on_click="ignore", help="For flamegraph.pl or speedscope")
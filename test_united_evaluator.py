@@ -1,8 +1,35 @@
 import pytest
+import asyncio
+import datetime
+import json
 import math
+import os
+import time
 from unittest.mock import patch, MagicMock
 import streamlit as st
 
+import api_server
+import award_api
+import bulk_upload
+import calculators
+import io_telemetry
+import metrics
+import verdict_rules
+from airports import flight_hours, get_airport_index
+from anomaly import AnomalyDetector
+from award_routing import AwardRouter, Segment, segments_from_calendars
+from nearby_search import KDTree, nearby_airports, search_nearby_awards
+from award_calendar import AwardCalendars, MinSegmentTree
+from cpm_sketch import CpmSketches, KLLSketch
+from evaluation_history import EvaluationHistory
+from miles_purchase_optimizer import optimize_miles_purchase, purchase_options, tier_bonus
+from price_history import PriceHistory, parse_route
+from reactive_graph import ReactiveGraph
+from status_simulator import PREMIER_LEVELS, simulate_status
+from upgrade_clearance import STATUS_LIST_SHARE, clearance_chances, estimate_clearance, share_ahead
+from upgrade_table import UpgradeVerdictTable, load_upgrade_table, validate_table
+from wallet_optimizer import optimize_trip_wallet
+
 # Import the functions from the main application
 # In a real implementation, these would be imported from the main app file
 # For this example, we'll include simplified versions of the functions
@@ -309,6 +336,1029 @@ class TestTicketPurchase:
             # If no error, the function should still return a valid result
             assert "Best Option" in result
 
+class TestWalletOptimizer:
+    def test_balance_goes_to_best_savings(self):
+        # WO-001: only one trip fits, the one with the larger savings wins
+        trips = [
+            {"name": "SFO-JFK", "cash_price": 600, "miles_price": 30000},
+            {"name": "SFO-LAX", "cash_price": 250, "miles_price": 10000},
+        ]
+        plan = optimize_trip_wallet(trips, 30000)
+        assert [b["Book With"] for b in plan["Bookings"]] == ["Miles", "Cash"]
+        assert plan["Total Savings"] == pytest.approx(600 - 30000 * MILE_VALUE_LOW)
+        assert plan["Miles Left"] == 0
+
+    def test_miles_plus_cash_stretches_balance(self):
+        # WO-002: Miles + Cash on one trip leaves room to redeem the other
+        trips = [
+            {"cash_price": 600, "miles_price": 30000, "miles_plus_cash_miles": 15000, "miles_plus_cash_cash": 150},
+            {"cash_price": 500, "miles_price": 25000},
+        ]
+        plan = optimize_trip_wallet(trips, 40000)
+        assert [b["Book With"] for b in plan["Bookings"]] == ["Miles + Cash", "Miles"]
+        assert plan["Miles Used"] == 40000
+
+    def test_never_books_worse_than_cash(self):
+        # WO-003: a poor redemption is left as a cash booking
+        plan = optimize_trip_wallet([{"cash_price": 100, "miles_price": 30000}], 100000)
+        assert plan["Bookings"][0]["Book With"] == "Cash"
+        assert plan["Total Savings"] == 0
+
+    def test_matches_brute_force(self):
+        # WO-004: DP result equals an exhaustive search over all combinations
+        import itertools
+        from wallet_optimizer import trip_options
+
+        trips = [
+            {"cash_price": 420, "miles_price": 22500, "miles_plus_cash_miles": 11000, "miles_plus_cash_cash": 90},
+            {"cash_price": 880, "miles_price": 45000, "miles_plus_cash_miles": 30000, "miles_plus_cash_cash": 160},
+            {"cash_price": 310, "miles_price": 12500},
+            {"cash_price": 1500, "miles_price": 80000, "miles_plus_cash_miles": 50000, "miles_plus_cash_cash": 400},
+        ]
+        balance = 100000
+        choices = [[(0, 0)] + [(o[1], o[3]) for o in trip_options(t)] for t in trips]
+        best = max(
+            sum(s for _, s in combo)
+            for combo in itertools.product(*choices)
+            if sum(m for m, _ in combo) <= balance
+        )
+        assert optimize_trip_wallet(trips, balance)["Total Savings"] == pytest.approx(best)
+
+    def test_large_plan_is_fast(self):
+        # WO-005: dozens of trips and a six-figure balance in well under a second
+        import time
+
+        trips = [
+            {"cash_price": 300 + 17 * i, "miles_price": 15000 + 500 * i,
+             "miles_plus_cash_miles": 8000 + 300 * i, "miles_plus_cash_cash": 60 + i}
+            for i in range(48)
+        ]
+        start = time.perf_counter()
+        plan = optimize_trip_wallet(trips, 350000)
+        assert time.perf_counter() - start < 1.0
+        assert plan["Miles Used"] <= 350000
+
+    def test_negative_balance(self):
+        # WO-006: negative balance is rejected
+        assert "Error" in optimize_trip_wallet([], -1)
+
+class TestUpgradeVerdictTable:
+    def test_table_matches_exact_path(self):
+        # UV-001: table lookups agree with evaluate_upgrade's exact checks
+        assert validate_table(UpgradeVerdictTable.build(), samples=3000) == []
+
+    def test_table_round_trips_through_disk(self, tmp_path):
+        # UV-002: a saved table is loaded back instead of rebuilt
+        path = str(tmp_path / "verdicts.npz")
+        UpgradeVerdictTable.build().save(path)
+        table = load_upgrade_table(path)
+        result = calculators.evaluate_upgrade(10000, 100, 900, 1000, 2, "Economy", "Premium Plus", verdict_table=table)
+        assert result["Warning"] == "⚠️ Short flight – upgrade may not be worth it."
+
+    def test_stale_table_is_rebuilt(self, tmp_path):
+        # UV-003: changing a threshold invalidates the cached table
+        path = str(tmp_path / "verdicts.npz")
+        UpgradeVerdictTable.build().save(path)
+        config = json.load(open(verdict_rules.RULES_PATH, encoding="utf-8"))
+        config["upgrade"]["comfort_hours"] = 8
+        rules_path = tmp_path / "rules.json"
+        rules_path.write_text(json.dumps(config), encoding="utf-8")
+        try:
+            verdict_rules.use_rules_file(str(rules_path))
+            table = load_upgrade_table(path)
+            assert table.edges["hours"] == [5, 8]
+            assert validate_table(table, samples=500) == []
+        finally:
+            verdict_rules.use_rules_file(verdict_rules.RULES_PATH)
+
+    def test_custom_valuation_prices_the_mixed_warning(self):
+        # UV-004: the "Miles + Cash costs more than full fare" warning uses the caller's valuation, exact and tabled
+        table = UpgradeVerdictTable.build()
+        rich = calculators.MileValuation.from_cents(2.0, 2.5)
+        args = (40000, 100, 300, 700, 10, "Economy", "Business (Polaris)")
+        for verdict_table in (None, table):
+            assert calculators.evaluate_upgrade(*args, verdict_table=verdict_table)["Warning"] is None
+            result = calculators.evaluate_upgrade(*args, verdict_table=verdict_table, valuation=rich)
+            assert result["Total Upgrade Cost (Miles + Cash)"].startswith("$900.00")
+            assert "costing more than a full-fare" in result["Warning"]
+        assert validate_table(table, samples=1000, valuation=rich) == []
+
+    def test_negative_hours_use_exact_ranking(self):
+        # UV-005: a non-positive comfort factor reverses the savings order, so the table defers to the exact path
+        table = UpgradeVerdictTable.build()
+        args = (1000, 10, 0, 0, -40, "Economy", "Business (Polaris)")
+        assert calculators.evaluate_upgrade(*args)["Best Option"] == "Buy Full Fare Ticket"
+        assert calculators.evaluate_upgrade(*args, verdict_table=table)["Best Option"] == "Buy Full Fare Ticket"
+
+
+class TestVerdictRules:
+    def test_bands_match_hard_coded_cutoffs(self):
+        # VR-001: shipped config reproduces the original thresholds
+        rules = verdict_rules.load_rules()
+        assert rules.pqp_cost.classify(1.29) == "✅ Excellent Deal!"
+        assert rules.pqp_cost.classify(1.30) == "🟡 Decent Value."
+        assert rules.pqp_cost.classify(1.50) == "❌ Not Worth It."
+        assert rules.cost_per_mile.classify(0.0119) == "🟡 Decent Value."
+        assert rules.upgrade_full_fare_ratio == 0.8
+
+    def test_hot_reload(self, tmp_path):
+        # VR-002: edits to the config file are picked up without a restart
+        config = json.load(open(verdict_rules.RULES_PATH, encoding="utf-8"))
+        rules_path = tmp_path / "rules.json"
+        rules_path.write_text(json.dumps(config), encoding="utf-8")
+        try:
+            verdict_rules.use_rules_file(str(rules_path), reload_interval=0)
+            assert "Excellent" in calculators.evaluate_accelerator(10000, 100, 200)["Verdict"]
+
+            config["accelerator"]["pqp_cost"][0][0] = 0.25
+            rules_path.write_text(json.dumps(config), encoding="utf-8")
+            os.utime(rules_path, ns=(time.time_ns(), time.time_ns() + 10**9))
+            assert "Decent" in calculators.evaluate_accelerator(10000, 100, 200)["Verdict"]
+
+            # A broken file keeps the last good rules
+            rules_path.write_text("{not json", encoding="utf-8")
+            os.utime(rules_path, ns=(time.time_ns(), time.time_ns() + 2 * 10**9))
+            assert "Decent" in calculators.evaluate_accelerator(10000, 100, 200)["Verdict"]
+        finally:
+            verdict_rules.use_rules_file(verdict_rules.RULES_PATH)
+
+    def test_bands_must_end_with_catch_all(self):
+        # VR-003: invalid band lists are rejected
+        with pytest.raises(ValueError):
+            verdict_rules.compile_bands([[1.0, "a"], [2.0, "b"]])
+
+class TestMileValuation:
+    def test_hashable_and_immutable(self):
+        # MV-001: valuations can be cache keys and cannot be mutated
+        a = calculators.MileValuation.from_cents(1.2, 1.5)
+        assert a == calculators.DEFAULT_VALUATION
+        assert {a: "cached"}[calculators.MileValuation(0.012, 0.015)] == "cached"
+        with pytest.raises(AttributeError):
+            a.low = 0.02
+
+    def test_picklable_for_workers(self):
+        # MV-002: valuations survive a round trip to a worker process
+        import pickle
+        valuation = calculators.MileValuation(0.01, 0.02)
+        assert pickle.loads(pickle.dumps(valuation)) == valuation
+
+    def test_concurrent_sessions_are_isolated(self):
+        # MV-003: evaluations with different valuations never leak into each other
+        from concurrent.futures import ThreadPoolExecutor
+
+        low = calculators.MileValuation(0.01, 0.01)
+        high = calculators.MileValuation(0.02, 0.02)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(
+                lambda v: calculators.evaluate_best_option(30000, 450, 0, 0, valuation=v)["Best Option"],
+                [low, high] * 50,
+            ))
+        assert results == ["Miles", "Cash"] * 50
+
+class TestMetrics:
+    def test_disabled_instrumentation_is_a_no_op(self, monkeypatch):
+        # ME-001: with metrics off the function is returned unchanged
+        monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+        assert metrics.instrumented(format_currency) is format_currency
+
+    def test_enabled_instrumentation_records_calls(self, monkeypatch):
+        # ME-002: counts, latency buckets and cache ratios reach the text dump
+        monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+        metrics.reset()
+        timed = metrics.instrumented(format_currency, name="format_currency")
+        for value in (1, 2, 3):
+            timed(value)
+        metrics.record_cache("demo", hit=True)
+        metrics.record_cache("demo", hit=False)
+
+        data = metrics.snapshot()
+        assert data["calls"]["format_currency"]["count"] == 3
+        assert data["cache"]["demo"]["hit_ratio"] == 0.5
+        text = metrics.render_prometheus()
+        assert 'united_miles_evaluator_calls_total{function="format_currency"} 3' in text
+        assert 'united_miles_evaluator_latency_seconds_bucket{function="format_currency",le="+Inf"} 3' in text
+        metrics.reset()
+
+class TestIoTelemetry:
+    def setup_method(self):
+        io_telemetry.reset()
+
+    def test_award_search_retries_rate_limits(self):
+        # IO-001: a 429 is retried and the retry count is recorded
+        limited = MagicMock(status_code=429, content=b"")
+        ok = MagicMock(status_code=200, content=b'{"lowest_miles": 30000}')
+        ok.json.return_value = {"lowest_miles": 30000, "cash_price": 600}
+        with patch("requests.get", side_effect=[limited, ok]), patch.object(award_api.time, "sleep"):
+            assert award_api.check_award_availability("SFO", "JFK", "2026-03-01") == (30000, 600)
+        stats = io_telemetry.summary(award_api.AWARD_API_ENDPOINT)
+        assert stats["count"] == 1
+        assert stats["retries"] == 1
+        assert stats["statuses"] == {"200": 1}
+
+    def test_award_search_error_class_is_recorded(self):
+        # IO-002: connection failures keep the old message and record the error class
+        import requests
+
+        with patch("requests.get", side_effect=requests.ConnectionError("down")), patch.object(award_api.time, "sleep"):
+            miles, message = award_api.check_award_availability("SFO", "JFK", "2026-03-01")
+        assert miles is None and message.startswith("API Error")
+        assert io_telemetry.summary(award_api.AWARD_API_ENDPOINT)["errors"] == {"ConnectionError": 1}
+
+    def test_percentiles(self):
+        # IO-003: histogram percentiles stay within one bucket of the true value
+        for ms in range(1, 1001):
+            io_telemetry.record_call("demo", ms / 1000)
+        stats = io_telemetry.summary("demo")
+        assert stats["p50_s"] == pytest.approx(0.5, rel=io_telemetry.GROWTH - 1)
+        assert stats["p99_s"] == pytest.approx(0.99, rel=io_telemetry.GROWTH - 1)
+        assert stats["max_s"] == 1.0
+
+class TestRunProfiler:
+    def test_sections_and_samples(self):
+        # RP-001: sections are timed and a busy section shows up in the samples
+        from run_profiler import RunProfiler, profile_section
+
+        def busy_evaluator_loop():
+            end = time.perf_counter() + 0.1
+            while time.perf_counter() < end:
+                calculators.evaluate_best_option(30000, 600, 15000, 200)
+
+        profiler = RunProfiler(interval=0.001).start()
+        with profile_section(profiler, "busy"):
+            busy_evaluator_loop()
+        with profile_section(None, "ignored"):
+            pass
+        report = profiler.stop().report()
+
+        assert [s["Section"] for s in report["sections"]] == ["busy"]
+        assert report["sections"][0]["Time (ms)"] >= 100
+        assert report["samples"] > 0
+        assert any("busy_evaluator_loop" in f for f in report["folded_stacks"])
+
+class TestPriceHistory:
+    def test_range_queries(self, tmp_path):
+        # PH-001: lowest miles/cash over a travel-date range, optionally by cabin
+        history = PriceHistory(str(tmp_path / "quotes.sqlite"))
+        history.record_many([
+            ("SFO-JFK", "2026-03-02", "Economy", 30000, 450.0, 1.0),
+            ("SFO-JFK", "2026-03-20", "Economy", 22500, 520.0, 2.0),
+            ("SFO-JFK", "2026-03-20", "Business (Polaris)", 80000, 1900.0, 3.0),
+            ("SFO-JFK", "2026-04-01", "Economy", 12500, 300.0, 4.0),
+            ("SFO-LAX", "2026-03-05", "Economy", 7500, 99.0, 5.0),
+        ])
+        assert history.lowest_miles("SFO-JFK", "2026-03-01", "2026-03-31") == 22500
+        assert history.lowest_miles("SFO-JFK", "2026-03-01", "2026-03-31", cabin="Business (Polaris)") == 80000
+        assert history.lowest_cash("SFO-JFK", "2026-03-01", "2026-03-31", cabin="Economy") == 450.0
+        assert history.lowest_miles("SFO-ORD", "2026-03-01", "2026-03-31") is None
+        assert [day.day for day, _, _ in history.daily_lows("SFO-JFK", "2026-03-01", "2026-03-31")] == [2, 20]
+        history.close()
+
+    def test_queries_use_composite_indexes(self, tmp_path):
+        # PH-002: route/date range queries are served from an index, not a table scan
+        history = PriceHistory(str(tmp_path / "quotes.sqlite"))
+        for cabin in (None, "Economy"):
+            where, params = history._filters("SFO-JFK", "2026-03-01", "2026-03-31", cabin)
+            plan = " ".join(str(row[-1]) for row in history._conn.execute(
+                f"EXPLAIN QUERY PLAN SELECT MIN(miles) FROM award_quotes WHERE {where}", params))
+            assert "USING COVERING INDEX" in plan
+        history.close()
+
+    def test_buffered_quotes_from_award_search(self, tmp_path):
+        # PH-003: quotes published by the award API are buffered and visible to queries
+        history = PriceHistory(str(tmp_path / "quotes.sqlite"), batch_size=100, flush_interval=60)
+        award_api.add_quote_listener(history.record_quote)
+        ok = MagicMock(status_code=200, content=b"{}")
+        ok.json.return_value = {"lowest_miles": 25000, "cash_price": 410}
+        try:
+            with patch("requests.get", return_value=ok):
+                award_api.check_award_availability("sfo", "jfk", "2026-03-14", cabin="Economy")
+        finally:
+            award_api.remove_quote_listener(history.record_quote)
+        assert len(history._buffer) == 1
+        assert history.lowest_miles("SFO-JFK", "2026-03-01", "2026-03-31", cabin="Economy") == 25000
+        assert history._buffer == []
+        history.close()
+
+class TestCpmSketch:
+    def test_rank_accuracy_and_merge(self):
+        # CS-001: ranks stay within ~2% of exact on 100k values, before and after merging halves
+        import random
+
+        rng = random.Random(7)
+        values = [rng.lognormvariate(0.3, 0.4) for _ in range(100_000)]
+        whole, left, right = KLLSketch(seed=1), KLLSketch(seed=2), KLLSketch(seed=3)
+        for i, x in enumerate(values):
+            whole.update(x)
+            (left if i % 2 else right).update(x)
+        merged = left.merge(right)
+        ordered = sorted(values)
+        for q in (0.1, 0.5, 0.9):
+            x = ordered[int(q * len(ordered))]
+            assert whole.percentile_rank(x) == pytest.approx(q, abs=0.02)
+            assert merged.percentile_rank(x) == pytest.approx(q, abs=0.02)
+        assert merged.count == len(values)
+        assert sum(len(c) for c in whole.compactors) < 1000
+        assert whole.quantile(0.5) == pytest.approx(ordered[50_000], rel=0.05)
+
+    def test_catch_up_from_history(self, tmp_path):
+        # CS-002: quotes stored in the history are folded in once, per route and cabin
+        history = PriceHistory(str(tmp_path / "quotes.sqlite"))
+        history.record_many([
+            ("SFO-JFK", "2026-03-01", "Economy", 25000, 250.0, 1.0),    # 1.0 cpm
+            ("SFO-JFK", "2026-03-02", "Economy", 25000, 500.0, 2.0),    # 2.0 cpm
+            ("SFO-JFK", "2026-03-02", "Business (Polaris)", 80000, 2400.0, 3.0),  # 3.0 cpm
+        ])
+        sketches = CpmSketches()
+        assert sketches.catch_up(history) == 3
+        assert sketches.catch_up(history) == 0
+        assert sketches.percentile_rank(2.0, "SFO-JFK") == (pytest.approx(2 / 3), 3)
+        assert sketches.percentile_rank(1.5, "SFO-JFK", "Economy") == (0.5, 2)
+        assert sketches.percentile_rank(1.5, "SFO-LAX") == (None, 0)
+        assert parse_route("sfo → jfk") == "SFO-JFK"
+        assert parse_route("SFO") is None
+        history.close()
+
+    def test_route_median_sets_the_advice_cutoff(self):
+        # CS-003: a route's median CPM replaces the fixed 1.5¢ advice cutoff
+        sketches = CpmSketches()
+        for cash in range(200, 700, 10):  # 0.8-2.76 cpm on 25K miles, median ~1.8
+            sketches.record("SFO-JFK", "Economy", 25000, cash)
+        median, count = sketches.quantile(0.5, "SFO-JFK", "Economy")
+        assert count == 50 and median == pytest.approx(1.76, abs=0.05)
+        assert sketches.quantile(0.5, "SFO-LAX") == (None, 0)
+        assert calculators.best_option_figures(25000, 425, 0, 0)["advice"] is not None  # 1.7¢ > 1.5¢
+        assert calculators.best_option_figures(25000, 425, 0, 0, advice_cpm=median)["advice"] is None
+        assert calculators.best_option_figures(25000, 475, 0, 0, advice_cpm=median)["advice"] is not None
+
+class TestAnomalyDetector:
+    @staticmethod
+    def quote(miles, cash, route="SFO-JFK"):
+        return {"route": route, "cabin": "Economy", "travel_date": "2026-03-14", "miles": miles, "cash": cash}
+
+    def test_flags_only_outliers_after_warm_up(self):
+        # AD-001: typical quotes pass, a far cheaper one is flagged with a reason
+        cold = AnomalyDetector()
+        for _ in range(cold.min_observations):
+            assert cold.score(self.quote(2500, 40)) is None  # Too little history to judge
+
+        detector = AnomalyDetector()
+        for i in range(40):
+            assert detector.score(self.quote(25000 + (i % 5) * 500, 400 + (i % 7) * 10)) is None
+        event = detector.score(self.quote(12500, 420))
+        assert event is not None
+        assert event["Miles Z"] <= -3 and event["CPM Z"] >= 3
+        assert "below the usual" in event["Reason"]
+        assert detector.events_since(0) == [event]
+        assert detector.events_since(0, route="SFO-LAX") == []
+        assert detector.score(self.quote(25500, 410)) is None
+
+    def test_scores_quotes_from_award_search(self):
+        # AD-002: the detector sees every quote the award API publishes
+        detector = AnomalyDetector(min_observations=3)
+        for _ in range(5):
+            detector.observe("SFO-JFK", "Economy", 30000, 450)
+        ok = MagicMock(status_code=200, content=b"{}")
+        ok.json.return_value = {"lowest_miles": 10000, "cash_price": 450}
+        award_api.add_quote_listener(detector.record_quote)
+        try:
+            with patch("requests.get", return_value=ok):
+                award_api.check_award_availability("SFO", "JFK", "2026-03-14")
+        finally:
+            award_api.remove_quote_listener(detector.record_quote)
+        assert [e["Miles"] for e in detector.events_since(0, route="SFO-JFK")] == [10000]
+
+class TestAwardCalendar:
+    def test_segment_tree_matches_brute_force(self):
+        # AC-001: arg-min over random ranges agrees with a linear scan after in-place updates
+        import random
+
+        rng = random.Random(3)
+        values = [rng.choice([math.inf, rng.randint(5, 80) * 1000]) for _ in range(300)]
+        tree = MinSegmentTree(values)
+        for _ in range(2000):
+            if rng.random() < 0.3:
+                i = rng.randrange(len(values))
+                values[i] = rng.randint(5, 80) * 1000
+                tree.update(i, values[i])
+            lo = rng.randrange(len(values))
+            hi = rng.randrange(lo, len(values))
+            window = values[lo:hi + 1]
+            expected = lo + window.index(min(window)) if min(window) != math.inf else -1
+            assert tree.argmin(lo, hi) == expected
+
+    def test_cheapest_in_window(self, tmp_path):
+        # AC-002: the latest quote per date wins and windows outside the calendar grow it
+        history = PriceHistory(str(tmp_path / "quotes.sqlite"))
+        history.record_many([
+            ("SFO-JFK", "2026-06-03", "Economy", 30000, 450.0, 1.0),
+            ("SFO-JFK", "2026-06-10", "Economy", 12500, 380.0, 2.0),
+            ("SFO-JFK", "2026-06-19", "Economy", 22500, 210.0, 3.0),
+        ])
+        calendars = AwardCalendars()
+        assert calendars.catch_up(history) == 3
+        june = (datetime.date(2026, 6, 3), datetime.date(2026, 6, 19))
+        assert calendars.cheapest("SFO-JFK", "Economy", *june)["Travel Date"] == datetime.date(2026, 6, 10)
+        assert calendars.cheapest("SFO-JFK", "Economy", *june, by="cash")["Cash"] == 210.0
+
+        calendars.record("SFO-JFK", "Economy", "2026-06-10", 45000, 380.0)  # Saver space gone
+        assert calendars.cheapest("SFO-JFK", "Economy", *june)["Miles"] == 22500
+        calendars.record("SFO-JFK", "Economy", "2027-09-01", 7500, 99.0)  # Beyond the initial window
+        assert calendars.cheapest("SFO-JFK", "Economy", *june)["Miles"] == 22500
+        assert calendars.cheapest("SFO-JFK", "Economy", datetime.date(2026, 1, 1), datetime.date(2028, 1, 1))["Miles"] == 7500
+        assert calendars.cheapest("SFO-JFK", "Business (Polaris)", *june) is None
+        history.close()
+
+class TestAirports:
+    def test_known_distances(self):
+        # AP-001: great-circle distances match published figures within 1%
+        index = get_airport_index()
+        assert float(index.distance_miles("SFO", "JFK")) == pytest.approx(2586, rel=0.01)
+        assert float(index.distance_miles("EWR", "LHR")) == pytest.approx(3466, rel=0.01)
+        assert flight_hours("sfo ", "lax") == pytest.approx(1.36, abs=0.05)
+        assert flight_hours("SFO", "XXX") is None
+        assert index.airport("ORD")["City"] == "Chicago"
+
+    def test_vectorized_block_hours(self):
+        # AP-002: a whole column of routes is estimated at once; unknown codes give NaN
+        import numpy as np
+
+        origins = np.array(["SFO", "IAH", "ewr", "ZZZ"] * 25_000)
+        destinations = np.array(["JFK", "SYD", "LHR", "SFO"] * 25_000)
+        hours = get_airport_index().block_hours(origins, destinations)
+        assert hours.shape == (100_000,)
+        assert hours[0] == pytest.approx(flight_hours("SFO", "JFK"))
+        assert hours[2] == pytest.approx(flight_hours("EWR", "LHR"))
+        assert np.isnan(hours[3])
+        assert 5 < hours[0] < 7 and hours[1] > 17
+
+class TestNearbySearch:
+    def test_kd_tree_matches_brute_force(self):
+        # NS-001: radius queries return exactly the points a linear scan finds, nearest first
+        import numpy as np
+
+        rng = np.random.default_rng(5)
+        points = rng.normal(size=(500, 3))
+        tree = KDTree(points)
+        for _ in range(50):
+            center, radius = rng.normal(size=3), rng.uniform(0.1, 1.5)
+            d = np.linalg.norm(points - center, axis=1)
+            assert tree.query_radius(center, radius) == [int(i) for i in np.argsort(d) if d[i] <= radius]
+
+    def test_nearby_airports(self):
+        # NS-002: metro airports are found within the radius and nothing across the country is
+        assert nearby_airports("SFO")[0] == "SFO"
+        assert {"OAK", "SJC"} <= set(nearby_airports("SFO")) and "LAX" not in nearby_airports("SFO")
+        assert {"EWR", "LGA"} <= set(nearby_airports("jfk", 30))
+        assert nearby_airports("XYZ") == ["XYZ"]
+
+    def test_fan_out_ranks_by_cpm(self):
+        # NS-003: every pair is fetched, failures are reported and awards rank by CPM
+        prices = {("OAK", "EWR"): (20000, 500), ("SFO", "JFK"): (30000, 450)}
+        calls = []
+
+        def fake_fetch(origin, destination, date, cabin):
+            calls.append((origin, destination))
+            if origin == "SJC":
+                return None, "Error: 503"
+            return prices.get((origin, destination), (40000, 400))
+
+        result = search_nearby_awards("SFO", "JFK", "2026-03-14", radius_miles=40, fetch=fake_fetch)
+        assert len(calls) == len(nearby_airports("SFO", 40)) * len(nearby_airports("JFK", 40))
+        assert result["Results"][0]["Origin"] == "OAK" and result["Results"][0]["CPM"] == pytest.approx(2.5)
+        assert [r["CPM"] for r in result["Results"]] == sorted((r["CPM"] for r in result["Results"]), reverse=True)
+        assert {e["Origin"] for e in result["Errors"]} == {"SJC"}
+
+    def test_fan_out_reports_cap_and_reuses_known_pair(self):
+        # NS-004: the already-searched pair is not fetched again and pairs past MAX_PAIRS are counted, farthest first
+        import nearby_search
+        calls = []
+
+        def fake_fetch(origin, destination, date, cabin):
+            calls.append((origin, destination))
+            return 40000, 400
+
+        result = search_nearby_awards("sfo", "jfk", "2026-03-14", radius_miles=40, fetch=fake_fetch,
+                                      known={("sfo", "jfk"): (30000, 450)})
+        total = len(nearby_airports("SFO", 40)) * len(nearby_airports("JFK", 40))
+        assert ("SFO", "JFK") not in calls and len(calls) == total - 1
+        assert result["Results"][0]["Origin"] == "SFO" and result["Skipped"] == 0
+        with patch.object(nearby_search, "MAX_PAIRS", 4):
+            calls.clear()
+            result = search_nearby_awards("SFO", "JFK", "2026-03-14", radius_miles=40, fetch=fake_fetch)
+        assert len(calls) == 4 and result["Skipped"] == total - 4
+        assert ("SFO", "JFK") in calls and len(result["Results"]) == 4
+
+class TestAwardRouting:
+    DAY = datetime.date(2026, 6, 3)
+
+    def at(self, hour, minute=0):
+        return datetime.datetime.combine(self.DAY, datetime.time(hour, minute))
+
+    def test_cheapest_connections_first(self):
+        # AR-001: connecting itineraries rank by miles value plus fees and never revisit an airport
+        router = AwardRouter([
+            Segment("SFO", "EWR", self.DAY, 35000, 450.0, fees=5.6),
+            Segment("SFO", "DEN", self.DAY, 8000, 160.0, fees=5.6),
+            Segment("DEN", "EWR", self.DAY, 10000, 210.0, fees=5.6),
+            Segment("DEN", "SFO", self.DAY, 1000, 90.0, fees=5.6),
+            Segment("SFO", "IAH", self.DAY, 9000, 170.0, fees=5.6),
+            Segment("IAH", "EWR", self.DAY, 40000, 380.0, fees=5.6),
+        ])
+        routes = [(i["Route"], i["Miles"]) for i in router.search("SFO", "EWR", self.DAY)]
+        assert routes == [("SFO-DEN-EWR", 18000), ("SFO-EWR", 35000), ("SFO-IAH-EWR", 49000)]
+        assert router.search("SFO", "EWR", self.DAY, max_stops=0)[0]["Route"] == "SFO-EWR"
+        best = router.search("SFO", "EWR", self.DAY, k=1)[0]
+        assert best["Cost"] == pytest.approx(18000 * calculators.MILE_VALUE_LOW + 11.2)
+        assert best["Fees"] == pytest.approx(11.2) and best["Cash Fare"] == pytest.approx(370)
+        assert best["Legs"][1]["Departs"] >= best["Legs"][0]["Arrives"] + datetime.timedelta(minutes=40)
+
+    def test_minimum_connection_times(self):
+        # AR-002: scheduled connections shorter than the hub's MCT are rejected
+        first = Segment("SFO", "ORD", self.DAY, 12500, 5.6, depart=self.at(7), block_hours=4.25)  # Lands 11:15
+        router = AwardRouter([
+            first,
+            Segment("ORD", "EWR", self.DAY, 5000, 5.6, depart=self.at(11, 50)),  # 35 min: too tight
+            Segment("ORD", "EWR", self.DAY, 9000, 5.6, depart=self.at(12, 10)),  # 55 min: legal
+            Segment("ORD", "LHR", self.DAY, 30000, 180.0, depart=self.at(12, 10)),  # International needs 90
+        ])
+        assert [i["Miles"] for i in router.search("SFO", "EWR", self.DAY)] == [21500]
+        assert router.search("SFO", "LHR", self.DAY) == []
+
+    def test_memoized_until_segments_change(self):
+        # AR-003: repeat searches reuse memoized suffixes; new segments invalidate them
+        router = AwardRouter([Segment("SFO", "DEN", self.DAY, 8000, 5.6), Segment("DEN", "EWR", self.DAY, 10000, 5.6)])
+        first = router.search("SFO", "EWR", self.DAY)
+        assert router._memo and router.search("SFO", "EWR", self.DAY) == first
+        router.record_quote({"origin": "DEN", "destination": "EWR", "travel_date": "2026-06-03",
+                             "miles": 7500, "cash": 5.6, "cabin": "Economy"})
+        assert router.search("SFO", "EWR", self.DAY)[0]["Miles"] == 15500
+
+    def test_memo_shared_by_arrivals_with_same_connections(self):
+        # AR-006: arrivals that can catch the same onward departures reuse one memoized suffix
+        router = AwardRouter([
+            Segment("SFO", "DEN", self.DAY, 8000, 5.6, depart=self.at(0, 30), block_hours=2),  # Lands 02:30
+            Segment("SFO", "DEN", self.DAY, 9000, 5.6, depart=self.at(1), block_hours=2),  # Lands 03:00
+            Segment("DEN", "EWR", self.DAY, 10000, 5.6),  # Leaves at DAY_START either way
+        ])
+        assert [i["Miles"] for i in router.search("SFO", "EWR", self.DAY)] == [18000, 19000]
+        assert [key[0] for key in router._memo] == ["DEN"]
+
+    def test_segments_from_calendars(self):
+        # AR-004: calendar quotes become date-only segments
+        calendars = AwardCalendars()
+        calendars.record("SFO-DEN", "Economy", "2026-06-03", 8000, 5.6)
+        calendars.record("SFO-DEN", "Economy", "2026-06-05", 9000, 5.6)
+        segments = segments_from_calendars(calendars, self.DAY, self.DAY)
+        assert segments == [Segment("SFO", "DEN", self.DAY, 8000, 5.6, "Economy")]
+        assert len(segments_from_calendars(calendars)) == 2
+
+    def test_calendar_cash_fares_are_not_fees(self):
+        # AR-005: the cash fare quoted with an award is reported but not added to the award's cost
+        calendars = AwardCalendars()
+        calendars.record("SFO-DEN", "Economy", "2026-06-03", 8000, 160.0)
+        calendars.record("DEN-EWR", "Economy", "2026-06-03", 10000, 210.0)
+        router = AwardRouter(segments_from_calendars(calendars))
+        router.record_quote({"origin": "SFO", "destination": "EWR", "travel_date": "2026-06-03",
+                             "miles": 20000, "cash": 300.0, "cabin": "Economy"})
+        itineraries = router.search("SFO", "EWR", self.DAY)
+        assert [i["Route"] for i in itineraries] == ["SFO-DEN-EWR", "SFO-EWR"]
+        assert itineraries[0]["Cost"] == pytest.approx(18000 * calculators.MILE_VALUE_LOW)
+        assert itineraries[0]["Cash Fare"] == pytest.approx(370) and itineraries[0]["Fees"] == 0
+
+class TestApiServer:
+    def call(self, path, body=None, method="POST", chunks=None):
+        """Drive the ASGI app in-process; returns (status, response body bytes)"""
+        raw = body if isinstance(body, bytes) else json.dumps(body or {}).encode()
+        incoming = [{"type": "http.request", "body": chunk, "more_body": True} for chunk in chunks or [raw]]
+        incoming[-1]["more_body"] = False
+        sent = []
+
+        async def receive():
+            return incoming.pop(0) if incoming else {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(api_server.app(self.scope(path, method), receive, send))
+        return sent[0]["status"], b"".join(m.get("body", b"") for m in sent[1:])
+
+    def scope(self, path, method="POST"):
+        return {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+                "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+                "headers": [(b"content-type", b"application/json")], "server": ("test", 80), "client": ("test", 1)}
+
+    def json_call(self, path, body=None, method="POST"):
+        status, raw = self.call(path, body, method)
+        return status, json.loads(raw)
+
+    def test_raw_numbers_match_evaluators(self):
+        # API-001: endpoints return the unformatted figures behind the UI evaluators
+        status, ticket = self.json_call("/ticket", {"miles_price": "30K", "cash_price": 450})
+        assert status == 200
+        assert ticket["cpm_miles"] == pytest.approx(1.5)
+        assert ticket["best_option"] == calculators.evaluate_best_option(30000, 450, 0, 0)["Best Option"]
+        assert self.json_call("/break-even", {"miles": 10000})[1]["max_cash_price"] == pytest.approx(150)
+        assert self.json_call("/buy-miles", {"miles_price": 10000, "cash_price": 200})[1]["cpm_miles"] == pytest.approx(2.0)
+        status, accel = self.json_call("/accelerator", {"miles": 5000, "pqp": 1000, "cost": 500})
+        assert status == 200 and accel["pqp_cost_low"] == pytest.approx((500 - 75) / 1000)
+        status, up = self.json_call("/upgrade", {"miles": 20000, "cash_cost": 300, "full_cash_upgrade": 900,
+                                            "full_fare_cost": 2000, "travel_hours": 6})
+        assert status == 200
+        assert up["best_option"] == calculators.evaluate_upgrade(
+            20000, 300, 900, 2000, 6, "Economy", "Business (Polaris)")["Best Option"]
+
+    def test_valuation_and_errors(self):
+        # API-002: a custom valuation applies; bad input is a 400 with an error message
+        _, custom = self.json_call("/break-even", {"miles": 10000, "valuation": {"low": 1.0, "high": 2.0}})
+        assert custom["max_cash_price"] == pytest.approx(200)
+        assert self.json_call("/accelerator", {"miles": 1000, "cost": -5})[0] == 400
+        assert self.json_call("/ticket", b"{not json")[0] == 400
+        assert self.json_call("/ticket", {"miles_price": [1]})[0] == 400
+        assert self.json_call("/ticket", b'{"miles_price": 1' + b"0" * 400 + b"}")[0] == 400
+        assert self.json_call("/upgrade", {"to_class": "First"})[0] == 400
+        assert self.json_call("/break-even", {"valuation": {"low": 2, "high": 1}})[0] == 400
+        assert self.json_call("/health", method="GET") == (200, {"status": "ok"})
+
+    def test_batch_streams_ndjson(self):
+        # API-003: mixed NDJSON records, split anywhere across chunks, come back in order with line numbers
+        lines = [
+            json.dumps({"type": "ticket", "id": "a", "miles_price": "30K", "cash_price": 450}),
+            "",
+            json.dumps({"type": "accelerator", "miles": 5000, "pqp": 1000, "cost": 500}),
+            json.dumps({"type": "lounge"}),
+            "{broken",
+            json.dumps({"type": "upgrade", "miles": 20000, "cash_cost": 300, "full_cash_upgrade": 900}),
+        ]
+        body = "\n".join(lines).encode()
+        status, raw = self.call("/batch", chunks=[body[i:i + 7] for i in range(0, len(body), 7)])
+        results = [json.loads(line) for line in raw.splitlines()]
+        assert status == 200
+        assert [r["line"] for r in results] == [1, 3, 4, 5, 6]
+        assert results[0]["id"] == "a" and results[0]["best_option"] == "Miles"
+        assert results[1]["pqp_cost_low"] == pytest.approx(0.425)
+        assert "type must be one of" in results[2]["error"] and "error" in results[3]
+        assert results[4]["best_option"]
+
+    def test_batch_malformed_records_do_not_stop_stream(self):
+        # API-005: unhashable types and oversized numbers become error lines between valid results
+        valid = json.dumps({"type": "ticket", "miles_price": 30000, "cash_price": 450})
+        lines = [valid, json.dumps({"type": [1]}), valid, '{"type": "ticket", "miles_price": 1' + "0" * 400 + "}", valid]
+        status, raw = self.call("/batch", "\n".join(lines).encode())
+        results = [json.loads(line) for line in raw.splitlines()]
+        assert status == 200
+        assert [r["line"] for r in results] == [1, 2, 3, 4, 5]
+        assert [r.get("best_option") for r in results[::2]] == ["Miles"] * 3
+        assert "type must be one of" in results[1]["error"] and "finite" in results[3]["error"]
+
+    def test_batch_backpressure(self):
+        # API-004: a client that stops reading results stops the server reading its upload
+        line = json.dumps({"type": "ticket", "miles_price": 30000, "cash_price": 450}).encode() + b"\n"
+        received = 0
+
+        async def receive():
+            nonlocal received
+            received += 1
+            return {"type": "http.request", "body": line, "more_body": True}  # Endless upload
+
+        async def send(message):
+            if message["type"] == "http.response.body":
+                await asyncio.Event().wait()  # Client never reads
+
+        async def scenario():
+            task = asyncio.create_task(api_server.app(self.scope("/batch"), receive, send))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            return received
+
+        assert asyncio.run(scenario()) <= api_server.BATCH_QUEUE_BLOCKS + 3
+
+class TestEvaluationHistory:
+    def test_bounded_and_side_by_side(self):
+        # EH-001: the ring buffer keeps only the newest entries; comparison puts one entry per column
+        history = EvaluationHistory(capacity=3)
+        for pqp in (0, 250, 500, 1000):
+            figures = calculators.accelerator_figures(50000, pqp, 1500)
+            history.record("Award Accelerator", {"miles": 50000, "pqp": pqp, "cost": 1500}, figures)
+        history.record("Buy Miles", {"miles": 10000}, calculators.miles_purchase_figures(10000, 200))
+        assert len(history) == 3 and history.total == 5
+        table = history.compare("Award Accelerator")
+        assert len(table[0]) == 1 + 2  # Field plus entries #3 and #4; #1 and #2 were dropped
+        pqp_row = next(row for row in table if row["Field"] == "PQP")
+        assert list(pqp_row.values())[1:] == ["500", "1,000"]
+        assert history.compare("Ticket Purchase") == []
+
+    def test_export_round_trip(self):
+        # EH-002: CSV and Parquet exports hold raw inputs and figures for every entry
+        import io
+        import pandas as pd
+        history = EvaluationHistory()
+        history.record("Buy Miles", {"miles": 10000}, calculators.miles_purchase_figures(10000, 200))
+        history.record("Break-Even", {"miles": 20000}, calculators.calculate_max_purchase_value(20000))
+        csv = pd.read_csv(io.BytesIO(history.export("csv")))
+        parquet = pd.read_parquet(io.BytesIO(history.export("parquet")))
+        for frame in (csv, parquet):
+            assert list(frame["evaluator"]) == ["Buy Miles", "Break-Even"]
+            assert frame["cpm_miles"][0] == pytest.approx(2.0)
+            assert frame["max_cash_price"][1] == pytest.approx(300)
+            assert list(frame["input_miles"]) == [10000, 20000]
+
+class TestReactiveGraph:
+    def make_graph(self):
+        graph = ReactiveGraph()
+        graph.input("base_fare", "upgrade_price", "miles", "valuation")
+
+        @graph.derive(["base_fare", "upgrade_price"])
+        def relative_cost(base_fare, upgrade_price):
+            return calculators.evaluate_relative_upgrade_cost(base_fare, upgrade_price)
+
+        @graph.derive(["miles", "valuation"])
+        def miles_worth(miles, valuation):
+            return calculators.calculate_miles_value(miles, valuation=valuation)
+
+        @graph.derive(["miles_worth"])
+        def worth_high(worth):
+            return round(worth[1])
+
+        @graph.derive(["worth_high"])
+        def worth_label(high):
+            return f"${high:,}"
+
+        graph.update(base_fare=800, upgrade_price=400, miles=20000, valuation=calculators.DEFAULT_VALUATION)
+        return graph
+
+    def test_only_downstream_recomputes(self):
+        # RG-001: a changed input recomputes only the nodes reading it; equal values stop propagation
+        graph = self.make_graph()
+        for node in ("relative_cost", "worth_label"):
+            graph.get(node)
+        graph.set("miles", 30000)
+        assert graph.get("relative_cost") == calculators.evaluate_relative_upgrade_cost(800, 400)
+        assert graph.get("worth_label") == "$450"
+        assert graph.recomputes == {"relative_cost": 1, "miles_worth": 2, "worth_high": 2, "worth_label": 2}
+        assert not graph.set("valuation", calculators.MileValuation.from_cents(1.2, 1.5))  # Equal valuation
+        graph.set("valuation", calculators.MileValuation.from_cents(1.0, 1.5))  # Only the low value moves
+        assert graph.get("worth_label") == "$450"
+        assert graph.recomputes == {"relative_cost": 1, "miles_worth": 3, "worth_high": 3, "worth_label": 2}
+
+    def test_rules_reload_reaches_app_graph(self, tmp_path):
+        # RG-003: nodes classifying through the verdict rules recompute after a hot reload
+        from streamlit.testing.v1 import AppTest
+        config = json.load(open(verdict_rules.RULES_PATH, encoding="utf-8"))
+        rules_path = tmp_path / "rules.json"
+        rules_path.write_text(json.dumps(config), encoding="utf-8")
+        try:
+            verdict_rules.use_rules_file(str(rules_path), reload_interval=0)
+            app = AppTest.from_file(os.path.join(os.path.dirname(__file__), "streamlit_app.py"), default_timeout=60).run()
+            graph = app.session_state["evaluation_graph"]
+            graph.update(accelerator_miles=10000, accelerator_pqp=100, accelerator_cost=200,
+                         upgrade_base_fare=800, upgrade_base_fare_miles=0, upgrade_cash_only=400)
+            assert graph.get("accelerator_result")["Verdict"] == "✅ Excellent Deal!"
+            before = graph.get("upgrade_relative_cost")
+
+            for band in (config["accelerator"]["pqp_cost"], config["relative_upgrade_cost"]):
+                for bound in band:
+                    bound[1] = "CHANGED " + bound[1]
+            rules_path.write_text(json.dumps(config), encoding="utf-8")
+            os.utime(rules_path, ns=(time.time_ns(), time.time_ns() + 10**9))
+            app.run()
+            assert graph.get("accelerator_result")["Verdict"] == "CHANGED ✅ Excellent Deal!"
+            assert graph.get("upgrade_relative_cost") == "CHANGED " + before
+        finally:
+            verdict_rules.use_rules_file(verdict_rules.RULES_PATH)
+
+    def test_rules_reload_reaches_fragment_rerun(self, tmp_path):
+        # RG-004: a tab rerunning alone as a fragment still picks up reloaded verdict rules
+        from functools import partial
+        import streamlit.testing.v1.local_script_runner as local_script_runner
+        from streamlit.testing.v1 import AppTest
+        config = json.load(open(verdict_rules.RULES_PATH, encoding="utf-8"))
+        rules_path = tmp_path / "rules.json"
+        rules_path.write_text(json.dumps(config), encoding="utf-8")
+        try:
+            verdict_rules.use_rules_file(str(rules_path), reload_interval=0)
+            app = AppTest.from_file(os.path.join(os.path.dirname(__file__), "streamlit_app.py"), default_timeout=60).run()
+            app.session_state["active_tab"] = "🏆 Award Accelerator"
+            app.run()
+            for key, value in (("accelerator_miles", "10K"), ("accelerator_pqp", "100"), ("accelerator_cost", "200")):
+                app.text_input(key=key).input(value)
+            app.run()
+            graph = app.session_state["evaluation_graph"]
+            assert graph.get("accelerator_result")["Verdict"] == "✅ Excellent Deal!"
+
+            for bound in config["accelerator"]["pqp_cost"]:
+                bound[1] = "CHANGED " + bound[1]
+            rules_path.write_text(json.dumps(config), encoding="utf-8")
+            os.utime(rules_path, ns=(time.time_ns(), time.time_ns() + 10**9))
+            updates = []
+            update = graph.update
+            graph.update = lambda **values: (updates.append(set(values)), update(**values))
+            # Rerun only the open tab's fragment, as a widget inside it would
+            fragment_rerun = partial(local_script_runner.RerunData, is_fragment_scoped_rerun=True,
+                                     fragment_id_queue=list(app._fragment_storage._fragments))
+            with patch.object(local_script_runner, "RerunData", fragment_rerun):
+                app.run()
+            assert "valuation" not in set().union(*updates)  # The script body did not run
+            assert graph.get("accelerator_result")["Verdict"] == "CHANGED ✅ Excellent Deal!"
+        finally:
+            verdict_rules.use_rules_file(verdict_rules.RULES_PATH)
+
+    def test_declaration_errors(self):
+        # RG-002: nodes must read existing nodes, names are unique and inputs must be set before use
+        graph = ReactiveGraph()
+        graph.input("a")
+        with pytest.raises(ValueError):
+            graph.derive(["b"], name="c")(lambda b: b)
+        with pytest.raises(ValueError):
+            graph.input("a")
+        with pytest.raises(KeyError):
+            graph.get("a")
+        with pytest.raises(KeyError):
+            graph.set("missing", 1)
+
+class TestBulkUpload:
+    def test_vectorized_figures_match_scalar(self):
+        # BU-001: the numpy evaluators agree with the scalar *_figures functions row by row
+        import numpy as np
+        import pandas as pd
+        rng = np.random.default_rng(7)
+        n = 500
+
+        def amounts(high):
+            return np.where(rng.random(n) < 0.3, 0, np.round(rng.uniform(-0.05 * high, high, n), 2))
+
+        valuation = calculators.MileValuation.from_cents(1.1, 1.7)
+        table = load_upgrade_table()
+        cases = {
+            "ticket": (pd.DataFrame({"miles_price": amounts(80000), "cash_price": amounts(2000),
+                                     "miles_plus_cash_miles": amounts(40000), "miles_plus_cash_cash": amounts(800)}),
+                       lambda *args: calculators.best_option_figures(*args, valuation=valuation)),
+            "upgrade": (pd.DataFrame({"miles": amounts(80000), "cash_cost": amounts(1500),
+                                      "full_cash_upgrade": amounts(3000), "full_fare_cost": amounts(4000),
+                                      "travel_hours": rng.integers(-40, 41, n).astype(float),
+                                      "from_class": rng.choice(calculators.cabin_classes, n),
+                                      "to_class": rng.choice(calculators.cabin_classes, n)}),
+                        lambda *args: calculators.upgrade_figures(*args, verdict_table=table, valuation=valuation)),
+            "accelerator": (pd.DataFrame({"miles": amounts(80000), "pqp": amounts(2000), "cost": amounts(3000)}),
+                            lambda *args: calculators.accelerator_figures(*args, valuation=valuation)),
+        }
+        for offer, (inputs, scalar) in cases.items():
+            frame = bulk_upload.FIGURES_FRAMES[offer](inputs, valuation=valuation, verdict_table=table)
+            for i, row in enumerate(inputs.itertuples(index=False)):
+                expected = scalar(*row)
+                for name, value in frame.iloc[i].items():
+                    if name not in expected:
+                        assert value is None or pd.isna(value), (offer, i, name)
+                    elif expected[name] is None:
+                        assert value is None or pd.isna(value), (offer, i, name)
+                    else:
+                        assert value == expected[name], (offer, i, name)
+
+    def test_upload_round_trip(self):
+        # BU-002: form-style amounts and headers are parsed per chunk; pages and CSV are formatted as in the tabs
+        import io
+        import pandas as pd
+        data = (b"Miles Price,Cash Price,Miles-Plus-Cash Miles,miles_plus_cash_cash,note\n"
+                b"30K,450,,,a\n 25k ,1.2K,15K,300,b\ngarbage,100,0,0,c\n")
+        chunks = list(bulk_upload.evaluate_upload(data, "offers.csv", "ticket", chunk_rows=2))
+        assert [done for done, _ in chunks] == [2, 3]
+        results = bulk_upload.combine_results([chunk for _, chunk in chunks])
+        assert list(results["row"]) == [1, 2, 3]
+        assert list(results["input_miles_price"]) == [30000, 25000, 0]
+        page = bulk_upload.format_results(results.iloc[:1], "ticket")
+        assert page["Verdict"][0] == calculators.evaluate_best_option(30000, 450, 0, 0)["Verdict"]
+        exported = pd.read_csv(io.BytesIO(b"".join(bulk_upload.export_csv(results, "ticket", chunk_rows=2))))
+        assert list(exported.columns) == bulk_upload.result_columns("ticket")
+        assert list(exported["Best Option"]) == list(results["best_option"])
+        with bulk_upload.spool_csv(results, "ticket", chunk_rows=2) as spool:
+            assert isinstance(spool, io.RawIOBase)
+            assert pd.read_csv(spool).equals(exported)
+        with pytest.raises(bulk_upload.BulkUploadError):
+            list(bulk_upload.evaluate_upload(b"a,b\n1,2\n", "offers.csv", "upgrade"))
+
+    def test_upgrade_routes_fill_travel_hours(self):
+        # BU-003: origin/destination columns estimate travel_hours where it is blank; unknown airports leave the cell as parsed
+        from airports import flight_hours
+        data = (b"miles,cash_cost,origin,destination,travel_hours\n"
+                b"30K,100,SFO,EWR,\n30K,100, sfo ,ewr,2\n30K,100,SFO,XXX,\n")
+        results = bulk_upload.combine_results([chunk for _, chunk in bulk_upload.evaluate_upload(data, "offers.csv", "upgrade")])
+        assert list(results["input_travel_hours"]) == [pytest.approx(flight_hours("SFO", "EWR")), 2, 0]
+        assert results["comfort_factor"][0] == pytest.approx(calculators.upgrade_comfort_factor(flight_hours("SFO", "EWR")))
+
+class TestMilesPurchaseOptimizer:
+    TIERS = [(3000, 25, 0), (5000, 50, 0), (8000, 0, 6000)]
+
+    def test_bigger_purchase_reaches_richer_tier(self):
+        # BM-001: the highest reached tier applies, so buying past the shortfall can be cheaper
+        assert [tier_bonus(miles, self.TIERS) for miles in (2000, 3000, 7000, 9000)] == [0, 750, 3500, 6000]
+        plan = optimize_miles_purchase(7000, 35, self.TIERS, min_miles=2000, max_miles=9000)
+        assert [(p["Buy"], p["Times"]) for p in plan["Purchases"]] == [(5000, 1)]  # 7,500 miles for $175
+        assert plan["Total Cost"] == 175 and plan["Extra Miles"] == 500
+        assert plan["Effective CPM"] == pytest.approx(17500 / 7500)
+        assert len(plan["CPM Curve"]) == 8
+
+    def test_matches_brute_force(self):
+        # BM-002: the DP finds the cheapest cover found by trying every combination of purchases
+        import itertools
+        options = purchase_options(35, self.TIERS, min_miles=2000, max_miles=9000)
+        for shortfall in range(1000, 40001, 1300):
+            plan = optimize_miles_purchase(shortfall, 35, self.TIERS, min_miles=2000, max_miles=9000)
+            best = min(
+                sum(option[2] for option in combo)
+                for count in range(1, 6)
+                for combo in itertools.combinations_with_replacement(options, count)
+                if sum(option[0] + option[1] for option in combo) >= shortfall
+            )
+            assert round(plan["Total Cost"] * 100) == best
+            assert plan["Miles Credited"] >= shortfall
+
+    def test_large_shortfall_is_fast(self):
+        # BM-003: a million-mile shortfall over 149 purchase sizes stays interactive and never falls short
+        import time
+        start = time.perf_counter()
+        plan = optimize_miles_purchase(1_487_351, 37.63, [(2000, 13, 0), (20000, 37, 0)], min_miles=2000, max_miles=150000)
+        assert time.perf_counter() - start < 1.0
+        assert plan["Miles Credited"] >= 1_487_351
+        assert "Error" in optimize_miles_purchase(0, 37.63, [])
+
+class TestStatusSimulator:
+    OFFERS = [
+        {"name": "A", "pqp": 1000, "miles": 5000, "cost": 800},
+        {"name": "B", "pqp": 2000, "miles": 0, "cost": 1300},
+        {"name": "C", "pqp": 1500, "miles": 10000, "cost": 1000},
+    ]
+
+    def test_pqf_decides_target_and_cheapest_set_wins(self):
+        # PS-001: enough PQF lowers the PQP target, and two offers can beat the one big one
+        flights = [{"pqp": 1000, "pqf": 6}]
+        with_pqf = simulate_status(2500, 10, flights, self.OFFERS)["Levels"][0]
+        assert with_pqf["PQP Short"] == 1500 and with_pqf["Buy"] == "C" and with_pqf["Cost"] == 1000
+        pqp_only = simulate_status(2500, 5, flights, self.OFFERS)["Levels"][0]
+        assert pqp_only["PQP Short"] == 2500 and pqp_only["Buy"] == "A, C" and pqp_only["Cost"] == 1800
+        assert pqp_only["Miles Received"] == 15000 and pqp_only["Net Cost"] < pqp_only["Cost"]
+        levels = simulate_status(6000, 0, [], self.OFFERS)["Levels"]
+        assert levels[0]["Buy"] == "Already qualified"
+        assert levels[-1]["Cost"] is None
+
+    def test_matches_brute_force(self):
+        # PS-002: every level's cost equals the cheapest subset found by trying them all
+        import itertools
+        import random
+        rng = random.Random(49)
+        for _ in range(30):
+            offers = [{"pqp": rng.choice([500, 750, 1000, 2500]), "cost": rng.randint(200, 2000)} for _ in range(7)]
+            current = rng.randint(0, 8000)
+            plan = simulate_status(current, 0, [], offers)
+            for level, row in zip(PREMIER_LEVELS, plan["Levels"]):
+                costs = [
+                    sum(offer["cost"] for offer in combo)
+                    for count in range(len(offers) + 1)
+                    for combo in itertools.combinations(offers, count)
+                    if current + sum(offer["pqp"] for offer in combo) >= level.pqp_only
+                ]
+                assert row["Cost"] == (min(costs) if costs else None)
+
+    def test_hundreds_of_offers_are_fast(self):
+        # PS-003: a few hundred offers solve every level in well under a second
+        offers = [{"pqp": 250 + 50 * (i % 37), "miles": 1000 * (i % 5), "cost": 300 + 7 * (i % 53)} for i in range(400)]
+        start = time.perf_counter()
+        plan = simulate_status(1234, 12, [{"pqp": 800, "pqf": 4}], offers)
+        assert time.perf_counter() - start < 1.0
+        assert all(row["Cost"] is not None for row in plan["Levels"])
+        assert "Error" in simulate_status(-1, 0, [], offers)
+
+class TestUpgradeClearance:
+    def test_closed_form_matches_monte_carlo(self):
+        # UC-001: the closed form agrees with simulated open seats vs. passengers ahead
+        import numpy as np
+        from upgrade_clearance import CABIN_SEATS, LIST_PER_SEAT, SELL_DOWN_DAYS
+        rng = np.random.default_rng(50)
+        for status, fare_class, load, days in [("Premier Gold", "V", 0.85, 14), ("General Member", "K", 0.6, 3), ("Premier 1K", "Y", 0.95, 0)]:
+            open_seats = rng.poisson(CABIN_SEATS * (1 - load) * math.exp(-days / SELL_DOWN_DAYS), 200_000)
+            ahead = rng.poisson(CABIN_SEATS * load * LIST_PER_SEAT * share_ahead(status, fare_class), 200_000)
+            assert clearance_chances(status, fare_class, load, [days])[0] == pytest.approx((open_seats > ahead).mean(), abs=0.005)
+
+    def test_priority_and_lead_time(self):
+        # UC-002: higher status clears more often, and the chance rises as departure nears
+        chances = [estimate_clearance(status, "M", 85, 7)["Clearance Chance"] for status in STATUS_LIST_SHARE]
+        assert chances == sorted(chances, reverse=True)
+        curve = [point["Clearance Chance"] for point in estimate_clearance("Premier Platinum", "M", 85, 30)["Curve"]]
+        assert len(curve) == 31 and curve == sorted(curve)
+        assert "Error" in estimate_clearance("Premier Gold", "Z", 85, 7)
+        assert "Error" in estimate_clearance("Premier Gold", "M", 120, 7)
+
+    def test_waitlisted_upgrade_uses_expected_cost(self):
+        # UC-003: a long-shot waitlisted Miles + Cash upgrade loses to a confirmed cash upgrade
+        args = (20000, 300, 900, 3000, 10, "Economy", "Business (Polaris)")
+        assert calculators.evaluate_upgrade(*args)["Best Option"] == "Miles + Cash"
+        confirmed = calculators.upgrade_figures(*args)
+        waitlisted = calculators.upgrade_figures(*args, clearance_probability=0.25)
+        assert waitlisted["best_option"] == "Cash Upgrade"
+        assert waitlisted["expected_miles_cash_upgrade_low"] == pytest.approx(confirmed["miles_cash_upgrade_low"] * 0.25)
+        result = calculators.evaluate_upgrade(*args, clearance_probability=0.25)
+        assert result["Clearance Chance"] == "25%"
+        assert "Clearance Chance" not in calculators.evaluate_upgrade(*args, clearance_probability=1.0)
+        assert "Error" in calculators.evaluate_upgrade(*args, clearance_probability=1.5)
+
 # Integration Tests
 class TestIntegration:
     def test_helper_integration(self):
@@ -0,0 +1,102 @@
+"""Chance that a waitlisted upgrade clears before departure.
+
+Upgrade awards (Miles + Cash, or PlusPoints) wait on the upgrade list until a
+seat opens in the higher cabin, and are only charged if they clear. The model
+treats the seats still open in that cabin at departure and the passengers
+ranked ahead of you on the list as independent Poisson counts: open seats
+shrink with the cabin's current load and with the days left to sell it, and
+the queue ahead grows with load and shrinks with your priority (status first,
+then fare class, the order the upgrade list uses). The upgrade clears when
+more seats open than there are passengers ahead, which has the closed form
+``sum_k P(ahead = k) * P(open > k)``; it is evaluated for every day up to
+departure as one array expression, so the whole curve costs about as much as
+a single chance.
+"""
+import math
+
+import numpy as np
+
+# Share of a typical upgrade list at each status, highest priority first
+STATUS_LIST_SHARE = {
+    "Premier 1K": 0.20,
+    "Premier Platinum": 0.20,
+    "Premier Gold": 0.25,
+    "Premier Silver": 0.25,
+    "General Member": 0.10,
+}
+
+# Where a fare class ranks among passengers of the same status (0 = first)
+FARE_CLASS_RANK = {
+    **dict.fromkeys("YB", 0.0),
+    **dict.fromkeys("MEUH", 0.35),
+    **dict.fromkeys("QVW", 0.65),
+    **dict.fromkeys("STLKGN", 0.9),
+}
+
+CABIN_SEATS = 30  # Seats in the higher cabin
+SELL_DOWN_DAYS = 21  # Open seats fall by a factor of e over this many days of sales
+LIST_PER_SEAT = 0.6  # Upgrade requests per higher-cabin seat on a full flight
+
+
+def share_ahead(status, fare_class):
+    """Expected share of the upgrade list ranked ahead of a passenger"""
+    above = 0.0
+    for level, share in STATUS_LIST_SHARE.items():
+        if level == status:
+            return above + share * FARE_CLASS_RANK[fare_class]
+        above += share
+    raise KeyError(status)
+
+
+def _poisson_pmf(means, k):
+    """P(X = k) for Poisson means (rows) and counts ``k`` (columns), in log space"""
+    means = np.asarray(means, dtype=float)[:, None]
+    log_factorial = np.concatenate(([0.0], np.cumsum(np.log(np.arange(1, k.size)))))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_power = np.where(k == 0, 0.0, k * np.log(means))
+    return np.exp(log_power - means - log_factorial)
+
+
+def clearance_chances(status, fare_class, load, days_out, cabin_seats=CABIN_SEATS):
+    """Chance of clearing for each number of days before departure in ``days_out``
+
+    ``load`` is the share (0-1) of the higher cabin already sold.
+    """
+    days_out = np.asarray(days_out, dtype=float)
+    open_seats = cabin_seats * (1 - load) * np.exp(-days_out / SELL_DOWN_DAYS)
+    ahead = np.full_like(open_seats, cabin_seats * load * LIST_PER_SEAT * share_ahead(status, fare_class))
+    top = max(open_seats.max(initial=0), ahead.max(initial=0))
+    k = np.arange(math.ceil(top + 10 * math.sqrt(top) + 10))
+    open_more_than = 1 - np.cumsum(_poisson_pmf(open_seats, k), axis=1)
+    chances = (_poisson_pmf(ahead, k) * open_more_than).sum(axis=1)
+    return np.clip(chances, 0.0, 1.0)
+
+
+def estimate_clearance(status, fare_class, load_percent, days_out, cabin_seats=CABIN_SEATS):
+    """
+    Chance that a waitlisted upgrade clears, with the day-by-day curve.
+
+    ``load_percent`` is how full the higher cabin is today and ``days_out``
+    the days left before departure. Returns a dict with the chance, the
+    expected open seats and passengers ahead, and the chance for every day
+    from today to departure.
+    """
+    fare_class = str(fare_class).strip().upper()
+    if status not in STATUS_LIST_SHARE:
+        return {"Error": f"Unknown status: {status}"}
+    if fare_class not in FARE_CLASS_RANK:
+        return {"Error": f"Unknown fare class: {fare_class}"}
+    if not 0 <= load_percent <= 100:
+        return {"Error": "Cabin load must be between 0% and 100%"}
+    if days_out < 0 or cabin_seats <= 0:
+        return {"Error": "Days to departure and cabin seats cannot be negative"}
+
+    load = load_percent / 100
+    days = np.arange(int(days_out), -1, -1)
+    chances = clearance_chances(status, fare_class, load, days, cabin_seats)
+    return {
+        "Clearance Chance": float(chances[0]),
+        "Seats Expected Open": cabin_seats * (1 - load) * math.exp(-int(days_out) / SELL_DOWN_DAYS),
+        "Ahead of You": cabin_seats * load * LIST_PER_SEAT * share_ahead(status, fare_class),
+        "Curve": [{"Days Out": int(d), "Clearance Chance": float(c)} for d, c in zip(days, chances)],
+    }
@@ -0,0 +1,226 @@
+"""Precomputed upgrade verdicts.
+
+``evaluate_upgrade`` only changes its best option and warning when an input
+crosses one of a handful of thresholds (flight length, cash upgrade vs. full
+fare, Miles + Cash vs. full fare). This module quantizes the inputs into
+buckets whose edges sit exactly on those thresholds, evaluates the exact path
+once per bucket and stores the result as small ``uint8`` tables, so a verdict
+is a single array index. The table is cached on disk and rebuilt whenever the
+thresholds it was built from change.
+"""
+import itertools
+import json
+import os
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+import calculators
+from calculators import choose_upgrade_option, is_upgrade_not_worth_it, upgrade_comfort_factor
+from metrics import record_cache
+from verdict_rules import get_rules
+
+CACHE_DIR = os.environ.get("UNITED_MILES_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+TABLE_PATH = os.path.join(CACHE_DIR, "upgrade_verdicts.npz")
+
+UNREACHABLE = 255  # Bucket combination that no real input can produce
+REFERENCE_FARE = 1000.0  # Full fare used to turn ratio buckets back into dollar amounts
+
+
+def _table_edges():
+    """Bucket edges for every quantized dimension, taken from the live verdict rules"""
+    rules = get_rules()
+    return {
+        "hours": sorted({rules.premium_upgrade_comfort_hours, rules.upgrade_comfort_hours}),
+        "cash_ratio": [rules.upgrade_full_fare_ratio],
+        "mixed_ratio": [1.0],
+        "cabins": list(calculators.cabin_classes),
+    }
+
+
+def _representatives(edges, closed_right):
+    """One sample value inside each bucket defined by ``edges``"""
+    points = [edges[0] / 2]
+    for low, high in zip(edges, edges[1:]):
+        points.append((low + high) / 2)
+    # With right-closed buckets the upper edge itself belongs to the lower bucket
+    points.append(edges[-1] * 2 if closed_right else edges[-1])
+    return points
+
+
+class UpgradeVerdictTable:
+    """Compact lookup table of upgrade warnings and best-option classes"""
+
+    def __init__(self, warnings, best, messages, options, edges):
+        self.warnings = warnings
+        self.best = best
+        self.messages = messages
+        self.options = options
+        self.edges = edges
+        self._cabin_index = {cabin: i for i, cabin in enumerate(edges["cabins"])}
+
+    @classmethod
+    def build(cls):
+        """Run the exact checks once for every bucket combination"""
+        edges = _table_edges()
+        cabins = edges["cabins"]
+        hours_points = _representatives(edges["hours"], closed_right=False)
+        cash_points = _representatives(edges["cash_ratio"], closed_right=True)
+        # Index 0 of the mixed dimension means "no Miles + Cash offer"
+        mixed_points = [None] + _representatives(edges["mixed_ratio"], closed_right=True)
+
+        messages = [None]
+        warnings = np.zeros((len(hours_points), len(cabins), len(cabins), len(cash_points), len(mixed_points), 2), dtype=np.uint8)
+        for index in itertools.product(*(range(n) for n in warnings.shape)):
+            h, f, t, c, m, original = index
+            miles = cash_cost = 0
+            if mixed_points[m] is not None:
+                # Split the Miles + Cash total evenly between cash and miles (at the default valuation)
+                cash_cost = mixed_points[m] * REFERENCE_FARE / 2
+                miles = cash_cost / calculators.DEFAULT_VALUATION.low
+            message = is_upgrade_not_worth_it(
+                hours_points[h], cash_points[c] * REFERENCE_FARE, REFERENCE_FARE,
+                miles, cash_cost, cabins[f], cabins[t], REFERENCE_FARE if original else 0
+            )
+            if message not in messages:
+                messages.append(message)
+            warnings[index] = messages.index(message)
+
+        # Best option depends only on how Miles + Cash, cash-only and full fare are ordered
+        options = []
+        best = np.full((2, 2, 2), UNREACHABLE, dtype=np.uint8)
+        samples = [REFERENCE_FARE * r for r in (0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 1.75)]
+        for mixed_cost, cash_upgrade in itertools.product(samples, samples):
+            option = choose_upgrade_option(REFERENCE_FARE - mixed_cost, REFERENCE_FARE - cash_upgrade)
+            if option not in options:
+                options.append(option)
+            best[cls._best_index(mixed_cost, cash_upgrade, REFERENCE_FARE)] = options.index(option)
+
+        return cls(warnings, best, messages, options, edges)
+
+    @staticmethod
+    def _best_index(mixed_cost, cash_upgrade, full_fare):
+        return int(mixed_cost < full_fare), int(cash_upgrade < full_fare), int(mixed_cost < cash_upgrade)
+
+    def is_current(self):
+        """True when the table was built from the thresholds currently in effect"""
+        return self.edges == _table_edges()
+
+    def lookup(self, travel_hours, from_class, to_class, total_cash_upgrade, full_fare_cost,
+               miles, cash_cost, total_miles_cash_low, original_full_fare_cost, valuation=calculators.DEFAULT_VALUATION):
+        """Return ``(best_option, warning)`` for already-normalized upgrade inputs.
+
+        ``total_miles_cash_low`` prices the miles at ``valuation``, so the Miles + Cash bucket follows it.
+        """
+        f = self._cabin_index.get(from_class)
+        t = self._cabin_index.get(to_class)
+        best = self.best[self._best_index(total_miles_cash_low, total_cash_upgrade, full_fare_cost)]
+        comfort = upgrade_comfort_factor(travel_hours)
+        # The best-option index assumes savings keep their order, i.e. a positive comfort factor
+        if f is None or t is None or full_fare_cost <= 0 or best == UNREACHABLE or comfort <= 0:
+            # Outside the table: fall back to the exact path
+            record_cache("upgrade_verdict_table", hit=False)
+            multiplier = calculators.upgrade_multipliers.get((from_class, to_class), 1.0)
+            return (
+                choose_upgrade_option((full_fare_cost - total_miles_cash_low) * comfort * multiplier,
+                                      (full_fare_cost - total_cash_upgrade) * comfort * multiplier),
+                is_upgrade_not_worth_it(travel_hours, total_cash_upgrade, full_fare_cost, miles, cash_cost,
+                                        from_class, to_class, original_full_fare_cost, valuation=valuation),
+            )
+
+        h = bisect_right(self.edges["hours"], travel_hours)
+        c = bisect_left(self.edges["cash_ratio"], total_cash_upgrade / full_fare_cost)
+        m = 0
+        if miles > 0 and cash_cost > 0:
+            m = 1 + bisect_left(self.edges["mixed_ratio"], total_miles_cash_low / full_fare_cost)
+        warning = self.warnings[h, f, t, c, m, int(original_full_fare_cost > 0)]
+        record_cache("upgrade_verdict_table", hit=True)
+        return self.options[best], self.messages[warning]
+
+    def lookup_many(self, travel_hours, from_class, to_class, total_cash_upgrade, full_fare_cost,
+                    miles, cash_cost, total_miles_cash_low, original_full_fare_cost, valuation=calculators.DEFAULT_VALUATION):
+        """``lookup`` over numpy arrays; returns object arrays of best options and warnings"""
+        f = np.array([self._cabin_index.get(cabin, -1) for cabin in from_class], dtype=np.intp)
+        t = np.array([self._cabin_index.get(cabin, -1) for cabin in to_class], dtype=np.intp)
+        best = self.best[(total_miles_cash_low < full_fare_cost).astype(np.intp),
+                         (total_cash_upgrade < full_fare_cost).astype(np.intp),
+                         (total_miles_cash_low < total_cash_upgrade).astype(np.intp)]
+        outside = (f < 0) | (t < 0) | ~(full_fare_cost > 0) | (best == UNREACHABLE) | ~(upgrade_comfort_factor(travel_hours) > 0)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            h = np.searchsorted(self.edges["hours"], travel_hours, side="right")
+            c = np.searchsorted(self.edges["cash_ratio"], total_cash_upgrade / full_fare_cost, side="left")
+            mixed_ratio = total_miles_cash_low / full_fare_cost
+        m = np.where((miles > 0) & (cash_cost > 0), 1 + np.searchsorted(self.edges["mixed_ratio"], mixed_ratio, side="left"), 0)
+        inside = ~outside
+        warnings = np.zeros(len(f), dtype=np.uint8)
+        warnings[inside] = self.warnings[h[inside], f[inside], t[inside], c[inside], m[inside],
+                                         (original_full_fare_cost[inside] > 0).astype(np.intp)]
+        options = np.array(self.options, dtype=object)[np.where(inside, best, 0)]
+        messages = np.array(self.messages, dtype=object)[warnings]
+        record_cache("upgrade_verdict_table", hit=True, count=int(inside.sum()))
+        for i in np.flatnonzero(outside):
+            options[i], messages[i] = self.lookup(
+                travel_hours[i], from_class[i], to_class[i], total_cash_upgrade[i], full_fare_cost[i],
+                miles[i], cash_cost[i], total_miles_cash_low[i], original_full_fare_cost[i], valuation=valuation
+            )
+        return options, messages
+
+    def save(self, path=TABLE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta = {"messages": self.messages, "options": self.options, "edges": self.edges}
+        # Write then rename so concurrent readers never see a half-written file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, warnings=self.warnings, best=self.best, meta=json.dumps(meta))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=TABLE_PATH):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            return cls(data["warnings"], data["best"], meta["messages"], meta["options"], meta["edges"])
+
+
+def load_upgrade_table(path=TABLE_PATH):
+    """Load the cached table from disk, rebuilding and saving it if missing or stale"""
+    try:
+        table = UpgradeVerdictTable.load(path)
+        if table.is_current():
+            record_cache("upgrade_table_file", hit=True)
+            return table
+    except (OSError, ValueError, KeyError):
+        pass
+    record_cache("upgrade_table_file", hit=False)
+    table = UpgradeVerdictTable.build()
+    try:
+        table.save(path)
+    except OSError:
+        pass  # Read-only deployments still get the in-memory table
+    return table
+
+
+def validate_table(table, samples=10000, seed=0, valuation=calculators.DEFAULT_VALUATION):
+    """
+    Compare table lookups with the exact ``evaluate_upgrade`` path on random
+    inputs. Returns the list of mismatching input tuples (empty when the table
+    agrees everywhere).
+    """
+    rng = np.random.default_rng(seed)
+    cabins = list(calculators.cabin_classes)
+    mismatches = []
+    for _ in range(samples):
+        args = (
+            float(rng.choice([0, rng.uniform(0, 80000)])),
+            float(rng.choice([0, rng.uniform(0, 1500)])),
+            float(rng.choice([0, rng.uniform(0, 3000)])),
+            float(rng.choice([0, rng.uniform(0, 4000)])),
+            int(rng.integers(-40, 41)),  # Beyond the UI's 1-20 hours: the API and bulk upload accept any number
+            cabins[rng.integers(len(cabins))],
+            cabins[rng.integers(len(cabins))],
+        )
+        exact = calculators.evaluate_upgrade(*args, valuation=valuation)
+        fast = calculators.evaluate_upgrade(*args, verdict_table=table, valuation=valuation)
+        if (exact.get("Best Option"), exact.get("Warning")) != (fast.get("Best Option"), fast.get("Warning")):
+            mismatches.append(args)
+    return mismatches
@@ -0,0 +1,134 @@
+"""Config-driven verdict thresholds with hot reload.
+
+The cutoffs used by the evaluators live in ``verdict_rules.json`` (or the file
+named by ``UNITED_MILES_RULES``). Each band list is compiled once into a
+sorted tuple of cutoffs plus a tuple of labels, so classifying a value is a
+single ``bisect`` with no per-call parsing. ``get_rules()`` re-checks the
+file's modification time at most every ``RELOAD_INTERVAL`` seconds and swaps
+in the recompiled rules, so a running Streamlit server or batch worker picks
+up edits without a restart.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_right
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+RULES_PATH = os.environ.get("UNITED_MILES_RULES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "verdict_rules.json"))
+RELOAD_INTERVAL = 1.0  # Seconds between file modification checks
+
+
+class Bands(namedtuple("Bands", ["cutoffs", "labels"])):
+    """Ordered ``value < cutoff`` bands; the last label catches everything else"""
+
+    __slots__ = ()
+
+    def classify(self, value):
+        return self.labels[bisect_right(self.cutoffs, value)]
+
+    def classify_many(self, values):
+        """``classify`` over a numpy array, returning an object array of labels"""
+        import numpy as np
+        return np.array(self.labels, dtype=object)[np.searchsorted(self.cutoffs, values, side="right")]
+
+
+Rules = namedtuple("Rules", [
+    "pqp_cost",
+    "cost_per_mile",
+    "upgrade_comfort_hours",
+    "premium_upgrade_comfort_hours",
+    "upgrade_full_fare_ratio",
+    "relative_upgrade_cost",
+    "digest",
+])
+
+
+def compile_bands(bands):
+    """Turn ``[[cutoff, label], ..., [null, label]]`` into a ``Bands`` tuple"""
+    if not bands or bands[-1][0] is not None:
+        raise ValueError("The last band must have a null cutoff")
+    cutoffs = tuple(float(cutoff) for cutoff, _ in bands[:-1])
+    if any(a >= b for a, b in zip(cutoffs, cutoffs[1:])):
+        raise ValueError(f"Band cutoffs must be increasing: {cutoffs}")
+    return Bands(cutoffs, tuple(label for _, label in bands))
+
+
+def compile_rules(config, digest=""):
+    """Validate a parsed rules config and compile it into a ``Rules`` tuple"""
+    upgrade = config["upgrade"]
+    return Rules(
+        pqp_cost=compile_bands(config["accelerator"]["pqp_cost"]),
+        cost_per_mile=compile_bands(config["accelerator"]["cost_per_mile"]),
+        upgrade_comfort_hours=upgrade["comfort_hours"],
+        premium_upgrade_comfort_hours=upgrade["premium_comfort_hours"],
+        upgrade_full_fare_ratio=upgrade["full_fare_ratio"],
+        relative_upgrade_cost=compile_bands(config["relative_upgrade_cost"]),
+        digest=digest,
+    )
+
+
+def load_rules(path=RULES_PATH):
+    """Read and compile a rules file"""
+    with open(path, "rb") as f:
+        raw = f.read()
+    return compile_rules(json.loads(raw), hashlib.sha1(raw).hexdigest())
+
+
+class RulesCache:
+    """Holds the compiled rules for one file and reloads them when it changes"""
+
+    def __init__(self, path=RULES_PATH, reload_interval=RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._mtime = os.stat(path).st_mtime_ns
+        self._rules = load_rules(path)
+        self._checked_at = time.monotonic()
+
+    def get(self):
+        if time.monotonic() - self._checked_at >= self.reload_interval:
+            self._maybe_reload()
+        return self._rules
+
+    def _maybe_reload(self):
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                if mtime == self._mtime:
+                    return
+                rules = load_rules(self.path)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                # Keep serving the last good rules while the file is broken
+                logger.warning("Could not reload verdict rules from %s: %s", self.path, e)
+                return
+            self._mtime = mtime
+            self._rules = rules
+            logger.info("Reloaded verdict rules from %s", self.path)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_rules():
+    """Current compiled rules, reloaded from disk when the config file changes"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = RulesCache()
+    return _cache.get()
+
+
+def use_rules_file(path, reload_interval=RELOAD_INTERVAL):
+    """Point ``get_rules()`` at a different config file (tests, staging configs)"""
+    global _cache
+    with _cache_lock:
+        _cache = RulesCache(path, reload_interval)
+    return _cache.get()
@@ -0,0 +1,114 @@
+"""Split a fixed miles balance across several planned trips.
+
+Each trip can be booked with cash, miles or Miles + Cash. The options are
+priced exactly like ``evaluate_best_option`` prices them (miles at the low
+valuation plus any cash co-pay) and the combination with the largest total
+dollar savings that fits in the balance is picked with a multiple-choice
+knapsack.
+"""
+import math
+from functools import reduce
+
+import numpy as np
+
+from calculators import DEFAULT_VALUATION, calculate_miles_value
+
+# Upper bound on DP cells; larger balances are bucketed into coarser steps
+MAX_DP_CELLS = 200_000
+
+
+def trip_options(trip, valuation=DEFAULT_VALUATION):
+    """Return the bookable award options of a trip as (label, miles, cash, savings) tuples.
+
+    Savings are measured against paying the full cash price. Options that are
+    missing or that would cost more than cash are left out.
+    """
+    cash_price = trip.get("cash_price", 0)
+    options = []
+
+    miles_price = trip.get("miles_price", 0)
+    if miles_price > 0:
+        miles_value_low, _ = calculate_miles_value(miles_price, valuation=valuation)
+        options.append(("Miles", miles_price, 0, cash_price - miles_value_low))
+
+    mixed_miles = trip.get("miles_plus_cash_miles", 0)
+    mixed_cash = trip.get("miles_plus_cash_cash", 0)
+    if mixed_miles > 0 and mixed_cash > 0:
+        mixed_value_low, _ = calculate_miles_value(mixed_miles, valuation=valuation)
+        options.append(("Miles + Cash", mixed_miles, mixed_cash, cash_price - mixed_value_low - mixed_cash))
+
+    return [option for option in options if option[3] > 0]
+
+
+def _miles_step(weights, miles_balance):
+    """Pick the DP granularity: the common divisor of all prices, or coarser if needed."""
+    step = reduce(math.gcd, [int(w) for w in weights], int(miles_balance)) or 1
+    if miles_balance // step > MAX_DP_CELLS:
+        step = math.ceil(miles_balance / MAX_DP_CELLS)
+    return step
+
+
+def optimize_trip_wallet(trips, miles_balance, valuation=DEFAULT_VALUATION):
+    """
+    Choose how to book every trip so that total savings are maximised without
+    spending more than ``miles_balance`` miles.
+
+    ``trips`` is a list of dicts with ``cash_price``, ``miles_price``,
+    ``miles_plus_cash_miles`` and ``miles_plus_cash_cash`` keys (plus an
+    optional ``name``). Miles are priced with ``valuation``. Returns a dict
+    with the per-trip bookings and totals.
+    """
+    if miles_balance < 0:
+        return {"Error": "Miles balance cannot be negative"}
+
+    miles_balance = int(miles_balance)
+    per_trip = [trip_options(trip, valuation) for trip in trips]
+    weights = [math.ceil(option[1]) for options in per_trip for option in options]
+    step = _miles_step(weights, miles_balance) if weights else max(miles_balance, 1)
+    capacity = miles_balance // step
+
+    # dp[c] = best savings using at most c steps of miles; choice[i, c] = option taken for trip i
+    dp = np.zeros(capacity + 1)
+    choice = np.zeros((len(trips), capacity + 1), dtype=np.int8)
+    for i, options in enumerate(per_trip):
+        best = dp.copy()
+        for k, (_, miles, _, savings) in enumerate(options, start=1):
+            # Round up so a coarse step can never overspend the balance
+            w = math.ceil(miles / step)
+            if w > capacity:
+                continue
+            candidate = np.full(capacity + 1, -np.inf)
+            candidate[w:] = dp[:capacity + 1 - w] + savings
+            better = candidate > best
+            best[better] = candidate[better]
+            choice[i, better] = k
+        dp = best
+
+    # Walk the choices back to recover each trip's booking
+    bookings = []
+    c = capacity
+    miles_used = 0
+    for i in range(len(trips) - 1, -1, -1):
+        trip = trips[i]
+        k = choice[i, c]
+        if k:
+            label, miles, cash, savings = per_trip[i][k - 1]
+            c -= math.ceil(miles / step)
+            miles_used += miles
+        else:
+            label, miles, cash, savings = "Cash", 0, trip.get("cash_price", 0), 0
+        bookings.append({
+            "Trip": trip.get("name", f"Trip {i + 1}"),
+            "Book With": label,
+            "Miles": miles,
+            "Cash": cash,
+            "Savings": savings,
+        })
+    bookings.reverse()
+
+    return {
+        "Bookings": bookings,
+        "Total Savings": float(dp[capacity]),
+        "Miles Used": miles_used,
+        "Miles Left": miles_balance - miles_used,
+    }